@@ -1,22 +1,22 @@
 import logging
-import time
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
-from sqlalchemy.orm import sessionmaker
 
-from app.api.deps import get_current_user, get_management_db
-from app.config import ADMIN_DOMAIN, TENANT_DATABASE_TEMPLATE_URL
-from app.crud.mssp_operator import get_mssp_operator_by_email
+from app.api.deps import get_current_user
+from app.config import ADMIN_DOMAIN
+from app.crud.mssp_operator import get_login_mssp_operator
 from app.crud.tenant import get_tenant_by_domain
-from app.crud.user import get_user_by_email
+from app.crud.user import get_login_user
+from app.database import ManagementSessionLocal, tenant_engines, tenant_session_info
 from app.models.management import MSSPOperator
 from app.schemas.auth import LoginRequest, Token, Identity
 from app.schemas.user import UserResponse
-from app.security import create_access_token, decode_access_token, verify_password
+from app.security import create_access_token, decode_access_token, verify_password_async
 from app.utils.captcha import validate_captcha
-from app.utils.redis_client import redis_client
+from app.utils.logging_utils import SAMPLED
+from app.utils.rate_limit import get_client_ip, limit_login
+from app.utils.revocation import revoke_token
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
@@ -26,35 +26,44 @@ logger = logging.getLogger(__name__)
 
 
 @router.post("/login", response_model=Token)
-async def login(request: LoginRequest, db: AsyncSession = Depends(get_management_db)):
+async def login(request: LoginRequest, client_ip: str = Depends(get_client_ip)):
     # token payload: role, tenant_org, user_id, is_admin
 
-    if not validate_captcha(request.captcha_key, request.captcha_text):
+    # Before anything that costs Redis, database or bcrypt time; per IP, email and tenant domain
+    await limit_login(client_ip, request.email)
+
+    if not await validate_captcha(request.captcha_key, request.captcha_text):
         logger.error("Invalid CAPTCHA")
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid CAPTCHA")
 
     user = None
     tenant_org = None
-    is_admin = False
+    role = None
 
     _, email_domain = request.email.split("@")
 
-    if email_domain == ADMIN_DOMAIN:
-        user = await get_mssp_operator_by_email(db, request.email)
-        role = "mssp_operator"
-        tenant_org = "mssp"
-    else:
-        tenant = await get_tenant_by_domain(email_domain, db)
-        if tenant:
-            tenant_org = tenant.tenant_org
-            tenant_db_url = TENANT_DATABASE_TEMPLATE_URL.format(tenant_db_name=tenant.db_name)
-            tenant_engine = create_async_engine(tenant_db_url)
-            TenantSessionLocal = sessionmaker(bind=tenant_engine, class_=AsyncSession, expire_on_commit=False)
-            async with TenantSessionLocal() as tenant_db:
-                user = await get_user_by_email(request.email, tenant_db)
-                role = "tenant_admin" if user.is_admin else "tenant_user"
-
-    if user is None or not verify_password(request.password, user.hashed_password):
+    # Every connection is back in its pool before the password is hashed
+    async with ManagementSessionLocal() as db:
+        if email_domain == ADMIN_DOMAIN:
+            user = await get_login_mssp_operator(db, request.email)
+            role = "mssp_operator"
+            tenant_org = "mssp"
+        else:
+            # Cached, and points the tenant at the pooled engine of its server
+            tenant = await get_tenant_by_domain(email_domain, db)
+            if tenant:
+                tenant_org = tenant.tenant_org
+                async with tenant_engines.session(tenant.db_name, tenant_session_info(tenant)) as tenant_db:
+                    user = await get_login_user(request.email, tenant_db)
+                if user is not None:
+                    role = "tenant_admin" if user.is_admin else "tenant_user"
+
+    # Unknown and deactivated accounts are turned away without a bcrypt check; NULL is_active counts as active
+    if (
+        user is None
+        or user.is_active is False
+        or not await verify_password_async(request.password, user.hashed_password)
+    ):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
 
     is_admin = role == "mssp_operator" or user.is_admin
@@ -78,18 +87,17 @@ async def read_users_me(current_user: Identity = Depends(get_current_user)):
 @router.post("/logout")
 async def logout(token: str = Depends(oauth2_scheme)):
     # Decode the token to get the expiry time
-    logger.info(f"Token: {token}")
     payload = decode_access_token(token)
     if not payload:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
 
-    logger.info(f"Payload: {payload}")
+    logger.debug("Payload: %s", payload, extra=SAMPLED)
     expiry = payload.get("exp")
     jti = payload.get("jti")
     if not expiry or not jti:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
 
-    # Store the token in Redis with an expiry time
-    redis_client.setex(f"blacklist_{jti}", expiry - int(time.time()), "true")
+    # Store the token in Redis with an expiry time and notify the other workers
+    await revoke_token(jti, expiry)
     logger.info(f"Token with jti {jti} has been blacklisted.")
     return {"message": "Successfully logged out"}
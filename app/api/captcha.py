@@ -1,10 +1,12 @@
 import logging
 from io import BytesIO
 
-from fastapi import APIRouter, HTTPException, Response
+from fastapi import APIRouter, Depends, HTTPException, Response
 from fastapi.responses import StreamingResponse
 
 from app.utils.captcha import generate_captcha, get_captcha_image, validate_captcha
+from app.utils.logging_utils import SAMPLED
+from app.utils.rate_limit import get_client_ip, limit_captcha
 
 logger = logging.getLogger(__name__)
 
@@ -12,19 +14,18 @@ router = APIRouter()
 
 
 @router.get("")
-async def get_captcha():
-    logger.info("Generating CAPTCHA")
-
-    key = generate_captcha()
-
-    logger.info(f"CAPTCHA generated with key: {key}")
+async def get_captcha(client_ip: str = Depends(get_client_ip)):
+    # Every CAPTCHA handed out is one that has to be rendered
+    await limit_captcha(client_ip)
+    key = await generate_captcha()
+    logger.debug("CAPTCHA generated with key: %s", key, extra=SAMPLED)
 
     return {"key": key, "image_url": f"/captcha/image/{key}"}
 
 
 @router.get("/image/{key}")
 async def get_captcha_image_endpoint(key: str):
-    buf = get_captcha_image(key)
+    buf = await get_captcha_image(key)
     if buf is None:
         raise HTTPException(status_code=404, detail="CAPTCHA not found")
     return StreamingResponse(buf, media_type="image/png")
@@ -32,7 +33,7 @@ async def get_captcha_image_endpoint(key: str):
 
 @router.post("/validate")
 async def validate_captcha_endpoint(key: str, captcha_text: str):
-    if validate_captcha(key, captcha_text):
+    if await validate_captcha(key, captcha_text):
         return {"message": "CAPTCHA validated successfully"}
     else:
         raise HTTPException(status_code=400, detail="Invalid CAPTCHA")
@@ -4,17 +4,19 @@ from typing import AsyncGenerator, Union
 from datetime import datetime, UTC
 from fastapi import Depends, HTTPException, status, Path
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.config import MANAGEMENT_DATABASE_URL, TENANT_DATABASE_TEMPLATE_URL
 from app.crud.mssp_operator import get_mssp_operator_by_email
-from app.crud.tenant import get_tenant_by_domain, get_tenant_db_name
+from app.crud.tenant import get_cached_tenant, get_tenant_by_domain
 from app.crud.user import get_user_by_email
-from app.models.management import MSSPOperator
+from app.database import ManagementSessionLocal, lazy_tenant_session, tenant_engines, tenant_session_info
+from app.models.management import MSSPOperator, Tenant
 from app.models.tenant import User
-from app.security import decode_access_token
-from app.utils.redis_client import redis_client
+from app.security import decode_access_token, token_cache
+from app.utils.logging_utils import SAMPLED, tenant_org_var
+from app.utils.read_routing import is_pinned_to_primary, pin_to_primary, read_routing_stats
+from app.utils.revocation import is_token_revoked
+from app.utils.warmup import record_tenant_activity
 from app.schemas.auth import Identity
 
 logger = logging.getLogger(__name__)
@@ -23,33 +25,11 @@ logger = logging.getLogger(__name__)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 
-# Create the engine for the management database
-management_engine = create_async_engine(MANAGEMENT_DATABASE_URL)
-
-# Create a session factory for the management database
-ManagementSessionLocal = sessionmaker(bind=management_engine, class_=AsyncSession, expire_on_commit=False)
-
-
 async def get_management_db() -> AsyncGenerator[AsyncSession, None]:
     async with ManagementSessionLocal() as session:
         yield session
 
 
-async def get_tenant_db(
-    tenant_org: str = Path(...), management_db: AsyncSession = Depends(get_management_db)
-) -> AsyncGenerator[AsyncSession, None]:
-    tenant_db_name = await get_tenant_db_name(tenant_org.upper(), management_db)
-
-    if not tenant_db_name:
-        yield None
-    else:
-        tenant_db_url = TENANT_DATABASE_TEMPLATE_URL.format(tenant_db_name=tenant_db_name)
-        tenant_engine = create_async_engine(tenant_db_url)
-        TenantSessionLocal = sessionmaker(bind=tenant_engine, class_=AsyncSession, expire_on_commit=False)
-        async with TenantSessionLocal() as session:
-            yield session
-
-
 async def get_current_user(
     token: str = Depends(oauth2_scheme),
 ) -> Identity:
@@ -58,28 +38,96 @@ async def get_current_user(
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    payload = decode_access_token(token)
-    if payload is None:
-        raise credentials_exception
-
-    logger.info(f"Token payload: {payload}")
-    jti = payload.get("jti")
-    if redis_client.get(f"blacklist_{jti}"):
+    cached = token_cache.get(token)
+    if cached is not None:
+        identity, jti, exp = cached
+    else:
+        payload = decode_access_token(token)
+        if payload is None:
+            raise credentials_exception
+
+        logger.debug("Token payload: %s", payload, extra=SAMPLED)
+        jti = payload.get("jti")
+        exp = payload.get("exp")
+        identity = Identity(
+            role=payload.get("role"),
+            tenant_org=payload.get("tenant_org"),
+            user_id=payload.get("user_id"),
+            is_admin=payload.get("is_admin") in [True, "True", "true"],
+        )
+        token_cache.put(token, identity, jti, exp)
+
+    if await is_token_revoked(jti):
         logger.error("Token has been revoked")
+        token_cache.discard_jti(jti)
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token has been revoked")
 
-    expire = datetime.fromtimestamp(payload.get("exp"), UTC)
+    expire = datetime.fromtimestamp(exp, UTC)
 
     if datetime.now(UTC) > expire:
         logger.error("Token has expired")
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token has expired")
 
-    tenant_org: str = payload.get("tenant_org")
-    role: str = payload.get("role")
-    user_id = payload.get("user_id")
-    is_admin = payload.get("is_admin") in [True, "True", "true"]
+    tenant_org_var.set(identity.tenant_org)
+    return identity
+
+
+async def get_tenant_db(
+    tenant_org: str = Path(...),
+    current_user: Identity = Depends(get_current_user),
+) -> AsyncGenerator[AsyncSession, None]:
+    # Primary session, for routes that write. Lazy, like get_tenant_read_db: see _resolve_tenant
+    async def resolve():
+        tenant = await _resolve_tenant(tenant_org)
+        if tenant.status == "moving":
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Tenant is being moved to another database server, retry shortly",
+                headers={"Retry-After": "5"},
+            )
+        if tenant_engines.get_replica_url(tenant.db_name, tenant.replica_url) is not None:
+            # Pinned before the write runs; the client can't issue its next read before this response
+            await pin_to_primary(_read_your_writes_key(tenant.db_name, current_user))
+        return tenant_engines.get_sessionmaker(tenant.db_name), tenant_session_info(tenant)
+
+    async with lazy_tenant_session(resolve) as session:
+        yield session
+
+
+async def get_tenant_read_db(
+    tenant_org: str = Path(...),
+    current_user: Identity = Depends(get_current_user),
+) -> AsyncGenerator[AsyncSession, None]:
+    # Read-only replica session when the tenant has one, unless the client wrote in the last few seconds
+    async def resolve():
+        tenant = await _resolve_tenant(tenant_org)
+        session_factory = tenant_engines.get_replica_sessionmaker(tenant.db_name, tenant.replica_url)
+        if session_factory is None:
+            read_routing_stats["primary_reads"] += 1
+            session_factory = tenant_engines.get_sessionmaker(tenant.db_name)
+        elif await is_pinned_to_primary(_read_your_writes_key(tenant.db_name, current_user)):
+            read_routing_stats["pinned_reads"] += 1
+            session_factory = tenant_engines.get_sessionmaker(tenant.db_name)
+        else:
+            read_routing_stats["replica_reads"] += 1
+        return session_factory, tenant_session_info(tenant)
+
+    async with lazy_tenant_session(resolve) as session:
+        yield session
+
+
+async def _resolve_tenant(tenant_org: str) -> Tenant:
+    # Runs on the session's first query, inside the route: every dependency, permission checks included, has
+    # passed by then, so rejected requests never look up the tenant or touch its pool. Routes declare the
+    # session with scope="function" so it goes back to the pool before the response is serialized
+    async with ManagementSessionLocal() as management_db:
+        tenant = await get_cached_tenant(tenant_org.upper(), management_db)
+    record_tenant_activity(tenant.tenant_org)
+    return tenant
+
 
-    return Identity(role=role, tenant_org=tenant_org, user_id=user_id, is_admin=is_admin)
+def _read_your_writes_key(tenant_db_name: str, current_user: Identity) -> str:
+    return f"{tenant_db_name}:{current_user.role}:{current_user.user_id}"
 
 
 async def get_current_mssp_operator(
@@ -0,0 +1,27 @@
+from fastapi import APIRouter, Response, status
+from sqlalchemy import text
+
+from app.database import management_engine
+from app.utils.warmup import warmup_state
+
+router = APIRouter()
+
+
+@router.get("/live")
+async def liveness():
+    return {"status": "alive"}
+
+
+@router.get("/ready")
+async def readiness(response: Response):
+    # Not ready until the warm-up ran, and again once shutdown started so the balancer stops sending traffic
+    ready = warmup_state["ready"] and not warmup_state["shutting_down"]
+    if ready:
+        try:
+            async with management_engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+        except Exception:
+            ready = False
+    if not ready:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return {"status": "ready" if ready else "not_ready", **warmup_state}
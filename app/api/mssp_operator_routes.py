@@ -1,47 +1,105 @@
 import logging
+from contextlib import aclosing
+from typing import Literal
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from sqlalchemy import select
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.ext.asyncio import AsyncSession
 
 import app.crud.tenant as crud_tenant
+import app.utils.provisioning as provisioning
 from app.api.deps import get_current_mssp_operator, get_management_db
+from app.config import TENANT_DEFAULT_MODE
+from app.crud.database_server import (
+    create_database_server,
+    get_database_server_by_name,
+    get_server_loads,
+    place_new_tenant,
+    route_tenant,
+)
+from app.crud.provisioning_job import (
+    create_provisioning_job,
+    get_open_provisioning_job,
+    get_provisioning_job,
+)
+from app.crud.task import get_tasks_page_by_created
 from app.crud.tenant import get_all_tenants
+from app.database import tenant_engines
 from app.models.management import MSSPOperator
-from app.models.tenant import Task
+from app.schemas.tenant import DatabaseServerCreate, DatabaseServerLoad, ProvisioningJobResponse
 from app.schemas.user import UserCreate
 from app.schemas.auth import Identity
+from app.security import bcrypt_executor, hash_password_async, token_cache
+from app.utils.captcha import captcha_pool_stats_snapshot
+from app.utils.metrics import metrics_stats
+from app.utils.provisioning import claim_stopped_job, provisioning_stats, submit_provisioning_job
+from app.utils.rate_limit import rate_limit_stats_snapshot
+from app.utils.read_cache import read_cache_stats
+from app.utils.read_routing import read_routing_stats
+from app.utils.revocation import revocation_list
+from app.utils.tenant_directory import tenant_directory
+from app.utils.responses import ndjson_line
+from app.utils.tenant_fanout import merge_tenant_streams
+from app.utils.tenant_pool import warm_pool_stats_snapshot
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
 
-# @router.get("/tasks/")
-# async def read_all_tasks(current_user: MSSPOperator = Depends(get_current_mssp_operator)):
-#     if not current_user:
-#         raise HTTPException(status_code=403, detail="Not authorized")
+@router.get("/tasks/")
+async def read_all_tasks(
+    limit: int = Query(None, ge=1),
+    mssp: Identity = Depends(get_current_mssp_operator),
+    management_db: AsyncSession = Depends(get_management_db),
+):
+    tenants = sorted(await get_all_tenants(management_db), key=lambda tenant: tenant.tenant_org)
+    for tenant in tenants:
+        await route_tenant(tenant, management_db)
+    return StreamingResponse(_all_tasks_ndjson(tenants, limit), media_type="application/x-ndjson")
+
+
+async def _all_tasks_ndjson(tenants: list, limit: int = None):
+    # Tasks from every tenant merged by (created_at, id), then one summary line with any tenants that failed
+    failures = []
+    count = 0
+    async with aclosing(merge_tenant_streams(tenants, _fetch_tasks_page, _created_key, failures)) as rows:
+        async for tenant, row in rows:
+            # Rows from dedicated databases may have no tenant_org of their own
+            yield ndjson_line({**row, "tenant_org": tenant.tenant_org})
+            count += 1
+            if limit is not None and count >= limit:
+                break
 
-#     tasks = []
-#     tenants = await get_all_tenants()
-#     for tenant in tenants:
-#         engine = create_async_engine(tenant.db_url)
-#         SessionLocal = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
-#         async with SessionLocal() as session:
-#             result = await session.execute(select(Task))
-#             tasks.extend(result.scalars().all())
+    summary = {
+        "tenants": len(tenants),
+        "tasks": count,
+        "partial": bool(failures),
+        "failed_tenants": [
+            {"tenant_org": failure["tenant"].tenant_org, "error": failure["error"]} for failure in failures
+        ],
+    }
+    yield ndjson_line({"summary": summary})
 
-#     return tasks
+
+async def _fetch_tasks_page(tenant, after: tuple, limit: int) -> list[dict]:
+    tenant_org = tenant.tenant_org if tenant.mode == "shared" else None
+    return await get_tasks_page_by_created(tenant_engines.get_engine(tenant.db_name), after, limit, tenant_org)
+
+
+def _created_key(row: dict) -> tuple:
+    return row["created_at"], row["id"]
 
 
 class TenantAdminCreate(BaseModel):
     tenant_org: str
     admin_user: UserCreate
+    # "shared" suits small tenants: no database or connection pool of their own
+    mode: Literal["dedicated", "shared"] = TENANT_DEFAULT_MODE
 
 
-@router.post("/tenants/")
+@router.post("/tenants/", status_code=202)
 async def create_tenant(
     request: TenantAdminCreate,
     mssp: Identity = Depends(get_current_mssp_operator),
@@ -52,15 +110,101 @@ async def create_tenant(
 
     if not tenant_org.isalnum():
         raise HTTPException(status_code=400, detail="Invalid tenant ID")
+    if await crud_tenant.get_tenant_by_org(tenant_org, management_db) is not None:
+        raise HTTPException(status_code=400, detail=f"Tenant {tenant_org} already exists")
+    open_job = await get_open_provisioning_job(tenant_org, management_db)
+    if open_job is not None:
+        raise HTTPException(
+            status_code=400, detail=f"Tenant {tenant_org} has an unfinished provisioning job {open_job.id}"
+        )
 
     try:
-        # run the async function in the background
-        await crud_tenant.create_tenant(mssp, tenant_org, request.admin_user, management_db)
+        # The shared database is on the default server
+        server_id = await place_new_tenant(management_db) if request.mode == "dedicated" else None
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=str(e))
 
-        # Optionally, update tenant configuration storage
-        return {"message": f"Tenant {tenant_org} created successfully."}
+    # Only the hash is persisted with the job
+    admin = request.admin_user
+    hashed_password = await hash_password_async(admin.password)
+    job = await create_provisioning_job(
+        tenant_org, admin.name, admin.email, hashed_password, management_db, server_id=server_id, mode=request.mode
+    )
+    submit_provisioning_job(job.id)
+    return {"job_id": job.id, "status": job.status, "message": f"Tenant {tenant_org} is being provisioned."}
+
+
+@router.get("/jobs/{job_id}", response_model=ProvisioningJobResponse)
+async def read_provisioning_job(
+    job_id: str,
+    mssp: Identity = Depends(get_current_mssp_operator),
+    management_db: AsyncSession = Depends(get_management_db),
+):
+    job = await get_provisioning_job(job_id, management_db)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return ProvisioningJobResponse.model_validate(job, from_attributes=True)
+
+
+@router.post("/jobs/{job_id}/resume", status_code=202, response_model=ProvisioningJobResponse)
+async def resume_provisioning_job(
+    job_id: str,
+    mssp: Identity = Depends(get_current_mssp_operator),
+    management_db: AsyncSession = Depends(get_management_db),
+):
+    job = await get_provisioning_job(job_id, management_db)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if not await claim_stopped_job(job, "pending", management_db):
+        raise HTTPException(status_code=409, detail=f"Job is {job.status} and cannot be resumed")
+    submit_provisioning_job(job.id)
+    return ProvisioningJobResponse.model_validate(job, from_attributes=True)
+
+
+@router.post("/jobs/{job_id}/rollback", response_model=ProvisioningJobResponse)
+async def rollback_provisioning_job(
+    job_id: str,
+    mssp: Identity = Depends(get_current_mssp_operator),
+    management_db: AsyncSession = Depends(get_management_db),
+):
+    job = await get_provisioning_job(job_id, management_db)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if not await claim_stopped_job(job, "rolling_back", management_db):
+        raise HTTPException(status_code=409, detail=f"Job is {job.status} and cannot be rolled back")
+    try:
+        await provisioning.rollback_provisioning_job(job, management_db)
     except Exception as e:
+        await provisioning.record_failed_rollback(job, management_db, str(e))
         raise HTTPException(status_code=400, detail=str(e))
+    return ProvisioningJobResponse.model_validate(job, from_attributes=True)
+
+
+@router.get("/database_servers/", response_model=list[DatabaseServerLoad])
+async def read_database_servers(
+    mssp: Identity = Depends(get_current_mssp_operator),
+    management_db: AsyncSession = Depends(get_management_db),
+):
+    return await get_server_loads(management_db)
+
+
+@router.post("/database_servers/", status_code=201, response_model=DatabaseServerLoad)
+async def register_database_server(
+    request: DatabaseServerCreate,
+    mssp: Identity = Depends(get_current_mssp_operator),
+    management_db: AsyncSession = Depends(get_management_db),
+):
+    if "{tenant_db_name}" not in request.url_template:
+        raise HTTPException(status_code=400, detail="url_template must contain {tenant_db_name}")
+    if await get_database_server_by_name(request.name, management_db) is not None:
+        raise HTTPException(status_code=400, detail=f"Database server {request.name} already exists")
+    server = await create_database_server(
+        request.name, request.url_template, management_db, request.replica_url_template, request.max_tenants
+    )
+    logger.info(f"Registered database server {server.name}")
+    return DatabaseServerLoad(
+        server_id=server.id, name=server.name, is_active=server.is_active, max_tenants=server.max_tenants, tenants=0
+    )
 
 
 @router.get("/tenants/")
@@ -77,3 +221,21 @@ async def get_tenant(
 ):
     tenant = await crud_tenant.get_tenant_by_org(tenant_org, management_db)
     return tenant
+
+
+@router.get("/stats")
+async def read_stats(mssp: Identity = Depends(get_current_mssp_operator)):
+    return {
+        "tenant_engines": tenant_engines.stats(),
+        "tenant_directory": tenant_directory.stats(),
+        "bcrypt": bcrypt_executor.stats(),
+        "revocations": revocation_list.stats(),
+        "token_cache": token_cache.stats(),
+        "warm_pool": warm_pool_stats_snapshot(),
+        "provisioning": provisioning_stats(),
+        "captcha_pool": captcha_pool_stats_snapshot(),
+        "rate_limits": rate_limit_stats_snapshot(),
+        "metrics": metrics_stats(),
+        "read_cache": read_cache_stats,
+        "read_routing": read_routing_stats,
+    }
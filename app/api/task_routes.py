@@ -1,54 +1,160 @@
 import logging
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.ext.asyncio import AsyncSession
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
 
-from app.api.deps import get_current_tenant_user, get_tenant_db
-from app.crud.task import create_task, delete_task, get_task, get_tasks_by_user, update_task
-from app.models.tenant import User
-from app.schemas.task import TaskCreate
+from app.api.deps import get_current_tenant_user, get_tenant_db, get_tenant_read_db
+
+from app.config import TASK_BULK_CHUNK_SIZE, TASK_PAGE_SIZE, TASK_PAGE_SIZE_MAX
+import app.crud.task as crud_task
+from app.crud.task import bulk_write_tasks, create_task, get_task_cached, get_tasks_by_user, stream_tasks_by_user
+from app.database import resolve_tenant_session
+from app.utils.responses import ndjson_line
+from app.schemas.task import BulkTaskOperation, BulkTaskResult, TaskCreate, TaskResponse, TaskUpdate
 from app.schemas.auth import Identity
 
 router = APIRouter()
 
+logger = logging.getLogger(__name__)
+
 
-@router.post("/{tenant_org}/tasks/")
+@router.post("/{tenant_org}/tasks/", response_model=TaskResponse)
 async def create_task_for_user(
     task: TaskCreate,
     current_user: Identity = Depends(get_current_tenant_user),
-    db: AsyncSession = Depends(get_tenant_db),
+    db: AsyncSession = Depends(get_tenant_db, scope="function"),
 ):
     return await create_task(db, task, current_user.user_id)
 
 
-@router.get("/{tenant_org}/tasks/")
+@router.get("/{tenant_org}/tasks/", response_model=list[TaskResponse])
 async def read_tasks_by_user(
-    current_user: Identity = Depends(get_current_tenant_user), db: AsyncSession = Depends(get_tenant_db)
+    response: Response,
+    limit: int = Query(TASK_PAGE_SIZE, ge=1, le=TASK_PAGE_SIZE_MAX),
+    after: int = None,
+    stream: bool = False,
+    current_user: Identity = Depends(get_current_tenant_user),
+    db: AsyncSession = Depends(get_tenant_read_db, scope="function"),
+):
+    if stream:
+        # NDJSON over a server-side cursor: every task after the cursor, without buffering
+        await resolve_tenant_session(db)
+        rows = stream_tasks_by_user(AsyncEngine(db.get_bind()), current_user.user_id, after)
+        lines = (ndjson_line(row) async for row in rows)
+        return StreamingResponse(lines, media_type="application/x-ndjson")
+
+    # Fetch one extra row to find out whether there is a next page
+    tasks = await get_tasks_by_user(db, current_user.user_id, limit + 1, after)
+    if len(tasks) > limit:
+        tasks = tasks[:limit]
+        response.headers["X-Next-Cursor"] = str(tasks[-1].id)
+    return tasks
+
+
+@router.post("/{tenant_org}/tasks/bulk", response_model=list[BulkTaskResult])
+async def bulk_tasks(
+    request: Request,
+    current_user: Identity = Depends(get_current_tenant_user),
+    db: AsyncSession = Depends(get_tenant_db, scope="function"),
 ):
-    return await get_tasks_by_user(db, current_user.user_id)
+    # Body is NDJSON, one {"op": "create" | "update" | "delete", ...} per line, read incrementally
+    results = []
+    chunk = []
+    index = 0
+    async for line in _ndjson_lines(request):
+        op = "unknown"
+        try:
+            operation = BulkTaskOperation.model_validate_json(line)
+            op = operation.op
+            chunk.append((index, op, _bulk_item(operation)))
+        except (ValidationError, ValueError) as e:
+            results.append(BulkTaskResult(index=index, op=op, status="invalid", detail=str(e)))
+        index += 1
+        if len(chunk) >= TASK_BULK_CHUNK_SIZE:
+            results.extend(await _apply_bulk_chunk(db, current_user, chunk))
+            chunk = []
+    if chunk:
+        results.extend(await _apply_bulk_chunk(db, current_user, chunk))
+    return sorted(results, key=lambda result: result.index)
+
+
+def _bulk_item(operation: BulkTaskOperation):
+    if operation.op == "create":
+        return TaskCreate(title=operation.title, description=operation.description)
+    if operation.op == "update":
+        return TaskUpdate(id=operation.id, title=operation.title, description=operation.description)
+    if operation.id is None:
+        raise ValueError("delete requires an id")
+    return operation.id
 
 
-@router.get("/{tenant_org}/tasks/{task_id}")
+async def _apply_bulk_chunk(db: AsyncSession, current_user: Identity, chunk: list) -> list[BulkTaskResult]:
+    creates = [item for _, op, item in chunk if op == "create"]
+    updates = [item for _, op, item in chunk if op == "update"]
+    deletes = [item for _, op, item in chunk if op == "delete"]
+    try:
+        created_ids, updated_ids, deleted_ids = await bulk_write_tasks(
+            db, current_user.user_id, creates, updates, deletes, owner_only=not current_user.is_admin
+        )
+    except HTTPException:
+        # From resolving the tenant on the first chunk, e.g. a tenant that is being moved
+        raise
+    except Exception as e:
+        logger.error(f"Bulk task chunk failed: {e}")
+        return [BulkTaskResult(index=index, op=op, status="failed", detail=str(e)) for index, op, _ in chunk]
+
+    results = []
+    created_ids = iter(created_ids)
+    for index, op, item in chunk:
+        if op == "create":
+            results.append(BulkTaskResult(index=index, op=op, status="created", id=next(created_ids)))
+        elif op == "update":
+            status = "updated" if item.id in updated_ids else "not_found"
+            results.append(BulkTaskResult(index=index, op=op, status=status, id=item.id))
+        else:
+            status = "deleted" if item in deleted_ids else "not_found"
+            results.append(BulkTaskResult(index=index, op=op, status=status, id=item))
+    return results
+
+
+async def _ndjson_lines(request: Request):
+    buffer = b""
+    async for data in request.stream():
+        buffer += data
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield line
+    if buffer.strip():
+        yield buffer
+
+
+@router.get("/{tenant_org}/tasks/{task_id}", response_model=TaskResponse)
 async def read_task(
-    task_id: int, current_user: User = Depends(get_current_tenant_user), db: AsyncSession = Depends(get_tenant_db)
+    task_id: int,
+    current_user: Identity = Depends(get_current_tenant_user),
+    db: AsyncSession = Depends(get_tenant_read_db, scope="function"),
 ):
-    task = await get_task(db, task_id)
+    task = await get_task_cached(db, task_id)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
-    if task.user_id != current_user.id and not current_user.is_admin:
+    if task["user_id"] != current_user.user_id and not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Not enough permissions")
     return task
 
 
-@router.put("/{tenant_org}/tasks/{task_id}")
+@router.put("/{tenant_org}/tasks/{task_id}", response_model=TaskResponse)
 async def update_task(
     task_id: int,
     title: str,
     description: str,
-    current_user: User = Depends(get_current_tenant_user),
-    db: AsyncSession = Depends(get_tenant_db),
+    current_user: Identity = Depends(get_current_tenant_user),
+    db: AsyncSession = Depends(get_tenant_db, scope="function"),
 ):
-    task = await update_task(db, task_id, title, description, current_user.id)
+    # The crud functions are shadowed by these route handlers
+    task = await crud_task.update_task(db, task_id, title, description, current_user.user_id)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
     return task
@@ -56,9 +162,11 @@ async def update_task(
 
 @router.delete("/{tenant_org}/tasks/{task_id}")
 async def delete_task(
-    task_id: int, current_user: User = Depends(get_current_tenant_user), db: AsyncSession = Depends(get_tenant_db)
+    task_id: int,
+    current_user: Identity = Depends(get_current_tenant_user),
+    db: AsyncSession = Depends(get_tenant_db, scope="function"),
 ):
-    task = await delete_task(db, task_id, current_user.id)
+    task = await crud_task.delete_task(db, task_id, current_user.user_id)
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
     return {"message": "Task deleted"}
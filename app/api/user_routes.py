@@ -4,8 +4,14 @@ from typing import Union
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.api.deps import get_current_tenant_user, get_current_user, get_tenant_db, get_current_tenant_admin
-from app.crud.user import create_user, get_user_by_email, get_user_by_id
+from app.api.deps import (
+    get_current_tenant_admin,
+    get_current_tenant_user,
+    get_current_user,
+    get_tenant_db,
+    get_tenant_read_db,
+)
+from app.crud.user import create_user, get_user_by_email, get_user_cached
 from app.models.management import MSSPOperator
 from app.models.tenant import User
 from app.schemas.user import UserCreate, UserResponse
@@ -21,7 +27,7 @@ async def register_user(
     tenant_org: str,
     new_user: UserCreate,
     current_user: Identity = Depends(get_current_tenant_admin),
-    db: AsyncSession = Depends(get_tenant_db),
+    db: AsyncSession = Depends(get_tenant_db, scope="function"),
 ):
     tenant_org = tenant_org.upper()
     db_user = await get_user_by_email(new_user.email, db)
@@ -35,11 +41,11 @@ async def read_user(
     tenant_org: str,
     user_id: int,
     current_user: Identity = Depends(get_current_tenant_user),
-    db: AsyncSession = Depends(get_tenant_db),
+    db: AsyncSession = Depends(get_tenant_read_db, scope="function"),
 ):
     if current_user.user_id != user_id and not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Not enough permissions")
-    user = await get_user_by_id(user_id, db)
+    user = await get_user_cached(user_id, db)
     if user is None:
         raise HTTPException(status_code=404, detail="User not found")
     return user
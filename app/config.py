@@ -1,13 +1,20 @@
+import atexit
+import json
+import logging
 import os
-from logging.config import dictConfig
+import queue
+from logging.handlers import QueueHandler, QueueListener
 
 from dotenv import load_dotenv
 
+from app.utils.logging_utils import ContextFilter, JsonFormatter, RateLimitFilter, SamplingFilter
+
 load_dotenv(override=True)  # Load environment variables from .env file
 
 MANAGEMENT_DATABASE_URL = os.getenv("MANAGEMENT_DATABASE_URL")
 MANAGEMENT_DATABASE_URL_SYNC = os.getenv("MANAGEMENT_DATABASE_URL_SYNC")
 TENANT_DATABASE_TEMPLATE_URL = os.getenv("TENANT_DATABASE_TEMPLATE_URL")  # Template URL for tenant databases
+TENANT_REPLICA_TEMPLATE_URL = os.getenv("TENANT_REPLICA_TEMPLATE_URL")  # Same, for read replicas
 ADMIN_DOMAIN = os.getenv("ADMIN_DOMAIN")
 ADMIN_USERNAME = os.getenv("ADMIN_USERNAME")
 ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD")
@@ -15,50 +22,126 @@ ADMIN_HOST = os.getenv("ADMIN_HOST")
 ADMIN_PORT = os.getenv("ADMIN_PORT")
 SECRET_KEY = os.getenv("SECRET_KEY")
 DEBUG = os.getenv("DEBUG", "False").lower() in ("true", "1", "t")
+TENANT_ENGINE_CACHE_SIZE = int(os.getenv("TENANT_ENGINE_CACHE_SIZE", "100"))  # Max tenant engines kept alive per worker
+TENANT_POOL_SIZE = int(os.getenv("TENANT_POOL_SIZE", "5"))
+TENANT_MAX_OVERFLOW = int(os.getenv("TENANT_MAX_OVERFLOW", "10"))
+TENANT_POOL_RECYCLE = int(os.getenv("TENANT_POOL_RECYCLE", "3600"))
+# Per-tenant pool sizing, e.g. {"tenant_ACME": {"pool_size": 20, "max_overflow": 20}}
+TENANT_POOL_OVERRIDES = json.loads(os.getenv("TENANT_POOL_OVERRIDES", "{}"))
+TENANT_CACHE_TTL = float(os.getenv("TENANT_CACHE_TTL", "300"))  # Seconds a tenant lookup is served from memory
+TENANT_CACHE_NEGATIVE_TTL = float(os.getenv("TENANT_CACHE_NEGATIVE_TTL", "30"))  # Same, for unknown tenants
+BCRYPT_EXECUTOR = os.getenv("BCRYPT_EXECUTOR", "thread")  # "thread" or "process"
+BCRYPT_WORKERS = int(os.getenv("BCRYPT_WORKERS", "4"))
+BCRYPT_MAX_QUEUE = int(os.getenv("BCRYPT_MAX_QUEUE", "64"))  # Hashes allowed to wait for a worker before returning 503
+REVOCATION_MAX_LAG = float(os.getenv("REVOCATION_MAX_LAG", "5"))  # Seconds before falling back to Redis lookups
+REVOCATION_BLOOM_FILTER = os.getenv("REVOCATION_BLOOM_FILTER", "False").lower() in ("true", "1", "t")
+REVOCATION_BLOOM_SIZE = int(os.getenv("REVOCATION_BLOOM_SIZE", str(1 << 20)))  # Bits
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))  # Verified tokens kept per worker, 0 disables
+TASK_PAGE_SIZE = int(os.getenv("TASK_PAGE_SIZE", "100"))  # Default page size for task listings
+TASK_PAGE_SIZE_MAX = int(os.getenv("TASK_PAGE_SIZE_MAX", "1000"))
+TASK_STREAM_BATCH_SIZE = int(os.getenv("TASK_STREAM_BATCH_SIZE", "500"))  # Rows fetched per server-side cursor batch
+TASK_BULK_CHUNK_SIZE = int(os.getenv("TASK_BULK_CHUNK_SIZE", "500"))  # Bulk task operations per transaction
+MIGRATION_CONCURRENCY = int(os.getenv("MIGRATION_CONCURRENCY", "16"))  # Tenant databases migrated at once
+FANOUT_CONCURRENCY = int(os.getenv("FANOUT_CONCURRENCY", "8"))  # Tenant databases queried at once by cross-tenant reads
+FANOUT_TENANT_TIMEOUT = float(os.getenv("FANOUT_TENANT_TIMEOUT", "5"))  # Seconds per tenant page before giving up
+FANOUT_PAGE_SIZE = int(os.getenv("FANOUT_PAGE_SIZE", "200"))
+TENANT_POOL_TARGET = int(os.getenv("TENANT_POOL_TARGET", "0"))  # Spare tenant databases to keep ready, 0 disables
+TENANT_POOL_REFILL_INTERVAL = float(os.getenv("TENANT_POOL_REFILL_INTERVAL", "30"))
+PROVISIONING_CONCURRENCY = int(os.getenv("PROVISIONING_CONCURRENCY", "2"))  # Tenant provisioning jobs run per worker
+PROVISIONING_STALE_SECONDS = int(os.getenv("PROVISIONING_STALE_SECONDS", "300"))  # Jobs without heartbeat are resumable
+TENANT_PLACEMENT = os.getenv("TENANT_PLACEMENT", "count")  # Place new tenants by "count" or "size" of a server
+# Whether the server in TENANT_DATABASE_TEMPLATE_URL still takes new tenants once others are registered
+TENANT_PLACE_ON_DEFAULT_SERVER = os.getenv("TENANT_PLACE_ON_DEFAULT_SERVER", "True").lower() in ("true", "1", "t")
+TENANT_DEFAULT_MODE = os.getenv("TENANT_DEFAULT_MODE", "dedicated")  # "dedicated" or "shared" database for new tenants
+SHARED_TENANT_DATABASE = os.getenv("SHARED_TENANT_DATABASE", "tenant_shared")  # Database holding the shared tenants
+TENANT_MOVE_BATCH = int(os.getenv("TENANT_MOVE_BATCH", "1000"))  # Rows per statement when moving a tenant
+CAPTCHA_POOL_SIZE = int(os.getenv("CAPTCHA_POOL_SIZE", "200"))  # Pre-rendered CAPTCHAs kept in Redis, 0 disables
+CAPTCHA_POOL_BATCH = int(os.getenv("CAPTCHA_POOL_BATCH", "20"))
+CAPTCHA_POOL_REFILL_INTERVAL = float(os.getenv("CAPTCHA_POOL_REFILL_INTERVAL", "10"))
+CAPTCHA_RENDER_WORKERS = int(os.getenv("CAPTCHA_RENDER_WORKERS", "1"))  # Threads rendering CAPTCHA images
+METRICS_TENANT_LABEL_LIMIT = int(os.getenv("METRICS_TENANT_LABEL_LIMIT", "200"))  # Distinct tenants per metric label
+LOG_LEVEL = os.getenv("LOG_LEVEL", "DEBUG" if DEBUG else "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")  # "text" or "json"
+LOG_FILE = os.getenv("LOG_FILE", "")  # Also write to this file, e.g. app.log; empty logs to stderr only
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.01"))  # Share of per-request debug/info messages kept
+LOG_RATE_LIMIT = float(os.getenv("LOG_RATE_LIMIT", "20"))  # Per-request records per second per call site, 0 disables
+READ_CACHE_TTL = int(os.getenv("READ_CACHE_TTL", "60"))  # Seconds single task/user reads stay in Redis, 0 disables
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))  # Reads stay on the primary after a write
+REDIS_HOST = os.getenv("REDIS_HOST")
+REDIS_PORT = os.getenv("REDIS_PORT")
+REDIS_DB = os.getenv("REDIS_DB")
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "50"))
+REDIS_POOL_TIMEOUT = float(os.getenv("REDIS_POOL_TIMEOUT", "2"))  # Seconds to wait for a free pooled connection
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", "1"))
+REDIS_SOCKET_CONNECT_TIMEOUT = float(os.getenv("REDIS_SOCKET_CONNECT_TIMEOUT", "1"))
+REDIS_HEALTH_CHECK_INTERVAL = int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", "30"))
+WARMUP_TENANTS = int(os.getenv("WARMUP_TENANTS", "20"))  # Most active tenants whose pools are opened at startup
+WARMUP_CONNECTIONS = int(os.getenv("WARMUP_CONNECTIONS", "2"))  # Connections opened per warmed pool
+WARMUP_TIMEOUT = float(os.getenv("WARMUP_TIMEOUT", "10"))  # Seconds startup waits for the warm-up
+TENANT_ACTIVITY_FLUSH_INTERVAL = float(os.getenv("TENANT_ACTIVITY_FLUSH_INTERVAL", "60"))  # Seconds
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))  # Smallest response body compressed, 0 disables
+COMPRESSION_LEVEL = int(os.getenv("COMPRESSION_LEVEL", "6"))  # gzip level
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))  # Used when the brotli package is installed
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "True").lower() in ("true", "1", "t")
+# Token buckets as "burst/seconds": that many requests at once, refilled evenly over the seconds; empty disables one
+RATE_LIMIT_LOGIN_IP = os.getenv("RATE_LIMIT_LOGIN_IP", "30/60")  # Login attempts per client IP
+RATE_LIMIT_LOGIN_EMAIL = os.getenv("RATE_LIMIT_LOGIN_EMAIL", "10/60")  # Login attempts per email address
+RATE_LIMIT_LOGIN_DOMAIN = os.getenv("RATE_LIMIT_LOGIN_DOMAIN", "300/60")  # Login attempts per tenant email domain
+RATE_LIMIT_CAPTCHA_IP = os.getenv("RATE_LIMIT_CAPTCHA_IP", "60/60")  # CAPTCHAs generated per client IP
+RATE_LIMIT_LOCAL = os.getenv("RATE_LIMIT_LOCAL", "20/5")  # Per client IP and worker, checked before Redis
+RATE_LIMIT_LOCAL_MAX_CLIENTS = int(os.getenv("RATE_LIMIT_LOCAL_MAX_CLIENTS", "10000"))  # Buckets kept per worker
 DISABLE_CAPTCHA = True  # os.getenv("DISABLE_CAPTCHA", "False").lower() in ("true", "1", "t")
 
 
+_log_listener: QueueListener = None
+
+
 def setup_logging():
-    logging_config = {
-        "version": 1,
-        "disable_existing_loggers": False,
-        "formatters": {
-            "default": {
-                "format": "[%(asctime)s] %(levelname)s in %(module)s: %(message)s",
-            },
-            "detailed": {
-                "format": "[%(asctime)s] %(levelname)s in %(module)s: %(message)s (%(pathname)s:%(lineno)d)",
-            },
-        },
-        "handlers": {
-            "console": {
-                "level": "DEBUG",
-                "class": "logging.StreamHandler",
-                "formatter": "default",
-            },
-            "file": {
-                "level": "DEBUG",
-                "class": "logging.FileHandler",
-                "filename": "app.log",
-                "formatter": "detailed",
-            },
-        },
-        "root": {
-            "level": "DEBUG",
-            "handlers": ["console", "file"],
-        },
-        "loggers": {
-            "uvicorn.error": {
-                "level": "INFO",
-                "handlers": ["console", "file"],
-                "propagate": False,
-            },
-            "uvicorn.access": {
-                "level": "INFO",
-                "handlers": ["console", "file"],
-                "propagate": False,
-            },
-        },
-    }
-
-    dictConfig(logging_config)
+    global _log_listener
+    if _log_listener is not None:
+        _log_listener.stop()
+
+    if LOG_FORMAT == "json":
+        console_formatter = file_formatter = JsonFormatter()
+    else:
+        console_formatter = logging.Formatter("[%(asctime)s] %(levelname)s in %(module)s: %(message)s")
+        file_formatter = logging.Formatter(
+            "[%(asctime)s] %(levelname)s in %(module)s: %(message)s (%(pathname)s:%(lineno)d)"
+        )
+    console = logging.StreamHandler()
+    console.setFormatter(console_formatter)
+    handlers = [console]
+    if LOG_FILE:
+        file = logging.FileHandler(LOG_FILE)
+        file.setFormatter(file_formatter)
+        handlers.append(file)
+
+    # Callers only enqueue records; formatting and writing happen on the listener thread
+    log_queue = queue.SimpleQueue()
+    queue_handler = QueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter(LOG_SAMPLE_RATE))
+    queue_handler.addFilter(RateLimitFilter(LOG_RATE_LIMIT))
+    queue_handler.addFilter(ContextFilter())
+
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(LOG_LEVEL)
+    for name in ("uvicorn.error", "uvicorn.access"):
+        uvicorn_logger = logging.getLogger(name)
+        uvicorn_logger.handlers = [queue_handler]
+        uvicorn_logger.setLevel(logging.INFO)
+        uvicorn_logger.propagate = False
+
+    _log_listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _log_listener.start()
+
+
+def stop_logging():
+    # Flushes whatever is still queued
+    global _log_listener
+    if _log_listener is not None:
+        _log_listener.stop()
+        _log_listener = None
+
+
+atexit.register(stop_logging)
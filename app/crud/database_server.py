@@ -0,0 +1,162 @@
+import logging
+import time
+
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.config import TENANT_CACHE_TTL, TENANT_PLACE_ON_DEFAULT_SERVER, TENANT_PLACEMENT
+from app.crud.provisioning_job import OPEN_STATUSES
+from app.database import management_engine, tenant_engines
+from app.models.management import DatabaseServer, ProvisioningJob, Tenant
+from app.utils.metrics import SHARED, tenant_org_labels
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SERVER_NAME = "default"
+
+# server id -> (DatabaseServer, expiry); servers are read on every tenant lookup miss but hardly ever change
+_servers: dict[int, tuple[DatabaseServer, float]] = {}
+# server id -> engine without a database selected, for CREATE/DROP DATABASE and size queries
+_admin_engines: dict[int, AsyncEngine] = {}
+
+
+async def create_database_server(
+    name: str, url_template: str, management_db: AsyncSession, replica_url_template: str = None, max_tenants: int = None
+) -> DatabaseServer:
+    server = DatabaseServer(
+        name=name, url_template=url_template, replica_url_template=replica_url_template, max_tenants=max_tenants
+    )
+    management_db.add(server)
+    await management_db.commit()
+    await management_db.refresh(server)
+    return server
+
+
+async def get_database_servers(management_db: AsyncSession) -> list[DatabaseServer]:
+    result = await management_db.execute(select(DatabaseServer).order_by(DatabaseServer.id))
+    return result.scalars().all()
+
+
+async def get_database_server_by_name(name: str, management_db: AsyncSession) -> DatabaseServer:
+    result = await management_db.execute(select(DatabaseServer).where(DatabaseServer.name == name))
+    return result.scalars().first()
+
+
+async def get_database_server(server_id: int | None, management_db: AsyncSession) -> DatabaseServer | None:
+    if server_id is None:
+        return None
+    entry = _servers.get(server_id)
+    if entry is not None and entry[1] >= time.monotonic():
+        return entry[0]
+    result = await management_db.execute(select(DatabaseServer).where(DatabaseServer.id == server_id))
+    server = result.scalars().first()
+    if server is None:
+        raise Exception(f"Database server {server_id} not found")
+    _servers[server_id] = (server, time.monotonic() + TENANT_CACHE_TTL)
+    return server
+
+
+async def route_tenant_database(db_name: str, server_id: int | None, management_db: AsyncSession):
+    # Points the engine registry at the server holding db_name, before anything opens a session on it
+    server = await get_database_server(server_id, management_db)
+    if server is None:
+        tenant_engines.place(db_name)
+    else:
+        tenant_engines.place(db_name, server.url_template, server.replica_url_template)
+
+
+async def route_tenant(tenant: Tenant, management_db: AsyncSession):
+    await route_tenant_database(tenant.db_name, tenant.server_id, management_db)
+    # The shared database holds many tenants, a dedicated one is reported by the tenant it belongs to
+    label = SHARED if tenant.mode == "shared" else tenant_org_labels(tenant.tenant_org)
+    tenant_engines.set_metrics_label(tenant.db_name, label)
+
+
+def get_admin_engine(server: DatabaseServer | None) -> AsyncEngine:
+    if server is None:
+        return management_engine
+    engine = _admin_engines.get(server.id)
+    if engine is None:
+        # Only used for the odd DDL statement, not worth a pool
+        engine = create_async_engine(server.url_template.format(tenant_db_name=""), poolclass=NullPool)
+        _admin_engines[server.id] = engine
+    return engine
+
+
+async def get_server_loads(management_db: AsyncSession, with_size: bool = TENANT_PLACEMENT == "size") -> list[dict]:
+    servers = await get_database_servers(management_db)
+    tenant_counts = dict(
+        (await management_db.execute(select(Tenant.server_id, func.count()).group_by(Tenant.server_id))).all()
+    )
+    # Tenants still being provisioned already count against their server
+    job_counts = dict(
+        (
+            await management_db.execute(
+                select(ProvisioningJob.server_id, func.count())
+                .where(ProvisioningJob.status.in_(OPEN_STATUSES))
+                .group_by(ProvisioningJob.server_id)
+            )
+        ).all()
+    )
+
+    loads = [
+        {
+            "server_id": None,
+            "name": DEFAULT_SERVER_NAME,
+            "is_active": TENANT_PLACE_ON_DEFAULT_SERVER,
+            "max_tenants": None,
+            "tenants": tenant_counts.get(None, 0) + job_counts.get(None, 0),
+        }
+    ]
+    for server in servers:
+        loads.append(
+            {
+                "server_id": server.id,
+                "name": server.name,
+                "is_active": server.is_active,
+                "max_tenants": server.max_tenants,
+                "tenants": tenant_counts.get(server.id, 0) + job_counts.get(server.id, 0),
+            }
+        )
+
+    if with_size:
+        servers_by_id = {server.id: server for server in servers}
+        for load in loads:
+            load["size_bytes"] = await _get_tenant_databases_size(servers_by_id.get(load["server_id"]))
+    return loads
+
+
+async def _get_tenant_databases_size(server: DatabaseServer | None) -> int | None:
+    try:
+        async with get_admin_engine(server).connect() as admin_conn:
+            result = await admin_conn.execute(
+                text(
+                    "SELECT COALESCE(SUM(data_length + index_length), 0) FROM information_schema.tables "
+                    "WHERE table_schema LIKE 'tenant\\_%'"
+                )
+            )
+            return int(result.scalar_one())
+    except Exception as e:
+        logger.warning(f"Could not read the size of server {server.name if server else DEFAULT_SERVER_NAME}: {e}")
+        return None
+
+
+async def place_new_tenant(management_db: AsyncSession) -> int | None:
+    """Picks the server for a new tenant: the active one with the fewest tenants (or bytes), and room to spare."""
+    loads = await get_server_loads(management_db)
+    candidates = [
+        load
+        for load in loads
+        if load["is_active"] and (load["max_tenants"] is None or load["tenants"] < load["max_tenants"])
+    ]
+    # With no servers registered the default takes every tenant, whatever TENANT_PLACE_ON_DEFAULT_SERVER says
+    if len(loads) == 1:
+        candidates = loads
+    if not candidates:
+        raise Exception("No database server has room for another tenant")
+    if TENANT_PLACEMENT == "size" and all(load.get("size_bytes") is not None for load in candidates):
+        chosen = min(candidates, key=lambda load: (load["size_bytes"], load["tenants"]))
+    else:
+        chosen = min(candidates, key=lambda load: load["tenants"])
+    return chosen["server_id"]
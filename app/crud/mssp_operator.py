@@ -12,3 +12,11 @@ async def get_mssp_operator_by_id(db: Session, user_id: int):
 async def get_mssp_operator_by_email(db: Session, email: str) -> MSSPOperator:
     result = await db.execute(select(MSSPOperator).where(MSSPOperator.email == email))
     return result.scalars().first()
+
+
+async def get_login_mssp_operator(db: Session, email: str):
+    # Only what login needs, as a row rather than an MSSPOperator
+    result = await db.execute(
+        select(MSSPOperator.id, MSSPOperator.hashed_password, MSSPOperator.is_active).where(MSSPOperator.email == email)
+    )
+    return result.first()
@@ -0,0 +1,104 @@
+import datetime
+import uuid
+
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.management import ProvisioningJob
+
+# Registration goes last so the tenant is only routable once everything behind it exists
+PROVISIONING_STEPS = ["database", "schema", "admin_users", "registration"]
+# Jobs that may still own a database; they have to be resumed or rolled back before the tenant is retried
+OPEN_STATUSES = ("pending", "running", "rolling_back", "failed", "interrupted")
+
+
+async def create_provisioning_job(
+    tenant_org: str,
+    admin_name: str,
+    admin_email: str,
+    admin_hashed_password: str,
+    management_db: AsyncSession,
+    server_id: int = None,
+    mode: str = "dedicated",
+) -> ProvisioningJob:
+    job = ProvisioningJob(
+        id=str(uuid.uuid4()),
+        tenant_org=tenant_org,
+        server_id=server_id,
+        mode=mode,
+        admin_name=admin_name,
+        admin_email=admin_email,
+        admin_hashed_password=admin_hashed_password,
+        status="pending",
+        steps={step: "pending" for step in PROVISIONING_STEPS},
+    )
+    management_db.add(job)
+    await management_db.commit()
+    await management_db.refresh(job)
+    return job
+
+
+async def get_provisioning_job(job_id: str, management_db: AsyncSession) -> ProvisioningJob:
+    result = await management_db.execute(select(ProvisioningJob).where(ProvisioningJob.id == job_id))
+    return result.scalars().first()
+
+
+async def get_open_provisioning_job(tenant_org: str, management_db: AsyncSession) -> ProvisioningJob:
+    result = await management_db.execute(
+        select(ProvisioningJob).where(
+            ProvisioningJob.tenant_org == tenant_org, ProvisioningJob.status.in_(OPEN_STATUSES)
+        )
+    )
+    return result.scalars().first()
+
+
+async def update_provisioning_job(job: ProvisioningJob, management_db: AsyncSession, **fields) -> ProvisioningJob:
+    for name, value in fields.items():
+        setattr(job, name, value)
+    await management_db.commit()
+    await management_db.refresh(job)
+    return job
+
+
+async def set_provisioning_step(job: ProvisioningJob, step: str, state: str, management_db: AsyncSession):
+    # JSON columns only notice reassignment, not in-place mutation
+    await update_provisioning_job(job, management_db, steps={**job.steps, step: state})
+
+
+async def claim_provisioning_job(
+    job_id: str,
+    status: str,
+    from_statuses: tuple[str, ...],
+    management_db: AsyncSession,
+    stale_before: datetime.datetime = None,
+    **fields,
+) -> bool:
+    """Moves the job to status in one statement, so only one worker or request can take it over.
+
+    With stale_before, pending and running jobs nobody has updated since then can be taken over too.
+    """
+    claimable = ProvisioningJob.status.in_(from_statuses)
+    if stale_before is not None:
+        claimable = or_(
+            claimable,
+            and_(ProvisioningJob.status.in_(("pending", "running")), ProvisioningJob.updated_at < stale_before),
+        )
+    result = await management_db.execute(
+        update(ProvisioningJob)
+        .where(ProvisioningJob.id == job_id, claimable)
+        .values(status=status, **fields)
+        .execution_options(synchronize_session=False)
+    )
+    await management_db.commit()
+    return result.rowcount == 1
+
+
+async def touch_provisioning_job(job_id: str, worker: str, management_db: AsyncSession):
+    # Heartbeat of the worker running the job
+    await management_db.execute(
+        update(ProvisioningJob)
+        .where(ProvisioningJob.id == job_id, ProvisioningJob.worker == worker, ProvisioningJob.status == "running")
+        .values(updated_at=datetime.datetime.now(datetime.UTC))
+        .execution_options(synchronize_session=False)
+    )
+    await management_db.commit()
@@ -0,0 +1,71 @@
+import logging
+import time
+import uuid
+
+from sqlalchemy import delete, func, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import management_engine, tenant_engines
+from app.migrations import create_tenant_schema
+from app.models.management import SpareTenantDatabase
+
+logger = logging.getLogger(__name__)
+
+warm_pool_stats = {
+    "depth": None,
+    "provisioned": 0,
+    "claims": 0,
+    "misses": 0,
+    "claim_seconds_total": 0.0,
+    "claim_seconds_max": 0.0,
+}
+
+
+async def provision_spare_database(management_db: AsyncSession) -> str:
+    db_name = f"tenant_spare_{uuid.uuid4().hex[:16]}"
+    async with management_engine.connect() as admin_conn:
+        await admin_conn.execute(text(f"CREATE DATABASE {db_name}"))
+    await create_tenant_schema(tenant_engines.get_engine(db_name))
+    # Spares sit idle until claimed, so don't keep a pool open for them
+    tenant_engines.evict(db_name)
+
+    management_db.add(SpareTenantDatabase(db_name=db_name))
+    await management_db.commit()
+    warm_pool_stats["provisioned"] += 1
+    logger.info(f"Provisioned spare tenant database {db_name}")
+    return db_name
+
+
+async def claim_spare_database(management_db: AsyncSession) -> str | None:
+    # The claim is only final once the caller commits, e.g. together with the new tenant row
+    started_at = time.monotonic()
+    try:
+        result = await management_db.execute(
+            select(SpareTenantDatabase.id, SpareTenantDatabase.db_name).order_by(SpareTenantDatabase.id).limit(5)
+        )
+        for spare_id, db_name in result.all():
+            # Whoever deletes the row owns the database; concurrent claimers move on to the next one
+            deleted = await management_db.execute(delete(SpareTenantDatabase).where(SpareTenantDatabase.id == spare_id))
+            if deleted.rowcount == 1:
+                elapsed = time.monotonic() - started_at
+                warm_pool_stats["claims"] += 1
+                warm_pool_stats["claim_seconds_total"] += elapsed
+                warm_pool_stats["claim_seconds_max"] = max(warm_pool_stats["claim_seconds_max"], elapsed)
+                if warm_pool_stats["depth"]:
+                    warm_pool_stats["depth"] -= 1
+                return db_name
+    except Exception as e:
+        logger.warning(f"Could not claim a spare tenant database: {e}")
+        await management_db.rollback()
+    warm_pool_stats["misses"] += 1
+    return None
+
+
+async def count_spare_databases(management_db: AsyncSession) -> int:
+    result = await management_db.execute(select(func.count()).select_from(SpareTenantDatabase))
+    return result.scalar_one()
+
+
+async def get_spare_databases(management_db: AsyncSession):
+    result = await management_db.execute(select(SpareTenantDatabase))
+    return result.scalars().all()
@@ -1,22 +1,71 @@
 import logging
+from typing import AsyncIterator
 
-from sqlalchemy import select
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import bindparam, delete, insert, select, text, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
 
+from app.config import TASK_STREAM_BATCH_SIZE
+from app.database import resolve_tenant_session
 from app.models.tenant import Task
-from app.schemas.task import TaskCreate
+from app.schemas.task import TaskCreate, TaskUpdate
+from app.utils.read_cache import get_or_load, invalidate
 
 logger = logging.getLogger(__name__)
 
+# What a task response carries; selecting these skips building Task objects. ORM attributes rather than
+# Task.__table__.columns, so sessions of shared tenants still add their tenant filter
+TASK_COLUMNS = (Task.id, Task.title, Task.description, Task.user_id, Task.created_at, Task.updated_at)
+
 
 async def get_task(db: AsyncSession, task_id: int):
     result = await db.execute(select(Task).where(Task.id == task_id))
     return result.scalars().first()
 
 
-async def get_tasks_by_user(db: AsyncSession, user_id: int):
-    result = await db.execute(select(Task).where(Task.user_id == user_id))
-    return result.scalars().all()
+async def get_tasks_by_user(db: AsyncSession, user_id: int, limit: int = None, after: int = None):
+    # Keyset pagination on (user_id, id), served by ix_tasks_user_id_id
+    query = select(*TASK_COLUMNS).where(Task.user_id == user_id).order_by(Task.id)
+    if after is not None:
+        query = query.where(Task.id > after)
+    if limit is not None:
+        query = query.limit(limit)
+    result = await db.execute(query)
+    return result.all()
+
+
+async def stream_tasks_by_user(engine: AsyncEngine, user_id: int, after: int = None) -> AsyncIterator[dict]:
+    query = select(*TASK_COLUMNS).where(Task.user_id == user_id).order_by(Task.id)
+    if after is not None:
+        query = query.where(Task.id > after)
+    # Uses its own connection so the server-side cursor outlives the request's session
+    async with engine.connect() as conn:
+        result = await conn.stream(query.execution_options(yield_per=TASK_STREAM_BATCH_SIZE))
+        async for row in result.mappings():
+            yield dict(row)
+
+
+async def get_tasks_page_by_created(
+    engine: AsyncEngine, after: tuple = None, limit: int = 200, tenant_org: str = None
+) -> list[dict]:
+    # Keyset page over all tasks in a tenant, ordered by (created_at, id); tenant_org for shared databases
+    query = select(*TASK_COLUMNS).order_by(Task.created_at, Task.id).limit(limit)
+    if tenant_org is not None:
+        query = query.where(Task.tenant_org == tenant_org)
+    if after is not None:
+        query = query.where(tuple_(Task.created_at, Task.id) > tuple_(*after))
+    async with engine.connect() as conn:
+        result = await conn.execute(query)
+        return [dict(row) for row in result.mappings()]
+
+
+async def get_task_cached(db: AsyncSession, task_id: int) -> dict | None:
+    return await get_or_load(db, "task", task_id, lambda session: _load_task_row(session, task_id))
+
+
+async def _load_task_row(db: AsyncSession, task_id: int) -> dict | None:
+    result = await db.execute(select(*TASK_COLUMNS).where(Task.id == task_id))
+    row = result.mappings().first()
+    return dict(row) if row is not None else None
 
 
 async def create_task(db: AsyncSession, task: TaskCreate, user_id: int):
@@ -34,6 +83,7 @@ async def update_task(db: AsyncSession, task_id: int, title: str, description: s
     task.title = title
     task.description = description
     await db.commit()
+    await invalidate(db, "task", task_id)
     return task
 
 
@@ -43,4 +93,81 @@ async def delete_task(db: AsyncSession, task_id: int, user_id: int):
         return None
     await db.delete(task)
     await db.commit()
+    await invalidate(db, "task", task_id)
     return task
+
+
+async def bulk_write_tasks(
+    db: AsyncSession,
+    user_id: int,
+    creates: list[TaskCreate],
+    updates: list[TaskUpdate],
+    deletes: list[int],
+    owner_only: bool = True,
+) -> tuple[list[int], set[int], set[int]]:
+    # One transaction for the whole chunk: creates, then updates, then deletes
+    await resolve_tenant_session(db)
+    try:
+        created_ids = await _insert_tasks(
+            db,
+            [
+                {
+                    "title": task.title,
+                    "description": task.description,
+                    "user_id": user_id,
+                    "tenant_org": db.info.get("tenant_org"),
+                }
+                for task in creates
+            ],
+        )
+        updated_ids = await _lock_task_ids(db, [task.id for task in updates], user_id, owner_only)
+        if updated_ids:
+            table = Task.__table__
+            await db.execute(
+                update(table)
+                .where(table.c.id == bindparam("task_id"))
+                .values(title=bindparam("task_title"), description=bindparam("task_description")),
+                [
+                    {"task_id": task.id, "task_title": task.title, "task_description": task.description}
+                    for task in updates
+                    if task.id in updated_ids
+                ],
+            )
+        deleted_ids = await _lock_task_ids(db, deletes, user_id, owner_only)
+        if deleted_ids:
+            await db.execute(delete(Task).where(Task.id.in_(deleted_ids)))
+        await db.commit()
+    except Exception:
+        await db.rollback()
+        raise
+    await invalidate(db, "task", *updated_ids, *deleted_ids)
+    return created_ids, updated_ids, deleted_ids
+
+
+async def _insert_tasks(db: AsyncSession, rows: list[dict]) -> list[int]:
+    if not rows:
+        return []
+    if db.get_bind().dialect.insert_executemany_returning_sort_by_parameter_order:
+        result = await db.execute(insert(Task).returning(Task.id, sort_by_parameter_order=True), rows)
+        return list(result.scalars())
+    # MySQL has no RETURNING. InnoDB numbers the rows of one multi-row INSERT lastrowid, lastrowid + step, ... with
+    # step = auto_increment_increment (more than 1 on Galera and other multi-primary setups). Reading the rows back
+    # proves it, rather than answering with ids that belong to other tasks
+    result = await db.execute(insert(Task).values(rows))
+    step = (await db.execute(text("SELECT @@auto_increment_increment"))).scalar_one()
+    ids = [result.lastrowid + i * step for i in range(len(rows))]
+    result = await db.execute(select(Task.id, Task.title, Task.user_id).where(Task.id.in_(ids)))
+    found = {row.id: (row.title, row.user_id) for row in result}
+    if [found.get(task_id) for task_id in ids] != [(row["title"], row["user_id"]) for row in rows]:
+        raise Exception(f"Could not tell the ids of {len(rows)} inserted tasks apart, they were not numbered by {step}")
+    return ids
+
+
+async def _lock_task_ids(db: AsyncSession, task_ids: list[int], user_id: int, owner_only: bool) -> set[int]:
+    if not task_ids:
+        return set()
+    query = select(Task.id).where(Task.id.in_(task_ids)).with_for_update()
+    if owner_only:
+        query = query.where(Task.user_id == user_id)
+    result = await db.execute(query)
+    return set(result.scalars())
@@ -1,61 +1,69 @@
-from sqlalchemy import select, text
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
-from sqlalchemy.orm import sessionmaker
-
-from app.config import MANAGEMENT_DATABASE_URL, TENANT_DATABASE_TEMPLATE_URL
-from app.crud.user import create_tenant_admin_user
-from app.models.management import Tenant
-from app.models.tenant import TenantBase
-from app.schemas.user import UserCreate
-from app.schemas.auth import Identity
-from app.security import get_random_password
-
-
-async def create_tenant(mssp: Identity, tenant_org: str, tenant_admin: UserCreate, management_db: AsyncSession):
-    tenant_db_name = await create_tenant_database(tenant_org)
-    await add_tenant_to_db(tenant_org, tenant_admin, tenant_db_name, management_db)
-
-    tenant_db_url = TENANT_DATABASE_TEMPLATE_URL.format(tenant_db_name=tenant_db_name)
-    tenant_engine = create_async_engine(tenant_db_url)
-    async with tenant_engine.begin() as tenant_conn:
-        await tenant_conn.run_sync(TenantBase.metadata.create_all)
-
-    TenantSessionLocal = sessionmaker(bind=tenant_engine, class_=AsyncSession, expire_on_commit=False)
-    async with TenantSessionLocal() as tenant_db:
-        # create mssp admin user in tenant db
-        mssp_admin = UserCreate(
-            name="MSSP Operator",
-            email="mssp@mssp.mssp",
-            password=get_random_password(),
-            is_admin=True,
-        )
-        await create_tenant_admin_user(tenant_org, mssp_admin, tenant_db)
-        # create tenant admin user
-        await create_tenant_admin_user(tenant_org, tenant_admin, tenant_db)
-
-
-async def create_tenant_database(tenant_org: str):
+from sqlalchemy import delete, select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import SHARED_TENANT_DATABASE
+from app.crud.database_server import get_admin_engine, route_tenant
+from app.database import tenant_engines
+from app.models.management import DatabaseServer, Tenant
+from app.models.tenant import Task, User
+from app.utils.tenant_directory import MISSING, publish_tenant_invalidation, tenant_directory
+
+
+async def create_tenant_database(tenant_db_name: str, if_not_exists: bool = False, server: DatabaseServer = None):
     try:
-        tenant_db_name = f"tenant_{tenant_org}"
-        admin_engine = create_async_engine(MANAGEMENT_DATABASE_URL)
-        async with admin_engine.connect() as admin_conn:
-            await admin_conn.execute(text(f"CREATE DATABASE {tenant_db_name}"))
+        async with get_admin_engine(server).connect() as admin_conn:
+            await admin_conn.execute(
+                text(f"CREATE DATABASE {'IF NOT EXISTS ' if if_not_exists else ''}{tenant_db_name}")
+            )
         return tenant_db_name
     except Exception as e:
         raise Exception(f"Error creating tenant database {tenant_db_name}: {str(e)}")
 
 
+async def create_shared_tenant_database() -> str:
+    # Shared tenants all live on the default server
+    async with get_admin_engine(None).connect() as admin_conn:
+        await admin_conn.execute(text(f"CREATE DATABASE IF NOT EXISTS {SHARED_TENANT_DATABASE}"))
+    return SHARED_TENANT_DATABASE
+
+
+async def delete_shared_tenant_rows(tenant_db_name: str, tenant_org: str):
+    # What dropping the database is for a dedicated tenant
+    async with tenant_engines.get_engine(tenant_db_name).begin() as conn:
+        await conn.execute(delete(Task).where(Task.tenant_org == tenant_org))
+        await conn.execute(delete(User).where(User.tenant_org == tenant_org))
+
+
+async def drop_tenant_database(tenant_db_name: str, server: DatabaseServer = None):
+    tenant_engines.evict(tenant_db_name)
+    async with get_admin_engine(server).connect() as admin_conn:
+        await admin_conn.execute(text(f"DROP DATABASE IF EXISTS {tenant_db_name}"))
+
+
 async def get_tenant_by_org(tenant_org: str, management_db: AsyncSession):
     #  management_db.query(Tenant).filter(Tenant.tenant_org == tenant_org).first()
     result = await management_db.execute(select(Tenant).where(Tenant.tenant_org == tenant_org))
     return result.scalars().first()
 
 
-async def add_tenant_to_db(tenant_org: str, tenant_admin: UserCreate, tenant_db_name: str, management_db: AsyncSession):
-    _, domain = tenant_admin.email.split("@")
-    tenant = Tenant(tenant_org=tenant_org, domain=domain, db_name=tenant_db_name)
+async def register_tenant(
+    tenant_org: str,
+    domain: str,
+    tenant_db_name: str,
+    management_db: AsyncSession,
+    server_id: int = None,
+    mode: str = "dedicated",
+):
+    tenant = Tenant(tenant_org=tenant_org, domain=domain, db_name=tenant_db_name, server_id=server_id, mode=mode)
     management_db.add(tenant)
     await management_db.commit()
+    await publish_tenant_invalidation(tenant_org, domain)
+
+
+async def delete_tenant(tenant: Tenant, management_db: AsyncSession):
+    await management_db.delete(tenant)
+    await management_db.commit()
+    await publish_tenant_invalidation(tenant.tenant_org, tenant.domain)
 
 
 async def get_all_tenants(management_db: AsyncSession):
@@ -65,13 +73,28 @@ async def get_all_tenants(management_db: AsyncSession):
 
 
 async def get_tenant_by_domain(domain: str, management_db: AsyncSession) -> Tenant:
-    # return management_db.query(Tenant).filter(Tenant.domain == domain).first()
-    result = await management_db.execute(select(Tenant).where(Tenant.domain == domain))
-    return result.scalars().first()
+    tenant = tenant_directory.get_tenant_by_domain(domain)
+    if tenant is MISSING:
+        # return management_db.query(Tenant).filter(Tenant.domain == domain).first()
+        result = await management_db.execute(select(Tenant).where(Tenant.domain == domain))
+        tenant = result.scalars().first()
+        if tenant is not None:
+            await route_tenant(tenant, management_db)
+        tenant_directory.set_tenant_by_domain(domain, tenant)
+    return tenant
+
+
+async def get_cached_tenant(tenant_org: str, management_db: AsyncSession) -> Tenant:
+    tenant = tenant_directory.get_tenant(tenant_org)
+    if tenant is MISSING:
+        tenant = await get_tenant_by_org(tenant_org, management_db)
+        if tenant is not None:
+            await route_tenant(tenant, management_db)
+        tenant_directory.set_tenant(tenant_org, tenant)
+    if tenant is None:
+        raise Exception(f"Tenant with id {tenant_org} not found")
+    return tenant
 
 
 async def get_tenant_db_name(tenant_org: str, management_db: AsyncSession) -> str:
-    tenant = await get_tenant_by_org(tenant_org, management_db)
-    if tenant is None:
-        raise Exception(f"Tenant with id {tenant_org} not found")
-    return tenant.db_name
+    return (await get_cached_tenant(tenant_org, management_db)).db_name
@@ -3,15 +3,22 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.tenant import User
 from app.schemas.user import UserCreate
-from app.security import hash_password
+from app.security import hash_password_async
+from app.utils.read_cache import get_or_load, invalidate
 
 
 async def create_tenant_admin_user(tenant_org: str, user: UserCreate, db: AsyncSession) -> User:
-    hashed_password = hash_password(user.password)
+    hashed_password = await hash_password_async(user.password)
+    return await create_tenant_admin_user_with_hash(tenant_org, user.name, user.email, hashed_password, db)
+
+
+async def create_tenant_admin_user_with_hash(
+    tenant_org: str, name: str, email: str, hashed_password: str, db: AsyncSession
+) -> User:
     db_user = User(
         tenant_org=tenant_org,
-        name=user.name,
-        email=user.email,
+        name=name,
+        email=email,
         hashed_password=hashed_password,
         is_active=True,
         is_admin=True,
@@ -19,15 +26,17 @@ async def create_tenant_admin_user(tenant_org: str, user: UserCreate, db: AsyncS
     db.add(db_user)
     await db.commit()
     await db.refresh(db_user)
+    await invalidate(db, "user", db_user.id)
     return db_user
 
 
 async def create_user(tenant_org: str, user: UserCreate, db: AsyncSession):
-    hashed_password = hash_password(user.password)  # Assuming hash_password is defined elsewhere
+    hashed_password = await hash_password_async(user.password)
     db_user = User(tenant_org=tenant_org, name=user.name, email=user.email, hashed_password=hashed_password)
     db.add(db_user)
     await db.commit()
     await db.refresh(db_user)
+    await invalidate(db, "user", db_user.id)
     return db_user
 
 
@@ -36,6 +45,32 @@ async def get_user_by_id(user_id: int, db: AsyncSession):
     return result.scalars().first()
 
 
+async def get_user_cached(user_id: int, db: AsyncSession) -> dict | None:
+    return await get_or_load(db, "user", user_id, lambda session: _load_user_row(user_id, session))
+
+
+async def _load_user_row(user_id: int, db: AsyncSession) -> dict | None:
+    # Only what UserResponse exposes; the password hash never goes into the cache
+    user = await get_user_by_id(user_id, db)
+    if user is None:
+        return None
+    return {
+        "id": user.id,
+        "name": user.name,
+        "email": user.email,
+        "is_active": user.is_active,
+        "is_admin": user.is_admin,
+    }
+
+
 async def get_user_by_email(email: str, db: AsyncSession):
     result = await db.execute(select(User).where(User.email == email))
     return result.scalars().first()
+
+
+async def get_login_user(email: str, db: AsyncSession):
+    # Only what login needs, as a row rather than a User
+    result = await db.execute(
+        select(User.id, User.hashed_password, User.is_admin, User.is_active).where(User.email == email)
+    )
+    return result.first()
@@ -0,0 +1,349 @@
+import asyncio
+import logging
+from collections import Counter, OrderedDict
+from functools import partial
+from typing import Callable
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
+from sqlalchemy.orm import ORMExecuteState, Session, sessionmaker, with_loader_criteria
+from sqlalchemy.util import await_only
+
+from app.config import (
+    MANAGEMENT_DATABASE_URL,
+    TENANT_DATABASE_TEMPLATE_URL,
+    TENANT_ENGINE_CACHE_SIZE,
+    TENANT_MAX_OVERFLOW,
+    TENANT_POOL_OVERRIDES,
+    TENANT_POOL_RECYCLE,
+    TENANT_POOL_SIZE,
+    TENANT_REPLICA_TEMPLATE_URL,
+)
+from app.models.tenant import Task, User
+from app.utils.metrics import MANAGEMENT, UNASSIGNED, InstrumentedQueuePool, instrument_engine
+
+logger = logging.getLogger(__name__)
+
+# Replica engines share the registry with the primaries, under this suffix
+REPLICA_SUFFIX = "@replica"
+
+# Run on every new replica connection so a stray write fails instead of landing on the replica
+_READ_ONLY_STATEMENTS = {"mysql": "SET SESSION TRANSACTION READ ONLY", "sqlite": "PRAGMA query_only = ON"}
+
+# Create the engine for the management database
+management_engine = create_async_engine(MANAGEMENT_DATABASE_URL)
+instrument_engine(management_engine, MANAGEMENT)
+
+# Create a session factory for the management database
+ManagementSessionLocal = sessionmaker(bind=management_engine, class_=AsyncSession, expire_on_commit=False)
+
+
+class TenantSession(Session):
+    """Stamps new rows with info["tenant_org"]; with info["shared"] it also only sees that tenant's rows.
+
+    Sessions from lazy_tenant_session start without a bind and look up their tenant database on first use.
+    Sessions from the engine registry hold a lease on their engine until closed, so it is not evicted under them.
+    """
+
+    def __init__(self, *args, **kw):
+        super().__init__(*args, **kw)
+        self._release_engine = None
+        self._take_lease()
+
+    def _take_lease(self):
+        lease = self.info.pop("lease", None)
+        if lease is None:
+            return
+        # The registry hands back the engine it tracks now, which differs from the factory's if that was evicted
+        engine, self._release_engine = lease()
+        self.bind = engine.sync_engine
+
+    def resolve(self):
+        resolve = self.info.get("resolve")
+        if resolve is None:
+            return
+        # Always called from inside a session call, i.e. in its greenlet, so the lookup can be awaited here
+        session_factory, info = await_only(resolve())
+        self.bind = session_factory.kw["bind"].sync_engine
+        self.info.update(session_factory.kw.get("info", {}), **info)
+        del self.info["resolve"]
+        self._take_lease()
+
+    def get_bind(self, mapper=None, **kw):
+        self.resolve()
+        return super().get_bind(mapper, **kw)
+
+    def _close_impl(self, invalidate: bool, is_reset: bool = False):
+        # close(), reset() and invalidate() all end up here
+        try:
+            super()._close_impl(invalidate, is_reset)
+        finally:
+            if self._release_engine is not None:
+                self._release_engine()
+                self._release_engine = None
+
+
+def lazy_tenant_session(resolve) -> AsyncSession:
+    # resolve() returns (session factory from tenant_engines, extra info) and is awaited on the first query
+    return AsyncSession(sync_session_class=TenantSession, expire_on_commit=False, info={"resolve": resolve})
+
+
+async def resolve_tenant_session(db: AsyncSession):
+    # For code that needs db.info or the engine before running a query; still no connection is checked out
+    if "resolve" in db.info:
+        await db.run_sync(TenantSession.resolve)
+
+
+@event.listens_for(TenantSession, "do_orm_execute")
+def _scope_to_tenant(execute_state: ORMExecuteState):
+    # Runs before the session asks for a bind, a lazy session has to know its tenant first
+    execute_state.session.resolve()
+    info = execute_state.session.info
+    if not info.get("shared"):
+        return
+    if execute_state.is_select or execute_state.is_update or execute_state.is_delete:
+        tenant_org = info["tenant_org"]
+        execute_state.statement = execute_state.statement.options(
+            with_loader_criteria(User, User.tenant_org == tenant_org),
+            with_loader_criteria(Task, Task.tenant_org == tenant_org),
+        )
+
+
+@event.listens_for(TenantSession, "before_flush")
+def _stamp_tenant_org(session: TenantSession, flush_context, instances):
+    session.resolve()
+    tenant_org = session.info.get("tenant_org")
+    if tenant_org is None:
+        return
+    for instance in session.new:
+        if isinstance(instance, (User, Task)) and instance.tenant_org is None:
+            instance.tenant_org = tenant_org
+
+
+def tenant_session_info(tenant) -> dict:
+    # Works for Tenant rows and provisioning jobs alike
+    return {"tenant_org": tenant.tenant_org, "shared": tenant.mode == "shared"}
+
+
+class TenantEngineRegistry:
+    """One pooled AsyncEngine per tenant database (and per replica), capped with LRU eviction of idle engines."""
+
+    def __init__(
+        self,
+        url_template: str,
+        replica_url_template: str = None,
+        max_engines: int = TENANT_ENGINE_CACHE_SIZE,
+        pool_size: int = TENANT_POOL_SIZE,
+        max_overflow: int = TENANT_MAX_OVERFLOW,
+        pool_recycle: int = TENANT_POOL_RECYCLE,
+        overrides: dict = None,
+    ):
+        self.url_template = url_template
+        self.replica_url_template = replica_url_template
+        self.max_engines = max_engines
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.pool_recycle = pool_recycle
+        self.overrides = dict(overrides or {})
+        # db_name -> (url template, replica url template) for tenants on a registered database server
+        self.placements: dict[str, tuple[str, str | None]] = {}
+        # db_name -> tenant_org metrics label, set once a tenant is routed to the database
+        self.metrics_labels: dict[str, str] = {}
+        # db_name (or db_name@replica) -> (engine, session factory), least recently used first
+        self._engines: OrderedDict[str, tuple[AsyncEngine, sessionmaker]] = OrderedDict()
+        self._pending_disposals = set()
+        # engine -> open sessions holding a lease on it; engines still leased are not evicted as idle
+        self._leases: Counter[AsyncEngine] = Counter()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def configure_pool(self, db_name: str, pool_size: int = None, max_overflow: int = None):
+        options = self.overrides.setdefault(db_name, {})
+        if pool_size is not None:
+            options["pool_size"] = pool_size
+        if max_overflow is not None:
+            options["max_overflow"] = max_overflow
+        # The new sizing applies the next time the engine is created
+        self.evict(db_name)
+
+    def place(self, db_name: str, url_template: str = None, replica_url_template: str = None):
+        # None puts the database back on the default server
+        placement = (url_template, replica_url_template) if url_template is not None else None
+        if self.placements.get(db_name) == placement:
+            return
+        if placement is None:
+            self.placements.pop(db_name, None)
+        else:
+            self.placements[db_name] = placement
+        # The tenant moved, connections to the old server have to go
+        self.evict(db_name)
+
+    def set_metrics_label(self, db_name: str, label: str):
+        if self.metrics_labels.get(db_name) == label:
+            return
+        self.metrics_labels[db_name] = label
+        # An engine opened before the tenant claimed the database, e.g. a spare's, still reports it as unassigned
+        self.evict(db_name)
+
+    def get_engine(self, db_name: str) -> AsyncEngine:
+        return self._get_entry(db_name)[0]
+
+    def get_sessionmaker(self, db_name: str) -> sessionmaker:
+        return self._get_entry(db_name)[1]
+
+    def session(self, db_name: str, info: dict = None) -> AsyncSession:
+        # info is merged into the factory's, see tenant_session_info
+        return self.get_sessionmaker(db_name)(info=info or {})
+
+    def get_replica_url(self, db_name: str, replica_url: str = None) -> str | None:
+        # A per-tenant replica URL wins over the template of the server the tenant is on
+        if replica_url is not None:
+            return replica_url
+        placement = self.placements.get(db_name)
+        return placement[1] if placement is not None else self.replica_url_template
+
+    def get_replica_sessionmaker(self, db_name: str, replica_url: str = None) -> sessionmaker | None:
+        # None means the tenant has no replica
+        url_template = self.get_replica_url(db_name, replica_url)
+        if url_template is None:
+            return None
+        return self._get_entry(f"{db_name}{REPLICA_SUFFIX}", url_template, db_name, read_only=True)[1]
+
+    def evict(self, db_name: str):
+        for key in (db_name, f"{db_name}{REPLICA_SUFFIX}"):
+            entry = self._engines.pop(key, None)
+            if entry is not None:
+                self.evictions += 1
+                self._dispose_later(entry[0])
+
+    async def dispose_all(self):
+        engines = [engine for engine, _ in self._engines.values()]
+        self._engines.clear()
+        for engine in engines:
+            await engine.dispose()
+        if self._pending_disposals:
+            await asyncio.gather(*self._pending_disposals, return_exceptions=True)
+
+    def stats(self) -> dict:
+        tenants = {}
+        for db_name, (engine, _) in self._engines.items():
+            tenants[db_name] = {
+                "pool_size": _pool_stat(engine, "size"),
+                "checked_out": _pool_stat(engine, "checkedout"),
+                "overflow": _pool_stat(engine, "overflow"),
+            }
+        return {
+            "engines": len(self._engines),
+            "max_engines": self.max_engines,
+            "checked_out": sum(tenant["checked_out"] for tenant in tenants.values()),
+            "leased": sum(self._leases.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "tenants": tenants,
+        }
+
+    def _get_entry(
+        self, key: str, url_template: str = None, db_name: str = None, read_only: bool = False
+    ) -> tuple[AsyncEngine, sessionmaker]:
+        entry = self._engines.get(key)
+        if entry is not None:
+            self.hits += 1
+            self._engines.move_to_end(key)
+            return entry
+
+        self.misses += 1
+        db_name = db_name or key
+        # Leases look the engine up again with the original arguments, a primary may have moved by then
+        lease = partial(self._lease, key, url_template, db_name, read_only)
+        if url_template is None:
+            url_template = self.placements.get(db_name, (self.url_template,))[0]
+        engine = self._create_engine(key, url_template.format(tenant_db_name=db_name), db_name, read_only)
+        if read_only:
+            _make_read_only(engine)
+        # Sessions know which tenant database they belong to, e.g. for cache keys
+        session_factory = sessionmaker(
+            bind=engine,
+            class_=AsyncSession,
+            sync_session_class=TenantSession,
+            expire_on_commit=False,
+            info={
+                "tenant_db": db_name,
+                "read_only": read_only,
+                "lease": lease,
+            },
+        )
+        entry = (engine, session_factory)
+        self._engines[key] = entry
+        self._evict_idle()
+        return entry
+
+    def _create_engine(self, key: str, url: str, db_name: str, read_only: bool) -> AsyncEngine:
+        options = {
+            "pool_size": self.pool_size,
+            "max_overflow": self.max_overflow,
+            "pool_recycle": self.pool_recycle,
+        }
+        options.update(self.overrides.get(key, {}))
+        logger.info(f"Creating engine for tenant database {key}")
+        engine = create_async_engine(url, poolclass=InstrumentedQueuePool, **options)
+        instrument_engine(engine, self.metrics_labels.get(db_name, UNASSIGNED), "replica" if read_only else "primary")
+        return engine
+
+    def _lease(self, key: str, url_template: str, db_name: str, read_only: bool) -> tuple[AsyncEngine, Callable]:
+        # Called by TenantSession; the sessionmaker may outlive its engine's eviction, so look the engine up again
+        entry = self._engines.get(key) or self._get_entry(key, url_template, db_name, read_only)
+        engine = entry[0]
+        self._leases[engine] += 1
+
+        def release():
+            self._leases[engine] -= 1
+            if self._leases[engine] <= 0:
+                del self._leases[engine]
+
+        return engine, release
+
+    def _evict_idle(self):
+        # Walk from the least recently used end, never evicting the engine just asked for. Engines with connections
+        # checked out, or with open sessions that may still check one out, are skipped
+        for db_name in list(self._engines)[:-1]:
+            if len(self._engines) <= self.max_engines:
+                return
+            engine, _ = self._engines[db_name]
+            if _pool_stat(engine, "checkedout") == 0 and engine not in self._leases:
+                self.evict(db_name)
+        if len(self._engines) > self.max_engines:
+            logger.warning(f"Tenant engine registry over capacity: {len(self._engines)}/{self.max_engines} busy")
+
+    def _dispose_later(self, engine: AsyncEngine):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            engine.sync_engine.dispose()
+            return
+        task = loop.create_task(engine.dispose())
+        self._pending_disposals.add(task)
+        task.add_done_callback(self._pending_disposals.discard)
+
+
+def _make_read_only(engine: AsyncEngine):
+    statement = _READ_ONLY_STATEMENTS.get(engine.dialect.name)
+    if statement is None:
+        return
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def _connect(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(statement)
+        cursor.close()
+
+
+def _pool_stat(engine: AsyncEngine, name: str) -> int:
+    stat = getattr(engine.sync_engine.pool, name, None)
+    return max(stat(), 0) if callable(stat) else 0
+
+
+tenant_engines = TenantEngineRegistry(
+    TENANT_DATABASE_TEMPLATE_URL, TENANT_REPLICA_TEMPLATE_URL, overrides=TENANT_POOL_OVERRIDES
+)
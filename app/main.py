@@ -1,16 +1,65 @@
+import asyncio
 import logging
+from contextlib import asynccontextmanager
 
-import uvicorn
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.templating import Jinja2Templates
+from fastapi.responses import JSONResponse
 from starlette.requests import Request
+from starlette_exporter import PrometheusMiddleware, handle_metrics
+
+from app.api import auth_routes, captcha, health, mssp_operator_routes, task_routes, user_routes
+from app.config import COMPRESSION_MIN_SIZE, WARMUP_TIMEOUT, setup_logging
+from app.database import management_engine, tenant_engines
+from app.security import PasswordHasherBusy, bcrypt_executor
+from app.utils.captcha import start_captcha_pool, stop_captcha_pool
+from app.utils.compression import CompressionMiddleware
+from app.utils.logging_utils import RequestContextMiddleware
+from app.utils.metrics import TenantMetricsMiddleware
+from app.utils.provisioning import stop_provisioning_jobs
+from app.utils.redis_client import close_redis
+from app.utils.responses import ORJSONResponse
+from app.utils.revocation import start_revocation_listener, stop_revocation_listener
+from app.utils.tenant_directory import start_tenant_directory_subscriber, stop_tenant_directory_subscriber
+from app.utils.tenant_pool import start_warm_pool, stop_warm_pool
+from app.utils.warmup import start_activity_flush, stop_activity_flush, warm_up, warmup_state
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    setup_logging()
+    start_tenant_directory_subscriber()
+    start_revocation_listener()
+    try:
+        # uvicorn only accepts connections once this returns, the first requests find open pools
+        await asyncio.wait_for(warm_up(), WARMUP_TIMEOUT)
+    except asyncio.TimeoutError:
+        logging.warning(f"Warm-up did not finish within {WARMUP_TIMEOUT}s, starting anyway")
+    except Exception as e:
+        logging.error(f"Warm-up failed: {e}")
+    warmup_state["ready"] = True
+    start_warm_pool()
+    start_captcha_pool()
+    start_activity_flush()
+
+    yield
+
+    # In-flight requests have finished by now; readiness already reports the worker as going away
+    warmup_state["shutting_down"] = True
+    await stop_tenant_directory_subscriber()
+    await stop_revocation_listener()
+    await stop_warm_pool()
+    await stop_provisioning_jobs()
+    await stop_captcha_pool()
+    await stop_activity_flush()
+    await tenant_engines.dispose_all()
+    await management_engine.dispose()
+    await close_redis()
+    bcrypt_executor.shutdown()
 
-from app.api import auth_routes, captcha, mssp_operator_routes, task_routes, user_routes
-from app.config import setup_logging
 
 # Initialize the FastAPI app
-myapp = FastAPI()
+myapp = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
 # Set up CORS (if needed)
 origins = [
@@ -28,26 +77,50 @@ myapp.add_middleware(
     allow_headers=["*"],
 )
 
+if COMPRESSION_MIN_SIZE > 0:
+    myapp.add_middleware(CompressionMiddleware)
+
+# Request metrics by route template; tenant routes additionally get a tenant_org label
+myapp.add_middleware(TenantMetricsMiddleware)
+myapp.add_middleware(
+    PrometheusMiddleware, app_name="mssp", group_paths=True, skip_paths=["/metrics", "/health/live", "/health/ready"]
+)
+myapp.add_route("/metrics", handle_metrics)
+myapp.add_middleware(RequestContextMiddleware)
+
 myapp.include_router(user_routes.router, prefix="/tenants", tags=["tenants"])
 myapp.include_router(task_routes.router, prefix="/tenants", tags=["tenants"])
 myapp.include_router(auth_routes.router, prefix="/auth", tags=["auth"])
 myapp.include_router(mssp_operator_routes.router, prefix="/mssp_operator", tags=["mssp_operator"])
 myapp.include_router(captcha.router, prefix="/captcha", tags=["captcha"])
+myapp.include_router(health.router, prefix="/health", tags=["health"])
 
 
-# Set up logging
-setup_logging()
+@myapp.exception_handler(PasswordHasherBusy)
+async def password_hasher_busy_handler(request: Request, exc: PasswordHasherBusy):
+    return JSONResponse(
+        status_code=503, content={"detail": "Server busy, try again later"}, headers={"Retry-After": "1"}
+    )
 
-templates = Jinja2Templates(directory="templates")
+
+# Created on first use, jinja2 is only needed by this page
+_templates = None
 
 
 # Example route
 @myapp.get("/")
 async def read_root(request: Request):
+    global _templates
+    if _templates is None:
+        from fastapi.templating import Jinja2Templates
+
+        _templates = Jinja2Templates(directory="templates")
     logging.info("Root endpoint called")
     # return {"message": "Welcome to the FastAPI multi-tenant application!"}
-    return templates.TemplateResponse("index.html", {"request": request})
+    return _templates.TemplateResponse(request, "index.html")
 
 
 if __name__ == "__main__":
+    import uvicorn
+
     uvicorn.run(myapp, host="0.0.0.0", port=8000)
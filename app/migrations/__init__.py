@@ -0,0 +1,60 @@
+"""Versioned schema migrations.
+
+Each module in a migration package defines ``version`` (int), ``description`` and
+``upgrade(op)``, where ``op`` is an alembic ``Operations`` bound to one connection.
+MySQL commits DDL implicitly, so upgrades must be safe to re-run.
+"""
+
+import importlib
+import pkgutil
+from types import ModuleType
+
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from sqlalchemy import insert, inspect, select
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.models.tenant import SchemaMigration, TenantBase
+
+
+def load_migrations(package: str) -> list[ModuleType]:
+    module = importlib.import_module(package)
+    migrations = [importlib.import_module(f"{package}.{info.name}") for info in pkgutil.iter_modules(module.__path__)]
+    migrations.sort(key=lambda migration: migration.version)
+    versions = [migration.version for migration in migrations]
+    if len(set(versions)) != len(versions):
+        raise Exception(f"Duplicate migration versions in {package}: {versions}")
+    return migrations
+
+
+TENANT_MIGRATIONS = load_migrations("app.migrations.tenant")
+MANAGEMENT_MIGRATIONS = load_migrations("app.migrations.management")
+
+
+def get_applied_versions(conn: Connection) -> set[int]:
+    if not inspect(conn).has_table(SchemaMigration.__tablename__):
+        return set()
+    return set(conn.execute(select(SchemaMigration.version)).scalars())
+
+
+def apply_migration(conn: Connection, migration: ModuleType):
+    SchemaMigration.__table__.create(conn, checkfirst=True)
+    migration.upgrade(Operations(MigrationContext.configure(conn)))
+    conn.execute(insert(SchemaMigration).values(version=migration.version))
+
+
+def stamp_head(conn: Connection, migrations: list[ModuleType] = TENANT_MIGRATIONS):
+    # For databases built from the current models with create_all
+    SchemaMigration.__table__.create(conn, checkfirst=True)
+    applied = get_applied_versions(conn)
+    pending = [{"version": migration.version} for migration in migrations if migration.version not in applied]
+    if pending:
+        conn.execute(insert(SchemaMigration), pending)
+
+
+async def create_tenant_schema(engine: AsyncEngine):
+    async with engine.begin() as conn:
+        await conn.run_sync(TenantBase.metadata.create_all)
+        # The fresh schema already matches the latest migration
+        await conn.run_sync(stamp_head)
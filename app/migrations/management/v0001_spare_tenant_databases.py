@@ -0,0 +1,17 @@
+import datetime
+
+import sqlalchemy as sa
+from alembic.operations import Operations
+
+version = 1
+description = "Pool of pre-provisioned tenant databases"
+
+
+def upgrade(op: Operations):
+    if "spare_tenant_databases" not in sa.inspect(op.get_bind()).get_table_names():
+        op.create_table(
+            "spare_tenant_databases",
+            sa.Column("id", sa.Integer, primary_key=True, index=True),
+            sa.Column("db_name", sa.String(255), unique=True, nullable=False),
+            sa.Column("created_at", sa.TIMESTAMP, default=lambda: datetime.datetime.now(datetime.UTC)),
+        )
@@ -0,0 +1,25 @@
+import sqlalchemy as sa
+from alembic.operations import Operations
+
+version = 2
+description = "Persisted tenant provisioning jobs"
+
+
+def upgrade(op: Operations):
+    if "provisioning_jobs" not in sa.inspect(op.get_bind()).get_table_names():
+        op.create_table(
+            "provisioning_jobs",
+            sa.Column("id", sa.String(36), primary_key=True),
+            sa.Column("tenant_org", sa.String(255), nullable=False, index=True),
+            sa.Column("admin_name", sa.String(50), nullable=False),
+            sa.Column("admin_email", sa.String(100), nullable=False),
+            sa.Column("admin_hashed_password", sa.String(255), nullable=False),
+            sa.Column("db_name", sa.String(255), nullable=True),
+            sa.Column("claimed_spare", sa.Boolean, default=False),
+            sa.Column("status", sa.String(20), nullable=False),
+            sa.Column("steps", sa.JSON, nullable=False),
+            sa.Column("error", sa.String(1024), nullable=True),
+            sa.Column("worker", sa.String(255), nullable=True),
+            sa.Column("created_at", sa.TIMESTAMP),
+            sa.Column("updated_at", sa.TIMESTAMP),
+        )
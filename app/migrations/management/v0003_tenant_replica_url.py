@@ -0,0 +1,11 @@
+import sqlalchemy as sa
+from alembic.operations import Operations
+
+version = 3
+description = "Per-tenant read replica URL"
+
+
+def upgrade(op: Operations):
+    columns = [column["name"] for column in sa.inspect(op.get_bind()).get_columns("tenants")]
+    if "replica_url" not in columns:
+        op.add_column("tenants", sa.Column("replica_url", sa.String(512), nullable=True))
@@ -0,0 +1,32 @@
+import datetime
+
+import sqlalchemy as sa
+from alembic.operations import Operations
+
+version = 4
+description = "Database server registry and tenant placement"
+
+
+def upgrade(op: Operations):
+    inspector = sa.inspect(op.get_bind())
+    if "database_servers" not in inspector.get_table_names():
+        op.create_table(
+            "database_servers",
+            sa.Column("id", sa.Integer, primary_key=True, index=True),
+            sa.Column("name", sa.String(100), unique=True, nullable=False),
+            sa.Column("url_template", sa.String(512), nullable=False),
+            sa.Column("replica_url_template", sa.String(512), nullable=True),
+            sa.Column("max_tenants", sa.Integer, nullable=True),
+            sa.Column("is_active", sa.Boolean, default=True),
+            sa.Column("created_at", sa.TIMESTAMP, default=lambda: datetime.datetime.now(datetime.UTC)),
+        )
+
+    tenant_columns = [column["name"] for column in inspector.get_columns("tenants")]
+    if "server_id" not in tenant_columns:
+        op.add_column("tenants", sa.Column("server_id", sa.Integer, nullable=True))
+        op.create_index("ix_tenants_server_id", "tenants", ["server_id"])
+    if "status" not in tenant_columns:
+        op.add_column("tenants", sa.Column("status", sa.String(20), nullable=False, server_default="active"))
+
+    if "server_id" not in [column["name"] for column in inspector.get_columns("provisioning_jobs")]:
+        op.add_column("provisioning_jobs", sa.Column("server_id", sa.Integer, nullable=True))
@@ -0,0 +1,13 @@
+import sqlalchemy as sa
+from alembic.operations import Operations
+
+version = 5
+description = "Dedicated or shared database per tenant"
+
+
+def upgrade(op: Operations):
+    inspector = sa.inspect(op.get_bind())
+    if "mode" not in [column["name"] for column in inspector.get_columns("tenants")]:
+        op.add_column("tenants", sa.Column("mode", sa.String(20), nullable=False, server_default="dedicated"))
+    if "mode" not in [column["name"] for column in inspector.get_columns("provisioning_jobs")]:
+        op.add_column("provisioning_jobs", sa.Column("mode", sa.String(20), nullable=False, server_default="dedicated"))
@@ -0,0 +1,34 @@
+import datetime
+
+import sqlalchemy as sa
+from alembic.operations import Operations
+
+version = 1
+description = "Baseline users and tasks tables"
+
+
+def upgrade(op: Operations):
+    tables = sa.inspect(op.get_bind()).get_table_names()
+    if "users" not in tables:
+        op.create_table(
+            "users",
+            sa.Column("id", sa.Integer, primary_key=True, index=True),
+            sa.Column("tenant_org", sa.String(50), nullable=False),
+            sa.Column("name", sa.String(50), unique=True, nullable=False),
+            sa.Column("email", sa.String(100), unique=True, nullable=False),
+            sa.Column("hashed_password", sa.String(255), nullable=False),
+            sa.Column("is_active", sa.Boolean, default=True),
+            sa.Column("is_admin", sa.Boolean, default=False),
+            sa.Column("created_at", sa.TIMESTAMP, default=lambda: datetime.datetime.now(datetime.UTC)),
+            sa.Column("updated_at", sa.TIMESTAMP, default=lambda: datetime.datetime.now(datetime.UTC)),
+        )
+    if "tasks" not in tables:
+        op.create_table(
+            "tasks",
+            sa.Column("id", sa.Integer, primary_key=True, index=True),
+            sa.Column("title", sa.String(100), nullable=False),
+            sa.Column("description", sa.String(255), nullable=True),
+            sa.Column("user_id", sa.Integer, sa.ForeignKey("users.id")),
+            sa.Column("created_at", sa.TIMESTAMP, default=lambda: datetime.datetime.now(datetime.UTC)),
+            sa.Column("updated_at", sa.TIMESTAMP, default=lambda: datetime.datetime.now(datetime.UTC)),
+        )
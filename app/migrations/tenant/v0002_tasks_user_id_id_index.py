@@ -0,0 +1,11 @@
+import sqlalchemy as sa
+from alembic.operations import Operations
+
+version = 2
+description = "Index tasks on (user_id, id) for keyset pagination"
+
+
+def upgrade(op: Operations):
+    indexes = sa.inspect(op.get_bind()).get_indexes("tasks")
+    if not any(index["name"] == "ix_tasks_user_id_id" for index in indexes):
+        op.create_index("ix_tasks_user_id_id", "tasks", ["user_id", "id"])
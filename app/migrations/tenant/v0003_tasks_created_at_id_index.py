@@ -0,0 +1,11 @@
+import sqlalchemy as sa
+from alembic.operations import Operations
+
+version = 3
+description = "Index tasks on (created_at, id) for cross-tenant listings"
+
+
+def upgrade(op: Operations):
+    indexes = sa.inspect(op.get_bind()).get_indexes("tasks")
+    if not any(index["name"] == "ix_tasks_created_at_id" for index in indexes):
+        op.create_index("ix_tasks_created_at_id", "tasks", ["created_at", "id"])
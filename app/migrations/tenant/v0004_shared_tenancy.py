@@ -0,0 +1,39 @@
+import sqlalchemy as sa
+from alembic.operations import Operations
+
+version = 4
+description = "Scope tasks and user uniqueness by tenant_org for shared databases"
+
+# Gives SQLite's unnamed UNIQUE constraints a name, so batch mode can drop them
+NAMING_CONVENTION = {"uq": "uq_%(table_name)s_%(column_0_name)s"}
+
+
+def upgrade(op: Operations):
+    inspector = sa.inspect(op.get_bind())
+    if "tenant_org" not in [column["name"] for column in inspector.get_columns("tasks")]:
+        op.add_column("tasks", sa.Column("tenant_org", sa.String(50), nullable=True))
+    if not any(index["name"] == "ix_tasks_tenant_org_created_at_id" for index in inspector.get_indexes("tasks")):
+        op.create_index("ix_tasks_tenant_org_created_at_id", "tasks", ["tenant_org", "created_at", "id"])
+
+    unique_constraints = inspector.get_unique_constraints("users")
+    global_uniques = [
+        constraint for constraint in unique_constraints if constraint["column_names"] in (["name"], ["email"])
+    ]
+    existing = {constraint["name"] for constraint in unique_constraints}
+    if op.get_bind().dialect.name == "sqlite":
+        with op.batch_alter_table("users", naming_convention=NAMING_CONVENTION) as batch:
+            for constraint in global_uniques:
+                batch.drop_constraint(f"uq_users_{constraint['column_names'][0]}", type_="unique")
+            if "uq_users_email_tenant_org" not in existing:
+                batch.create_unique_constraint("uq_users_email_tenant_org", ["email", "tenant_org"])
+            if "uq_users_name_tenant_org" not in existing:
+                batch.create_unique_constraint("uq_users_name_tenant_org", ["name", "tenant_org"])
+        return
+
+    # Create the replacements first; MySQL names a column's UNIQUE index after the column
+    if "uq_users_email_tenant_org" not in existing:
+        op.create_unique_constraint("uq_users_email_tenant_org", "users", ["email", "tenant_org"])
+    if "uq_users_name_tenant_org" not in existing:
+        op.create_unique_constraint("uq_users_name_tenant_org", "users", ["name", "tenant_org"])
+    for constraint in global_uniques:
+        op.drop_index(constraint["name"], table_name="users")
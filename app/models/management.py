@@ -1,6 +1,6 @@
 import datetime
 
-from sqlalchemy import TIMESTAMP, Boolean, Column, Integer, String
+from sqlalchemy import JSON, TIMESTAMP, Boolean, Column, Integer, String
 from sqlalchemy.orm import declarative_base
 
 ManagementBase = declarative_base()
@@ -13,9 +13,11 @@ class MSSPOperator(ManagementBase):
     email = Column(String(100), unique=True, nullable=False)
     hashed_password = Column(String(255), nullable=False)
     is_active = Column(Boolean, default=True)
-    created_at = Column(TIMESTAMP, default=datetime.datetime.now(datetime.UTC))
+    created_at = Column(TIMESTAMP, default=lambda: datetime.datetime.now(datetime.UTC))
     updated_at = Column(
-        TIMESTAMP, default=datetime.datetime.now(datetime.UTC), onupdate=datetime.datetime.now(datetime.UTC)
+        TIMESTAMP,
+        default=lambda: datetime.datetime.now(datetime.UTC),
+        onupdate=lambda: datetime.datetime.now(datetime.UTC),
     )
 
 
@@ -25,7 +27,60 @@ class Tenant(ManagementBase):
     tenant_org = Column(String(255), unique=True, nullable=False)
     domain = Column(String(255), unique=True, nullable=False)
     db_name = Column(String(255), nullable=False)
-    created_at = Column(TIMESTAMP, default=datetime.datetime.now(datetime.UTC))
+    # Overrides TENANT_REPLICA_TEMPLATE_URL for this tenant
+    replica_url = Column(String(512), nullable=True)
+    # DatabaseServer holding db_name; None is the server in TENANT_DATABASE_TEMPLATE_URL
+    server_id = Column(Integer, nullable=True, index=True)
+    # "moving" while the tenant is copied to another server; writes are refused meanwhile
+    status = Column(String(20), nullable=False, default="active")
+    # "dedicated" owns db_name; "shared" tenants live in SHARED_TENANT_DATABASE, rows scoped by tenant_org
+    mode = Column(String(20), nullable=False, default="dedicated")
+    created_at = Column(TIMESTAMP, default=lambda: datetime.datetime.now(datetime.UTC))
     updated_at = Column(
-        TIMESTAMP, default=datetime.datetime.now(datetime.UTC), onupdate=datetime.datetime.now(datetime.UTC)
+        TIMESTAMP,
+        default=lambda: datetime.datetime.now(datetime.UTC),
+        onupdate=lambda: datetime.datetime.now(datetime.UTC),
+    )
+
+
+class DatabaseServer(ManagementBase):
+    __tablename__ = "database_servers"
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(100), unique=True, nullable=False)
+    # Same {tenant_db_name} placeholder as TENANT_DATABASE_TEMPLATE_URL
+    url_template = Column(String(512), nullable=False)
+    replica_url_template = Column(String(512), nullable=True)
+    max_tenants = Column(Integer, nullable=True)
+    # Inactive servers keep their tenants but get no new ones
+    is_active = Column(Boolean, default=True)
+    created_at = Column(TIMESTAMP, default=lambda: datetime.datetime.now(datetime.UTC))
+
+
+class SpareTenantDatabase(ManagementBase):
+    __tablename__ = "spare_tenant_databases"
+    id = Column(Integer, primary_key=True, index=True)
+    db_name = Column(String(255), unique=True, nullable=False)
+    created_at = Column(TIMESTAMP, default=lambda: datetime.datetime.now(datetime.UTC))
+
+
+class ProvisioningJob(ManagementBase):
+    __tablename__ = "provisioning_jobs"
+    id = Column(String(36), primary_key=True)
+    tenant_org = Column(String(255), nullable=False, index=True)
+    admin_name = Column(String(50), nullable=False)
+    admin_email = Column(String(100), nullable=False)
+    admin_hashed_password = Column(String(255), nullable=False)
+    db_name = Column(String(255), nullable=True)
+    server_id = Column(Integer, nullable=True)
+    mode = Column(String(20), nullable=False, default="dedicated")
+    claimed_spare = Column(Boolean, default=False)
+    status = Column(String(20), nullable=False, default="pending")
+    steps = Column(JSON, nullable=False)
+    error = Column(String(1024), nullable=True)
+    worker = Column(String(255), nullable=True)
+    created_at = Column(TIMESTAMP, default=lambda: datetime.datetime.now(datetime.UTC))
+    updated_at = Column(
+        TIMESTAMP,
+        default=lambda: datetime.datetime.now(datetime.UTC),
+        onupdate=lambda: datetime.datetime.now(datetime.UTC),
     )
@@ -1,6 +1,6 @@
 import datetime
 
-from sqlalchemy import TIMESTAMP, Boolean, Column, ForeignKey, Integer, String
+from sqlalchemy import TIMESTAMP, Boolean, Column, ForeignKey, Index, Integer, String, UniqueConstraint
 from sqlalchemy.orm import declarative_base
 
 TenantBase = declarative_base()
@@ -10,17 +10,25 @@ class User(TenantBase):
     __tablename__ = "users"
     id = Column(Integer, primary_key=True, index=True)
     tenant_org = Column(String(50), nullable=False)
-    name = Column(String(50), unique=True, nullable=False)
-    email = Column(String(100), unique=True, nullable=False)
+    name = Column(String(50), nullable=False)
+    email = Column(String(100), nullable=False)
     hashed_password = Column(String(255), nullable=False)
     is_active = Column(Boolean, default=True)
     is_admin = Column(Boolean, default=False)
-    created_at = Column(TIMESTAMP, default=datetime.datetime.now(datetime.UTC))
+    created_at = Column(TIMESTAMP, default=lambda: datetime.datetime.now(datetime.UTC))
     updated_at = Column(
-        TIMESTAMP, default=datetime.datetime.now(datetime.UTC), onupdate=datetime.datetime.now(datetime.UTC)
+        TIMESTAMP,
+        default=lambda: datetime.datetime.now(datetime.UTC),
+        onupdate=lambda: datetime.datetime.now(datetime.UTC),
     )
     # tasks = relationship("Task", back_populates="user")
 
+    # Unique per tenant, so tenants sharing a database can reuse names; email first so login lookups use it too
+    __table_args__ = (
+        UniqueConstraint("email", "tenant_org", name="uq_users_email_tenant_org"),
+        UniqueConstraint("name", "tenant_org", name="uq_users_name_tenant_org"),
+    )
+
 
 class Task(TenantBase):
     __tablename__ = "tasks"
@@ -28,8 +36,24 @@ class Task(TenantBase):
     title = Column(String(100), nullable=False)
     description = Column(String(255), nullable=True)
     user_id = Column(Integer, ForeignKey("users.id"))
-    created_at = Column(TIMESTAMP, default=datetime.datetime.now(datetime.UTC))
+    # Set on every new task; in a shared database it is what keeps tenants apart
+    tenant_org = Column(String(50), nullable=True)
+    created_at = Column(TIMESTAMP, default=lambda: datetime.datetime.now(datetime.UTC))
     updated_at = Column(
-        TIMESTAMP, default=datetime.datetime.now(datetime.UTC), onupdate=datetime.datetime.now(datetime.UTC)
+        TIMESTAMP,
+        default=lambda: datetime.datetime.now(datetime.UTC),
+        onupdate=lambda: datetime.datetime.now(datetime.UTC),
     )
     # user = relationship("User", back_populates="tasks")
+
+    __table_args__ = (
+        Index("ix_tasks_user_id_id", "user_id", "id"),
+        Index("ix_tasks_created_at_id", "created_at", "id"),
+        Index("ix_tasks_tenant_org_created_at_id", "tenant_org", "created_at", "id"),
+    )
+
+
+class SchemaMigration(TenantBase):
+    __tablename__ = "schema_migrations"
+    version = Column(Integer, primary_key=True, autoincrement=False)
+    applied_at = Column(TIMESTAMP, default=lambda: datetime.datetime.now(datetime.UTC))
@@ -1,4 +1,7 @@
-from pydantic import BaseModel
+import datetime
+from typing import Literal
+
+from pydantic import BaseModel, ConfigDict
 
 
 class TaskBase(BaseModel):
@@ -11,5 +14,30 @@ class TaskCreate(TaskBase):
 
 
 class TaskResponse(TaskBase):
+    # Built from the row tuples of crud.task.TASK_COLUMNS as well as from Task objects and cached dicts
+    model_config = ConfigDict(from_attributes=True)
+
     id: int
+    description: str | None = None
     user_id: int
+    created_at: datetime.datetime | None = None
+    updated_at: datetime.datetime | None = None
+
+
+class TaskUpdate(TaskBase):
+    id: int
+
+
+class BulkTaskOperation(BaseModel):
+    op: Literal["create", "update", "delete"]
+    id: int | None = None
+    title: str | None = None
+    description: str | None = None
+
+
+class BulkTaskResult(BaseModel):
+    index: int
+    op: str
+    status: str
+    id: int | None = None
+    detail: str | None = None
@@ -1,3 +1,5 @@
+import datetime
+
 from pydantic import BaseModel
 
 
@@ -12,3 +14,34 @@ class TenantCreate(TenantBase):
 class Tenant(TenantBase):
     id: int
     db_name: str
+    server_id: int | None = None
+    mode: str = "dedicated"
+
+
+class ProvisioningJobResponse(BaseModel):
+    id: str
+    tenant_org: str
+    status: str
+    steps: dict[str, str]
+    db_name: str | None = None
+    server_id: int | None = None
+    mode: str = "dedicated"
+    error: str | None = None
+    created_at: datetime.datetime | None = None
+    updated_at: datetime.datetime | None = None
+
+
+class DatabaseServerCreate(BaseModel):
+    name: str
+    url_template: str
+    replica_url_template: str | None = None
+    max_tenants: int | None = None
+
+
+class DatabaseServerLoad(BaseModel):
+    server_id: int | None
+    name: str
+    is_active: bool
+    max_tenants: int | None = None
+    tenants: int
+    size_bytes: int | None = None
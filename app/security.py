@@ -1,11 +1,20 @@
+import asyncio
+import hashlib
 import uuid
+from collections import OrderedDict
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
 from datetime import UTC, datetime, timedelta
 import secrets
 import string
+import time
 
 import bcrypt
 from jose import JWTError, jwt
 
+from app.config import BCRYPT_EXECUTOR, BCRYPT_MAX_QUEUE, BCRYPT_WORKERS, TOKEN_CACHE_SIZE
+from app.schemas.auth import Identity
+from app.utils.metrics import BCRYPT_DURATION
+
 SECRET_KEY = "your_secret_key"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
@@ -26,6 +35,94 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
     return bcrypt.checkpw(plain_password.encode("utf-8"), hashed_password.encode("utf-8"))
 
 
+class PasswordHasherBusy(Exception):
+    pass
+
+
+class BcryptExecutor:
+    """Runs bcrypt off the event loop in a bounded thread or process pool."""
+
+    def __init__(self, kind: str = BCRYPT_EXECUTOR, workers: int = BCRYPT_WORKERS, max_queue: int = BCRYPT_MAX_QUEUE):
+        self.kind = kind
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor: Executor = None
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.total_run = 0.0
+
+    async def run(self, func, *args):
+        # Fail fast instead of letting callers queue behind a login burst
+        if self.in_flight >= self.workers + self.max_queue:
+            self.rejected += 1
+            raise PasswordHasherBusy("Password hashing queue is full")
+
+        self.in_flight += 1
+        submitted_at = time.monotonic()
+        try:
+            started_at, result = await asyncio.get_running_loop().run_in_executor(
+                self._get_executor(), _timed, func, *args
+            )
+        finally:
+            self.in_flight -= 1
+
+        wait = started_at - submitted_at
+        run = time.monotonic() - started_at
+        self.completed += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        self.total_run += run
+        BCRYPT_DURATION.labels(func.__name__).observe(run)
+        return result
+
+    def stats(self) -> dict:
+        completed = self.completed or 1
+        return {
+            "executor": self.kind,
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "in_flight": self.in_flight,
+            "queue_depth": max(self.in_flight - self.workers, 0),
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_wait_ms": round(self.total_wait / completed * 1000, 2),
+            "max_wait_ms": round(self.max_wait * 1000, 2),
+            "avg_run_ms": round(self.total_run / completed * 1000, 2),
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.kind == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="bcrypt")
+        return self._executor
+
+
+def _timed(func, *args):
+    # Runs in the worker; the start time lets the caller measure queue wait
+    return time.monotonic(), func(*args)
+
+
+bcrypt_executor = BcryptExecutor()
+
+
+async def hash_password_async(password: str) -> str:
+    return await bcrypt_executor.run(hash_password, password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await bcrypt_executor.run(verify_password, plain_password, hashed_password)
+
+
 def create_access_token(data: dict, expires_delta: timedelta = None):
     to_encode = data.copy()
     if expires_delta:
@@ -43,3 +140,66 @@ def decode_access_token(token: str):
         return payload
     except JWTError:
         return None
+
+
+class TokenCache:
+    """LRU of already verified tokens, keyed by a digest of the token."""
+
+    def __init__(self, max_size: int = TOKEN_CACHE_SIZE):
+        self.max_size = max_size
+        # digest -> (identity, jti, exp)
+        self._entries: OrderedDict[bytes, tuple[Identity, str, float]] = OrderedDict()
+        self._digests_by_jti: dict[str, bytes] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, token: str) -> tuple[Identity, str, float] | None:
+        digest = _token_digest(token)
+        entry = self._entries.get(digest)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry[2] <= time.time():
+            self._remove(digest)
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(digest)
+        return entry
+
+    def put(self, token: str, identity: Identity, jti: str, expires_at: float):
+        if self.max_size <= 0:
+            return
+        digest = _token_digest(token)
+        self._entries[digest] = (identity, jti, expires_at)
+        self._entries.move_to_end(digest)
+        self._digests_by_jti[jti] = digest
+        while len(self._entries) > self.max_size:
+            self._remove(next(iter(self._entries)))
+
+    def discard_jti(self, jti: str):
+        digest = self._digests_by_jti.get(jti)
+        if digest is not None:
+            self._remove(digest)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def _remove(self, digest: bytes):
+        entry = self._entries.pop(digest, None)
+        if entry is not None:
+            self._digests_by_jti.pop(entry[1], None)
+
+
+def _token_digest(token: str) -> bytes:
+    return hashlib.sha256(token.encode("utf-8")).digest()
+
+
+token_cache = TokenCache()
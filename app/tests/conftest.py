@@ -1,6 +1,43 @@
+import asyncio
+
 import pytest
+from httpx import AsyncClient
 
 
 @pytest.fixture(scope="session")
 def anyio_backend():
     return "asyncio"
+
+
+class DictRedis:
+    """The few Redis calls the read cache and read routing make, kept in a dict; expiry is ignored."""
+
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, ex=None, px=None):
+        self.data[key] = value
+
+    async def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    async def exists(self, key):
+        return int(key in self.data)
+
+
+async def wait_for_provisioning(client: AsyncClient, mssp_operator_token: str, job_id: str) -> dict:
+    # Tenants are provisioned in the background, poll the job until it settles
+    for _ in range(100):
+        response = await client.get(
+            f"/mssp_operator/jobs/{job_id}", headers={"Authorization": f"Bearer {mssp_operator_token}"}
+        )
+        assert response.status_code == 200
+        job = response.json()
+        if job["status"] not in ("pending", "running"):
+            return job
+        await asyncio.sleep(0.1)
+    raise AssertionError(f"Provisioning job {job_id} did not finish")
@@ -0,0 +1,14 @@
+from app.utils.captcha import pack_captcha, render_captchas, unpack_captcha
+
+
+def test_render_captchas():
+    captchas = render_captchas(2)
+    assert len(captchas) == 2
+    for captcha_text, png in captchas:
+        assert len(captcha_text) == 3 and captcha_text.isalnum()
+        assert png.startswith(b"\x89PNG")
+
+
+def test_pack_roundtrip():
+    captcha_text, png = render_captchas(1)[0]
+    assert unpack_captcha(pack_captcha(captcha_text, png)) == (captcha_text, png)
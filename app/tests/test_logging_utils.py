@@ -0,0 +1,46 @@
+import logging
+
+from app.utils.logging_utils import ContextFilter, RateLimitFilter, SamplingFilter, request_id_var, tenant_org_var
+
+
+def make_record(msg: str = "message", level: int = logging.INFO, lineno: int = 1, **extra) -> logging.LogRecord:
+    record = logging.LogRecord("test", level, "test.py", lineno, msg, None, None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_sampling_only_applies_to_sampled_records():
+    never = SamplingFilter(0.0)
+    assert never.filter(make_record())
+    assert not never.filter(make_record(sampled=True))
+    assert never.filter(make_record(level=logging.WARNING, sampled=True))
+    assert SamplingFilter(1.0).filter(make_record(sampled=True))
+
+
+def test_rate_limit_is_per_call_site_and_reports_suppressed():
+    limiter = RateLimitFilter(per_second=0.001, burst=2)
+    kept = [limiter.filter(make_record(lineno=1, sampled=True)) for _ in range(5)]
+    assert kept == [True, True, False, False, False]
+    assert limiter.filter(make_record(lineno=2, sampled=True))
+
+    limiter._buckets[("test.py", 1)][0] = 1
+    record = make_record(lineno=1, sampled=True)
+    assert limiter.filter(record)
+    assert record.getMessage() == "message (3 similar messages suppressed)"
+
+
+def test_rate_limit_keeps_warnings_and_untagged_records():
+    limiter = RateLimitFilter(per_second=0.001, burst=1)
+    assert limiter.filter(make_record(sampled=True))
+    assert not limiter.filter(make_record(sampled=True))
+    # Errors from the same call site and access lines, which all share one call site, are never dropped
+    assert all(limiter.filter(make_record(level=logging.ERROR, sampled=True)) for _ in range(5))
+    assert all(limiter.filter(make_record()) for _ in range(5))
+
+
+def test_context_filter_adds_request_id_and_tenant():
+    request_id_var.set("abc")
+    tenant_org_var.set("ACME")
+    record = make_record()
+    ContextFilter().filter(record)
+    assert (record.request_id, record.tenant_org) == ("abc", "ACME")
@@ -0,0 +1,41 @@
+import pytest
+from prometheus_client import REGISTRY
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.utils.metrics import OTHER, LabelGuard, instrument_engine
+
+
+def test_label_guard_folds_values_past_the_limit():
+    guard = LabelGuard(2)
+    assert guard("ACME") == "ACME"
+    assert guard("BETA") == "BETA"
+    assert guard("GAMMA") == OTHER
+    # Admitted values keep their own label
+    assert guard("ACME") == "ACME"
+    assert guard.stats() == {"labels": 2, "limit": 2, "folded": 1}
+
+
+def test_label_guard_only_admits_when_allowed():
+    guard = LabelGuard(2)
+    assert guard("JUNK", admit=False) == OTHER
+    assert guard("ACME") == "ACME"
+    assert guard("ACME", admit=False) == "ACME"
+
+
+@pytest.mark.anyio
+async def test_failed_statements_leave_no_start_time_behind():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    instrument_engine(engine, "METRICSTEST")
+
+    async with engine.connect() as conn:
+        with pytest.raises(OperationalError):
+            await conn.execute(text("SELECT * FROM missing"))
+        assert "query_started_at" not in conn.info
+        await conn.execute(text("SELECT 1"))
+        assert "query_started_at" not in conn.info
+    # The failed statement is timed as well
+    labels = {"tenant_org": "METRICSTEST", "role": "primary"}
+    assert REGISTRY.get_sample_value("db_query_duration_seconds_count", labels) == 2
+    await engine.dispose()
@@ -0,0 +1,68 @@
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import inspect
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.migrations import TENANT_MIGRATIONS, get_applied_versions
+from app.models.tenant import TenantBase
+from app.utils.migrate_tenants import migrate_database
+
+HEAD = TENANT_MIGRATIONS[-1].version
+
+
+@pytest.fixture
+async def engine(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/tenant.db")
+    yield engine
+    await engine.dispose()
+
+
+async def applied_versions(engine) -> set[int]:
+    async with engine.connect() as conn:
+        return await conn.run_sync(get_applied_versions)
+
+
+@pytest.mark.anyio
+async def test_migrations_bring_an_empty_database_to_the_models(engine):
+    dry_run = await migrate_database(engine, TENANT_MIGRATIONS, dry_run=True)
+    assert dry_run == {"from_version": 0, "pending": list(range(1, HEAD + 1)), "applied": []}
+    assert await applied_versions(engine) == set()
+
+    result = await migrate_database(engine, TENANT_MIGRATIONS)
+    assert result["applied"] == list(range(1, HEAD + 1))
+    assert await applied_versions(engine) == set(range(1, HEAD + 1))
+
+    async with engine.connect() as conn:
+
+        def schema(sync_conn):
+            inspector = inspect(sync_conn)
+            return {table: {column["name"] for column in inspector.get_columns(table)} for table in ("users", "tasks")}
+
+        columns = await conn.run_sync(schema)
+    for table in ("users", "tasks"):
+        assert columns[table] == set(TenantBase.metadata.tables[table].columns.keys())
+
+    # Nothing left to do
+    assert await migrate_database(engine, TENANT_MIGRATIONS) == {"from_version": HEAD, "pending": [], "applied": []}
+
+
+@pytest.mark.anyio
+async def test_only_unapplied_versions_run_and_a_failure_resumes_there(engine):
+    await migrate_database(engine, TENANT_MIGRATIONS[:2])
+    calls = []
+
+    def failing_upgrade(op):
+        calls.append("fail")
+        raise Exception("boom")
+
+    broken = SimpleNamespace(version=HEAD + 1, upgrade=failing_upgrade)
+    with pytest.raises(Exception, match="boom"):
+        await migrate_database(engine, TENANT_MIGRATIONS + [broken])
+    # Everything before the failure is recorded, the failed version is not
+    assert await applied_versions(engine) == set(range(1, HEAD + 1))
+
+    fixed = SimpleNamespace(version=HEAD + 1, upgrade=lambda op: calls.append("ok"))
+    result = await migrate_database(engine, TENANT_MIGRATIONS + [fixed])
+    assert result == {"from_version": HEAD, "pending": [HEAD + 1], "applied": [HEAD + 1]}
+    assert calls == ["fail", "ok"]
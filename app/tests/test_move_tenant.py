@@ -0,0 +1,90 @@
+import datetime
+
+import pytest
+from sqlalchemy import insert, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+import app.utils.move_tenant as move_tenant
+from app.database import tenant_engines
+from app.migrations import create_tenant_schema
+from app.models.management import DatabaseServer, ManagementBase, Tenant
+from app.models.tenant import Task, User
+from app.utils.move_tenant import sync_pass
+
+
+@pytest.mark.anyio
+async def test_sync_pass_copies_changes_and_deletions(tmp_path):
+    source = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/source.db")
+    target = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/target.db")
+    await create_tenant_schema(source)
+    await create_tenant_schema(target)
+    async with source.begin() as conn:
+        await conn.execute(insert(User).values(id=1, tenant_org="A", name="u", email="u@a.ai", hashed_password="x"))
+        await conn.execute(insert(Task), [{"id": i, "title": f"t{i}", "user_id": 1} for i in range(1, 6)])
+
+    assert (await sync_pass(source, target))["copied"] == 6
+
+    async with source.begin() as conn:
+        await conn.execute(update(Task).where(Task.id == 2).values(title="changed"))
+        await conn.execute(Task.__table__.delete().where(Task.id == 3))
+    result = await sync_pass(source, target, changed_since=datetime.datetime(2000, 1, 1))
+    assert result["deleted"] == 1
+
+    async with target.connect() as conn:
+        rows = dict((await conn.execute(select(Task.id, Task.title))).all())
+    assert rows == {1: "t1", 2: "changed", 4: "t4", 5: "t5"}
+    await source.dispose()
+    await target.dispose()
+
+
+@pytest.mark.anyio
+async def test_move_keeps_the_name_of_a_spare_database(tmp_path, monkeypatch):
+    # Tenants claimed from the warm pool keep the spare's name, the target has to be created under that name
+    (tmp_path / "default").mkdir()
+    (tmp_path / "db2").mkdir()
+    management_engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/management.db")
+    async with management_engine.begin() as conn:
+        await conn.run_sync(ManagementBase.metadata.create_all)
+    management_sessions = sessionmaker(bind=management_engine, class_=AsyncSession, expire_on_commit=False)
+    async with management_sessions() as db:
+        db.add(DatabaseServer(name="db2", url_template=f"sqlite+aiosqlite:///{tmp_path}/db2/{{tenant_db_name}}.db"))
+        db.add(Tenant(tenant_org="SPARE", domain="spare.ai", db_name="tenant_spare_0123456789abcdef"))
+        await db.commit()
+
+    created = []
+
+    async def create_tenant_database(tenant_db_name, if_not_exists=False, server=None):
+        # SQLite creates the file on first connect
+        created.append((tenant_db_name, server.name))
+        return tenant_db_name
+
+    async def publish_tenant_invalidation(tenant_org, domain=None):
+        pass
+
+    monkeypatch.setattr(move_tenant, "ManagementSessionLocal", management_sessions)
+    monkeypatch.setattr(move_tenant, "create_tenant_database", create_tenant_database)
+    monkeypatch.setattr(move_tenant, "publish_tenant_invalidation", publish_tenant_invalidation)
+    monkeypatch.setattr(tenant_engines, "url_template", f"sqlite+aiosqlite:///{tmp_path}/default/{{tenant_db_name}}.db")
+
+    source = tenant_engines.get_engine("tenant_spare_0123456789abcdef")
+    await create_tenant_schema(source)
+    async with source.begin() as conn:
+        await conn.execute(
+            insert(User).values(id=1, tenant_org="SPARE", name="u", email="u@spare.ai", hashed_password="x")
+        )
+        await conn.execute(insert(Task), [{"id": i, "title": f"t{i}", "user_id": 1} for i in range(1, 4)])
+
+    report = await move_tenant.move_tenant("SPARE", "db2", settle_seconds=0)
+
+    assert created == [("tenant_spare_0123456789abcdef", "db2")]
+    assert report["db_name"] == "tenant_spare_0123456789abcdef"
+    target = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/db2/tenant_spare_0123456789abcdef.db")
+    async with target.connect() as conn:
+        assert (await conn.execute(select(Task.title).order_by(Task.id))).scalars().all() == ["t1", "t2", "t3"]
+    async with management_sessions() as db:
+        tenant = (await db.execute(select(Tenant))).scalars().one()
+        assert (tenant.db_name, tenant.status) == ("tenant_spare_0123456789abcdef", "active")
+        assert tenant.server_id == (await db.execute(select(DatabaseServer.id))).scalar_one()
+    await target.dispose()
+    await management_engine.dispose()
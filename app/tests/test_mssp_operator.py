@@ -6,6 +6,7 @@ from faker import Faker
 from httpx import ASGITransport, AsyncClient
 
 from app.main import myapp
+from app.tests.conftest import wait_for_provisioning
 
 MSSP_OPERATOR_EMAIL = "mssp@ridgesecurity.com"
 MSSP_OPERATOR_PASSWORD = "XYZ"
@@ -128,8 +129,10 @@ class TestTenant:
         )
         logger.debug(response.json())
 
-        assert response.status_code == 200
-        assert response.json()["message"] == f"Tenant {self.tenant_org.strip().upper()} created successfully."
+        assert response.status_code == 202
+        assert response.json()["message"] == f"Tenant {self.tenant_org.strip().upper()} is being provisioned."
+        job = await wait_for_provisioning(client, mssp_operator_token, response.json()["job_id"])
+        assert job["status"] == "succeeded"
 
     @pytest.mark.anyio
     async def test_get_tenant(self, mssp_operator_token, client: AsyncClient):
@@ -140,6 +143,22 @@ class TestTenant:
         assert response.status_code == 200
         assert response.json()["tenant_org"] == self.tenant_org.strip().upper()
 
+    @pytest.mark.anyio
+    async def test_create_existing_tenant(self, mssp_operator_token, client: AsyncClient):
+        response = await client.post(
+            "/mssp_operator/tenants/",
+            json={
+                "tenant_org": self.tenant_org,
+                "admin_user": {
+                    "name": self.tenant_admin_name,
+                    "email": self.tenant_admin_email,
+                    "password": self.tenant_admin_password,
+                },
+            },
+            headers={"Authorization": f"Bearer {mssp_operator_token}"},
+        )
+        assert response.status_code == 400
+
 
 class TestCreateTenantUser:
     # Create a new tenant
@@ -169,8 +188,10 @@ class TestCreateTenantUser:
             headers={"Authorization": f"Bearer {mssp_operator_token}"},
         )
         logger.info(response.json())
-        assert response.status_code == 200
-        assert response.json()["message"] == f"Tenant {self.tenant_org.strip().upper()} created successfully."
+        assert response.status_code == 202
+        assert response.json()["message"] == f"Tenant {self.tenant_org.strip().upper()} is being provisioned."
+        job = await wait_for_provisioning(client, mssp_operator_token, response.json()["job_id"])
+        assert job["status"] == "succeeded"
 
         # Log in as the new tenant admin
         response = await client.post(
@@ -214,6 +235,19 @@ class TestCreateTenantUser:
         assert response.status_code == 200
         assert response.json()["email"] == self.tenant_user_email
 
+    @pytest.mark.anyio
+    async def test_login_unknown_tenant_user(self, tenant_admin_token, client: AsyncClient):
+        response = await client.post(
+            "/auth/login",
+            json={
+                "email": "nobody@" + self.tenant_admin_email.split("@")[1],
+                "password": self.tenant_user_password,
+                "captcha_key": "123",
+                "captcha_text": "ABC",
+            },
+        )
+        assert response.status_code == 401
+
     @pytest.fixture(scope="module")
     async def tenant_user_token(self, client: AsyncClient):
         response = await client.post(
@@ -0,0 +1,80 @@
+import datetime
+
+import pytest
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+import app.utils.provisioning as provisioning
+from app.crud.provisioning_job import create_provisioning_job, get_provisioning_job, touch_provisioning_job
+from app.models.management import ManagementBase, ProvisioningJob
+
+
+@pytest.fixture
+async def sessions(tmp_path, monkeypatch):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/management.db")
+    async with engine.begin() as conn:
+        await conn.run_sync(ManagementBase.metadata.create_all)
+    factory = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    monkeypatch.setattr(provisioning, "ManagementSessionLocal", factory)
+    yield factory
+    await engine.dispose()
+
+
+async def make_job(db: AsyncSession, status: str, age: float = 0, worker: str = None) -> ProvisioningJob:
+    job = await create_provisioning_job("ACME", "admin", "admin@acme.ai", "x", db)
+    updated_at = datetime.datetime.now(datetime.UTC) - datetime.timedelta(seconds=age)
+    await db.execute(
+        update(ProvisioningJob)
+        .where(ProvisioningJob.id == job.id)
+        .values(status=status, worker=worker, updated_at=updated_at)
+    )
+    await db.commit()
+    await db.refresh(job)
+    return job
+
+
+@pytest.mark.anyio
+async def test_a_job_is_only_taken_over_once_and_never_while_alive(sessions):
+    async with sessions() as db:
+        alive = await make_job(db, "running", age=10, worker="other")
+        assert not await provisioning.claim_stopped_job(alive, "pending", db)
+
+        abandoned = await make_job(db, "running", age=provisioning.PROVISIONING_STALE_SECONDS + 10, worker="other")
+        assert await provisioning.claim_stopped_job(abandoned, "pending", db)
+        assert abandoned.status == "pending"
+        # A second resume or a rollback racing the first one loses
+        assert not await provisioning.claim_stopped_job(abandoned, "rolling_back", db)
+
+        failed = await make_job(db, "failed")
+        assert await provisioning.claim_stopped_job(failed, "rolling_back", db)
+        assert not await provisioning.claim_stopped_job(failed, "pending", db)
+
+
+@pytest.mark.anyio
+async def test_heartbeat_keeps_a_slow_job_alive(sessions):
+    async with sessions() as db:
+        job = await make_job(db, "running", age=provisioning.PROVISIONING_STALE_SECONDS + 10, worker="other")
+        await touch_provisioning_job(job.id, "other", db)
+        assert not await provisioning.claim_stopped_job(job, "rolling_back", db)
+
+
+@pytest.mark.anyio
+async def test_run_skips_a_job_claimed_elsewhere(sessions, monkeypatch):
+    steps = []
+
+    async def step(job, management_db):
+        steps.append(job.id)
+
+    monkeypatch.setattr(provisioning, "_STEP_HANDLERS", {name: step for name in provisioning.PROVISIONING_STEPS})
+    async with sessions() as db:
+        running = await make_job(db, "running", worker="other")
+        pending = await make_job(db, "pending")
+
+    await provisioning.run_provisioning_job(running.id)
+    await provisioning.run_provisioning_job(pending.id)
+    async with sessions() as db:
+        assert (await get_provisioning_job(running.id, db)).worker == "other"
+        finished = await get_provisioning_job(pending.id, db)
+    assert (finished.status, finished.worker) == ("succeeded", provisioning.WORKER_ID)
+    assert steps == [pending.id] * len(provisioning.PROVISIONING_STEPS)
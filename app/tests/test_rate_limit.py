@@ -0,0 +1,66 @@
+import fakeredis
+import pytest
+from fastapi import HTTPException
+
+import app.utils.rate_limit as rate_limit
+from app.utils.rate_limit import LocalRateLimiter, TOKEN_BUCKET_SCRIPT, parse_rate_limit
+
+
+def test_parse_rate_limit():
+    assert parse_rate_limit("10/60") == (10, 60)
+    assert parse_rate_limit("") is None
+    with pytest.raises(ValueError):
+        parse_rate_limit("0/60")
+
+
+def test_local_limiter_refills_and_forgets_old_clients(monkeypatch):
+    now = 1000.0
+    monkeypatch.setattr(rate_limit.time, "monotonic", lambda: now)
+    limiter = LocalRateLimiter((2, 10), max_clients=2)
+
+    assert limiter.hit("a") == 0
+    assert limiter.hit("a") == 0
+    assert limiter.hit("a") == pytest.approx(5)
+    now += 5
+    assert limiter.hit("a") == 0
+
+    limiter.hit("b")
+    limiter.hit("c")
+    assert limiter.stats()["clients"] == 2
+    assert "a" not in limiter._buckets
+
+
+@pytest.fixture
+def buckets(monkeypatch):
+    # Runs the script itself, fakeredis executes Lua through lupa
+    redis = fakeredis.FakeAsyncRedis()
+    monkeypatch.setattr(rate_limit, "_token_bucket", redis.register_script(TOKEN_BUCKET_SCRIPT))
+    monkeypatch.setattr(rate_limit, "local_rate_limiter", None)
+    monkeypatch.setattr(rate_limit, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(
+        rate_limit, "rate_limits", {"login_ip": (100, 60), "login_email": (2, 60), "login_domain": (100, 60)}
+    )
+    return redis
+
+
+@pytest.mark.anyio
+async def test_email_bucket_runs_out_with_retry_after(buckets):
+    await rate_limit.limit_login("10.0.0.1", "a@acme.ai")
+    await rate_limit.limit_login("10.0.0.2", "A@acme.ai")
+    with pytest.raises(HTTPException) as e:
+        await rate_limit.limit_login("10.0.0.3", "a@acme.ai")
+    assert e.value.status_code == 429
+    assert 1 <= int(e.value.headers["Retry-After"]) <= 30
+
+    # Another email from the same domain is still let through
+    await rate_limit.limit_login("10.0.0.3", "b@acme.ai")
+
+
+@pytest.mark.anyio
+async def test_rejected_attempts_charge_no_bucket(buckets):
+    await rate_limit.limit_login("10.0.0.1", "a@acme.ai")
+    await rate_limit.limit_login("10.0.0.1", "a@acme.ai")
+    for _ in range(5):
+        with pytest.raises(HTTPException):
+            await rate_limit.limit_login("10.0.0.1", "a@acme.ai")
+    assert float(await buckets.hget("rate_limit:login_ip:10.0.0.1", "tokens")) == pytest.approx(98, abs=0.1)
@@ -0,0 +1,55 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import pytest
+
+import app.utils.read_cache as read_cache
+from app.tests.conftest import DictRedis
+
+
+class TenantSession:
+    info = {"tenant_db": "tenant_TEST"}
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    redis = DictRedis()
+    monkeypatch.setattr(read_cache, "redis_client", redis)
+
+    @asynccontextmanager
+    async def session(db_name, info=None):
+        yield TenantSession()
+
+    monkeypatch.setattr(read_cache.tenant_engines, "session", session)
+    return redis
+
+
+@pytest.mark.anyio
+async def test_concurrent_misses_load_once(cache):
+    loads = 0
+
+    async def load(session):
+        nonlocal loads
+        loads += 1
+        await asyncio.sleep(0.01)
+        return {"id": 1, "title": "task"}
+
+    rows = await asyncio.gather(*[read_cache.get_or_load(TenantSession(), "task", 1, load) for _ in range(10)])
+    assert rows == [{"id": 1, "title": "task"}] * 10
+    assert loads == 1
+    assert await read_cache.get_or_load(TenantSession(), "task", 1, load) == {"id": 1, "title": "task"}
+    assert loads == 1
+
+
+@pytest.mark.anyio
+async def test_invalidation_drops_entry_and_in_flight_load(cache):
+    async def load(session):
+        await asyncio.sleep(0.01)
+        return {"id": 2}
+
+    pending = asyncio.ensure_future(read_cache.get_or_load(TenantSession(), "task", 2, load))
+    await asyncio.sleep(0)
+    await read_cache.invalidate(TenantSession(), "task", 2)
+    assert await pending == {"id": 2}
+    # The load started before the write, so it must not have been stored
+    assert cache.data == {}
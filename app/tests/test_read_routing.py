@@ -0,0 +1,32 @@
+import pytest
+
+import app.utils.read_routing as read_routing
+from app.tests.conftest import DictRedis
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    redis = DictRedis()
+    monkeypatch.setattr(read_routing, "redis_client", redis)
+    monkeypatch.setattr(read_routing, "_local_pins", {})
+    return redis
+
+
+@pytest.mark.anyio
+async def test_writes_pin_the_client_on_every_worker(redis):
+    assert not await read_routing.is_pinned_to_primary("tenant_A:user:1")
+    await read_routing.pin_to_primary("tenant_A:user:1")
+    assert await read_routing.is_pinned_to_primary("tenant_A:user:1")
+
+    # Another worker only has Redis to go by
+    read_routing._local_pins.clear()
+    assert await read_routing.is_pinned_to_primary("tenant_A:user:1")
+    assert not await read_routing.is_pinned_to_primary("tenant_A:user:2")
+
+
+@pytest.mark.anyio
+async def test_pinning_can_be_disabled(redis, monkeypatch):
+    monkeypatch.setattr(read_routing, "READ_YOUR_WRITES_SECONDS", 0)
+    await read_routing.pin_to_primary("tenant_A:user:1")
+    assert not await read_routing.is_pinned_to_primary("tenant_A:user:1")
+    assert redis.data == {}
@@ -0,0 +1,68 @@
+import datetime
+import json
+
+import pytest
+from fastapi import FastAPI
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from httpx import ASGITransport, AsyncClient
+
+from app.utils.compression import CompressionMiddleware
+from app.utils.responses import ORJSONResponse, ndjson_line
+
+ROW = {"id": 1, "title": "t", "created_at": datetime.datetime(2024, 5, 1, 12, 30, 0, 1234)}
+
+
+def test_orjson_writes_what_jsonable_encoder_would():
+    assert json.loads(ORJSONResponse(ROW).body) == jsonable_encoder(ROW)
+    assert json.loads(ndjson_line(ROW)) == jsonable_encoder(ROW)
+    assert ndjson_line(ROW).endswith(b"\n")
+
+
+@pytest.mark.anyio
+async def test_only_large_responses_are_compressed():
+    app = FastAPI(default_response_class=ORJSONResponse)
+    app.add_middleware(CompressionMiddleware, minimum_size=1000)
+
+    @app.get("/rows")
+    async def rows(count: int):
+        return [ROW] * count
+
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        small = await client.get("/rows", params={"count": 1}, headers={"Accept-Encoding": "gzip"})
+        assert "content-encoding" not in small.headers
+
+        large = await client.get("/rows", params={"count": 100}, headers={"Accept-Encoding": "gzip"})
+        assert large.headers["content-encoding"] == "gzip"
+        assert int(large.headers["content-length"]) < len(large.content)
+        assert len(json.loads(large.content)) == 100
+
+
+@pytest.mark.anyio
+async def test_brotli_round_trips_large_and_streamed_bodies():
+    app = FastAPI(default_response_class=ORJSONResponse)
+    app.add_middleware(CompressionMiddleware, minimum_size=1000)
+
+    @app.get("/rows")
+    async def rows(count: int):
+        return [ROW] * count
+
+    @app.get("/stream")
+    async def stream(count: int):
+        async def lines():
+            for _ in range(count):
+                yield ndjson_line(ROW)
+
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+    # httpx decodes br with the same brotli package, so content is the decompressed body
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        headers = {"Accept-Encoding": "br"}
+        large = await client.get("/rows", params={"count": 100}, headers=headers)
+        assert large.headers["content-encoding"] == "br"
+        assert int(large.headers["content-length"]) < len(large.content)
+        assert json.loads(large.content) == jsonable_encoder([ROW] * 100)
+
+        streamed = await client.get("/stream", params={"count": 100}, headers=headers)
+        assert streamed.headers["content-encoding"] == "br"
+        assert streamed.content == ndjson_line(ROW) * 100
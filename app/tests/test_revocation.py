@@ -0,0 +1,39 @@
+import time
+
+from app.utils.revocation import BloomFilter, RevocationList
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(1 << 12)
+    jtis = [f"jti-{i}" for i in range(200)]
+    for jti in jtis:
+        bloom.add(jti)
+    assert all(jti in bloom for jti in jtis)
+
+
+def test_revoked_token_is_found_until_expiry():
+    for use_bloom in (False, True):
+        revocations = RevocationList(use_bloom=use_bloom, bloom_size=1 << 12)
+        revocations.add("revoked", time.time() + 60)
+        revocations.add("already-expired", time.time() - 1)
+
+        assert revocations.contains("revoked")
+        assert not revocations.contains("already-expired")
+        assert not revocations.contains("never-revoked")
+
+
+def test_purge_drops_expired_entries():
+    revocations = RevocationList(use_bloom=True, bloom_size=1 << 12)
+    revocations.add("short", time.time() + 60)
+    revocations._revoked["short"] = time.time() - 1
+    revocations.purge_expired()
+    assert revocations.stats()["revoked"] == 0
+    assert not revocations.contains("short")
+
+
+def test_not_live_until_synced():
+    revocations = RevocationList(use_bloom=False)
+    assert not revocations.is_live()
+    revocations.synced = True
+    revocations.last_heartbeat = time.monotonic()
+    assert revocations.is_live()
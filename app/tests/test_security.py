@@ -0,0 +1,37 @@
+import time
+
+from app.schemas.auth import Identity
+from app.security import TokenCache
+
+IDENTITY = Identity(role="tenant_user", tenant_org="ACME", user_id=1, is_admin=False)
+
+
+def test_verified_token_is_cached():
+    cache = TokenCache(max_size=10)
+    assert cache.get("token") is None
+
+    cache.put("token", IDENTITY, "jti-1", time.time() + 60)
+    identity, jti, _ = cache.get("token")
+    assert identity == IDENTITY
+    assert jti == "jti-1"
+    assert cache.stats()["hit_rate"] == 0.5
+
+
+def test_expired_and_revoked_tokens_are_evicted():
+    cache = TokenCache(max_size=10)
+    cache.put("expired", IDENTITY, "jti-1", time.time() - 1)
+    cache.put("revoked", IDENTITY, "jti-2", time.time() + 60)
+
+    cache.discard_jti("jti-2")
+    assert cache.get("expired") is None
+    assert cache.get("revoked") is None
+    assert cache.stats()["size"] == 0
+
+
+def test_cache_is_bounded():
+    cache = TokenCache(max_size=2)
+    for i in range(3):
+        cache.put(f"token-{i}", IDENTITY, f"jti-{i}", time.time() + 60)
+    assert cache.get("token-0") is None
+    assert cache.get("token-2") is not None
+    assert cache.stats()["size"] == 2
@@ -5,6 +5,7 @@ from faker import Faker
 from httpx import ASGITransport, AsyncClient
 
 from app.main import myapp
+from app.tests.conftest import wait_for_provisioning
 
 MSSP_OPERATOR_EMAIL = "mssp@ridgesecurity.com"
 MSSP_OPERATOR_PASSWORD = "XYZ"
@@ -61,8 +62,10 @@ class TestTask:
         )
         logger.debug(response.json())
 
-        assert response.status_code == 200
-        assert response.json()["message"] == f"Tenant {self.tenant_org.strip().upper()} created successfully."
+        assert response.status_code == 202
+        assert response.json()["message"] == f"Tenant {self.tenant_org.strip().upper()} is being provisioned."
+        job = await wait_for_provisioning(client, mssp_operator_token, response.json()["job_id"])
+        assert job["status"] == "succeeded"
 
         # Log in as the new tenant admin
         response = await client.post(
@@ -145,3 +148,50 @@ class TestTask:
         logger.info(response.json())
         assert response.status_code == 200
         assert len(response.json()) == 2
+
+    @pytest.mark.anyio
+    async def test_get_tasks_paginated(self, tenant_user_token, client: AsyncClient):
+        response = await client.get(
+            f"/tenants/{self.tenant_org}/tasks/?limit=1",
+            headers={"Authorization": f"Bearer {tenant_user_token}"},
+        )
+        assert response.status_code == 200
+        assert len(response.json()) == 1
+        next_cursor = response.headers["X-Next-Cursor"]
+
+        response = await client.get(
+            f"/tenants/{self.tenant_org}/tasks/?limit=1&after={next_cursor}",
+            headers={"Authorization": f"Bearer {tenant_user_token}"},
+        )
+        assert response.status_code == 200
+        assert response.json()[0]["title"] == "Another Test Task"
+        assert "X-Next-Cursor" not in response.headers
+
+    @pytest.mark.anyio
+    async def test_stream_tasks(self, tenant_user_token, client: AsyncClient):
+        response = await client.get(
+            f"/tenants/{self.tenant_org}/tasks/?stream=true",
+            headers={"Authorization": f"Bearer {tenant_user_token}"},
+        )
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+        assert len(response.text.splitlines()) == 2
+
+    @pytest.mark.anyio
+    async def test_bulk_tasks(self, tenant_user_token, client: AsyncClient):
+        body = "\n".join(
+            [
+                '{"op": "create", "title": "Bulk Task", "description": "Created in bulk"}',
+                '{"op": "update", "id": 1, "title": "Updated Task", "description": "Updated in bulk"}',
+                '{"op": "delete", "id": 999999}',
+                '{"op": "create", "title": "Missing description"}',
+            ]
+        )
+        response = await client.post(
+            f"/tenants/{self.tenant_org}/tasks/bulk",
+            content=body,
+            headers={"Authorization": f"Bearer {tenant_user_token}", "Content-Type": "application/x-ndjson"},
+        )
+        logger.info(response.json())
+        assert response.status_code == 200
+        assert [result["status"] for result in response.json()] == ["created", "updated", "not_found", "invalid"]
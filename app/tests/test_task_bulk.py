@@ -0,0 +1,88 @@
+import json
+
+import pytest
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+import app.api.task_routes as task_routes
+from app.api.deps import get_current_tenant_user, get_tenant_db
+from app.database import TenantSession
+from app.migrations import create_tenant_schema
+from app.models.tenant import Task, User
+from app.schemas.auth import Identity
+
+
+@pytest.fixture
+async def client(tmp_path, monkeypatch):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/tenant_A.db")
+    await create_tenant_schema(engine)
+    factory = sessionmaker(bind=engine, class_=AsyncSession, sync_session_class=TenantSession, expire_on_commit=False)
+    async with factory() as db:
+        db.add_all(
+            [
+                User(id=1, tenant_org="A", name="u", email="u@a.ai", hashed_password="x"),
+                User(id=2, tenant_org="A", name="other", email="other@a.ai", hashed_password="x"),
+                Task(id=50, title="someone else's", user_id=2),
+            ]
+        )
+        await db.commit()
+
+    async def get_db():
+        async with factory(info={"tenant_db": "tenant_A"}) as db:
+            yield db
+
+    # Small chunks, so the ids have to be matched up across several transactions
+    monkeypatch.setattr(task_routes, "TASK_BULK_CHUNK_SIZE", 2)
+    app = FastAPI()
+    app.include_router(task_routes.router, prefix="/tenants")
+    app.dependency_overrides[get_tenant_db] = get_db
+    app.dependency_overrides[get_current_tenant_user] = lambda: Identity(
+        role="tenant_user", tenant_org="A", user_id=1, is_admin=False
+    )
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+        client.factory = factory
+        yield client
+    await engine.dispose()
+
+
+@pytest.mark.anyio
+async def test_bulk_reports_each_line_and_the_ids_it_created(client):
+    lines = [
+        json.dumps({"op": "create", "title": "first", "description": "d"}),
+        "not json",
+        "",
+        json.dumps({"op": "delete"}),
+        json.dumps({"op": "archive", "id": 1}),
+        json.dumps({"op": "create", "title": "second", "description": "d"}),
+        json.dumps({"op": "update", "id": 50, "title": "mine now", "description": "d"}),
+        json.dumps({"op": "delete", "id": 50}),
+        json.dumps({"op": "create", "title": "third", "description": "d"}),
+    ]
+    # The last line has no trailing newline
+    response = await client.post("/tenants/A/tasks/bulk", content="\n".join(lines).encode())
+    assert response.status_code == 200
+    results = response.json()
+
+    assert [(result["index"], result["op"], result["status"]) for result in results] == [
+        (0, "create", "created"),
+        (1, "unknown", "invalid"),
+        (2, "delete", "invalid"),
+        (3, "unknown", "invalid"),
+        (4, "create", "created"),
+        (5, "update", "not_found"),
+        (6, "delete", "not_found"),
+        (7, "create", "created"),
+    ]
+    assert "delete requires an id" in results[2]["detail"]
+
+    async with client.factory() as db:
+        titles = dict((await db.execute(select(Task.id, Task.title).where(Task.user_id == 1))).all())
+        assert (await db.get(Task, 50)).title == "someone else's"
+    assert {result["id"]: titles[result["id"]] for result in results if result["status"] == "created"} == {
+        results[0]["id"]: "first",
+        results[4]["id"]: "second",
+        results[7]["id"]: "third",
+    }
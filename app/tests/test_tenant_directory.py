@@ -0,0 +1,38 @@
+from types import SimpleNamespace
+
+from app.utils.tenant_directory import MISSING, TenantDirectory
+
+
+def test_tenant_is_cached_until_invalidated():
+    directory = TenantDirectory(ttl=60, negative_ttl=60)
+    assert directory.get_tenant("ACME") is MISSING
+
+    tenant = SimpleNamespace(tenant_org="ACME", db_name="tenant_ACME")
+    directory.set_tenant("ACME", tenant)
+    assert directory.get_tenant("ACME") is tenant
+
+    directory.invalidate(tenant_org="ACME")
+    assert directory.get_tenant("ACME") is MISSING
+    assert directory.stats()["hits"] == 1
+    assert directory.stats()["misses"] == 2
+
+
+def test_unknown_tenant_is_negatively_cached():
+    directory = TenantDirectory(ttl=60, negative_ttl=0)
+    directory.set_tenant("NOPE", None)
+    # negative entries expire on their own, shorter TTL
+    assert directory.get_tenant("NOPE") is MISSING
+
+    directory = TenantDirectory(ttl=60, negative_ttl=60)
+    directory.set_tenant("NOPE", None)
+    assert directory.get_tenant("NOPE") is None
+
+
+def test_invalidating_tenant_drops_its_domains():
+    directory = TenantDirectory(ttl=60, negative_ttl=60)
+    tenant = SimpleNamespace(tenant_org="ACME", db_name="tenant_ACME")
+    directory.set_tenant_by_domain("acme.ai", tenant)
+    assert directory.get_tenant_by_domain("acme.ai") is tenant
+
+    directory.invalidate(tenant_org="ACME")
+    assert directory.get_tenant_by_domain("acme.ai") is MISSING
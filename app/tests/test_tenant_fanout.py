@@ -0,0 +1,41 @@
+import asyncio
+
+import pytest
+
+from app.utils.tenant_fanout import merge_tenant_streams
+
+TENANT_ROWS = {
+    "A": [1, 4, 5, 9],
+    "B": [2, 3, 6, 7, 8],
+    "C": [],
+}
+
+
+async def fetch_page(tenant, after, limit):
+    if tenant == "SLOW":
+        await asyncio.sleep(1)
+    if tenant == "BROKEN":
+        raise Exception("connection refused")
+    rows = [row for row in TENANT_ROWS[tenant] if after is None or row > after]
+    return rows[:limit]
+
+
+@pytest.mark.anyio
+async def test_merges_tenants_in_key_order():
+    failures = []
+    rows = merge_tenant_streams(["A", "B", "C"], fetch_page, lambda row: row, failures, concurrency=2, page_size=2)
+    merged = [item async for item in rows]
+    assert [row for _, row in merged] == list(range(1, 10))
+    assert [tenant for tenant, _ in merged][:3] == ["A", "B", "B"]
+    assert failures == []
+
+
+@pytest.mark.anyio
+async def test_failed_and_slow_tenants_are_reported():
+    failures = []
+    rows = merge_tenant_streams(
+        ["A", "BROKEN", "SLOW"], fetch_page, lambda row: row, failures, timeout=0.1, page_size=2
+    )
+    merged = [row async for _, row in rows]
+    assert merged == TENANT_ROWS["A"]
+    assert sorted(failure["tenant"] for failure in failures) == ["BROKEN", "SLOW"]
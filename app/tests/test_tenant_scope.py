@@ -0,0 +1,73 @@
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.crud.task import bulk_write_tasks, create_task, get_task, get_tasks_by_user
+from app.database import TenantSession, lazy_tenant_session
+from app.migrations import create_tenant_schema
+from app.models.tenant import Task, User
+from app.schemas.task import TaskCreate
+
+
+@pytest.fixture
+async def sessions(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/shared.db")
+    await create_tenant_schema(engine)
+    factory = sessionmaker(bind=engine, class_=AsyncSession, sync_session_class=TenantSession, expire_on_commit=False)
+    async with factory() as unscoped:
+        unscoped.add_all(
+            [
+                User(id=1, tenant_org="A", name="admin", email="admin@a.ai", hashed_password="x"),
+                User(id=2, tenant_org="B", name="admin", email="admin@b.ai", hashed_password="x"),
+            ]
+        )
+        await unscoped.commit()
+
+    def scoped(tenant_org):
+        return factory(info={"tenant_db": "tenant_shared", "tenant_org": tenant_org, "shared": True})
+
+    scoped.factory = factory
+    yield scoped
+    await engine.dispose()
+
+
+@pytest.mark.anyio
+async def test_shared_sessions_only_see_their_tenant(sessions):
+    async with sessions("A") as db:
+        task = await create_task(db, TaskCreate(title="a", description="d"), 1)
+        assert task.tenant_org == "A"
+        created_ids, _, _ = await bulk_write_tasks(db, 1, [TaskCreate(title="a2", description="d")], [], [])
+        assert (await get_task(db, created_ids[0])).tenant_org == "A"
+
+    async with sessions("B") as db:
+        assert await get_task(db, task.id) is None
+        assert await get_tasks_by_user(db, 1) == []
+        assert (await db.execute(select(User.email))).scalars().all() == ["admin@b.ai"]
+        _, _, deleted_ids = await bulk_write_tasks(db, 2, [], [], [task.id], owner_only=False)
+        assert deleted_ids == set()
+
+    async with sessions("A") as db:
+        assert len(await get_tasks_by_user(db, 1)) == 2
+
+
+@pytest.mark.anyio
+async def test_lazy_session_resolves_on_first_use(sessions):
+    lookups = []
+
+    async def resolve():
+        lookups.append(1)
+        return sessions.factory, {"tenant_org": "B", "shared": True}
+
+    async with lazy_tenant_session(resolve) as db:
+        assert lookups == []
+        # The first statement is a flush, which has to stamp the tenant before it knows where to write
+        task = await create_task(db, TaskCreate(title="b", description="d"), 2)
+        assert task.tenant_org == "B"
+        assert [task.id for task in await get_tasks_by_user(db, 2)] == [task.id]
+        assert len(lookups) == 1
+
+    async with lazy_tenant_session(resolve) as db:
+        # Nothing queried, nothing resolved
+        pass
+    assert len(lookups) == 1
@@ -0,0 +1,76 @@
+from types import SimpleNamespace
+
+import pytest
+
+import app.utils.warmup as warmup
+from app.database import TenantEngineRegistry
+
+
+class SortedSetRedis:
+    def __init__(self):
+        self.scores = {}
+
+    def pipeline(self, transaction=True):
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def zincrby(self, key, amount, member):
+        self.scores[member] = self.scores.get(member, 0) + amount
+
+    async def execute(self):
+        return []
+
+    async def zrevrange(self, key, start, end):
+        members = sorted(self.scores, key=self.scores.get, reverse=True)
+        return [member.encode() for member in members[start : end + 1]]
+
+    async def ping(self):
+        return True
+
+
+@pytest.fixture
+def redis(monkeypatch):
+    redis = SortedSetRedis()
+    monkeypatch.setattr(warmup, "redis_client", redis)
+    monkeypatch.setattr(warmup, "_activity", warmup.Counter())
+    return redis
+
+
+@pytest.mark.anyio
+async def test_activity_is_summed_across_flushes(redis):
+    for tenant_org in ["A", "B", "B", "C", "B", "C"]:
+        warmup.record_tenant_activity(tenant_org)
+    await warmup.flush_tenant_activity()
+    warmup.record_tenant_activity("A")
+    await warmup.flush_tenant_activity()
+
+    assert redis.scores == {"A": 2, "B": 3, "C": 2}
+    assert (await warmup._most_active_tenants(1)) == ["B"]
+
+
+@pytest.mark.anyio
+async def test_warm_up_opens_the_most_active_tenant_pools(redis, monkeypatch, tmp_path):
+    registry = TenantEngineRegistry(f"sqlite+aiosqlite:///{tmp_path}/{{tenant_db_name}}.db")
+    monkeypatch.setattr(warmup, "tenant_engines", registry)
+    monkeypatch.setattr(warmup, "warmup_state", dict(warmup.warmup_state, tenants=0, failed=0))
+    monkeypatch.setattr(warmup, "WARMUP_TENANTS", 2)
+
+    async def get_cached_tenant(tenant_org, management_db):
+        if tenant_org == "GONE":
+            raise Exception("Tenant not found")
+        return SimpleNamespace(tenant_org=tenant_org, db_name=f"tenant_{tenant_org}")
+
+    monkeypatch.setattr(warmup, "get_cached_tenant", get_cached_tenant)
+    redis.scores = {"A": 10, "GONE": 5, "B": 1}
+
+    await warmup.warm_up()
+
+    assert set(registry.stats()["tenants"]) == {"tenant_A"}
+    assert warmup.warmup_state["tenants"] == 1
+    assert warmup.warmup_state["failed"] == 1
+    await registry.dispose_all()
@@ -1,46 +1,149 @@
+import asyncio
 import logging
 import random
 import string
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
 
-from captcha.image import ImageCaptcha
-
-from app.config import DISABLE_CAPTCHA
+from app.config import (
+    CAPTCHA_POOL_BATCH,
+    CAPTCHA_POOL_REFILL_INTERVAL,
+    CAPTCHA_POOL_SIZE,
+    CAPTCHA_RENDER_WORKERS,
+    DISABLE_CAPTCHA,
+)
+from app.utils.logging_utils import SAMPLED
 from app.utils.redis_client import redis_client
 
 logger = logging.getLogger(__name__)
 
+CAPTCHA_TTL = 300
+CAPTCHA_POOL_KEY = "captcha_pool"
+
+captcha_pool_stats = {"served_from_pool": 0, "rendered_inline": 0, "rendered": 0}
+
+# Rendering is CPU bound, keep it off the event loop
+_render_executor = ThreadPoolExecutor(max_workers=CAPTCHA_RENDER_WORKERS, thread_name_prefix="captcha")
+_refill_task: asyncio.Task = None
+_refill_requested = asyncio.Event()
+
+
+def render_captchas(count: int) -> list[tuple[str, bytes]]:
+    # Imported here, on the render thread: PIL and the fonts are slow to load and not needed to serve requests
+    from captcha.image import ImageCaptcha
 
-def generate_captcha():
     image = ImageCaptcha()
-    captcha_text = "".join(random.choices(string.ascii_uppercase + string.digits, k=3))
-    captcha_image = image.generate_image(captcha_text)
+    captchas = []
+    for _ in range(count):
+        captcha_text = "".join(random.choices(string.ascii_uppercase + string.digits, k=3))
+        buf = BytesIO()
+        image.generate_image(captcha_text).save(buf, format="PNG")
+        captchas.append((captcha_text, buf.getvalue()))
+    return captchas
+
+
+def pack_captcha(captcha_text: str, png: bytes) -> bytes:
+    # The text is alphanumeric, so the first ":" always separates it from the PNG
+    return captcha_text.encode("utf-8") + b":" + png
+
+
+def unpack_captcha(entry: bytes) -> tuple[str, bytes]:
+    captcha_text, png = entry.split(b":", 1)
+    return captcha_text.decode("utf-8"), png
+
+
+async def _render(count: int) -> list[tuple[str, bytes]]:
+    captchas = await asyncio.get_running_loop().run_in_executor(_render_executor, render_captchas, count)
+    captcha_pool_stats["rendered"] += count
+    return captchas
+
+
+async def refill_captcha_pool(size: int = CAPTCHA_POOL_SIZE):
+    depth = await redis_client.llen(CAPTCHA_POOL_KEY)
+    while depth < size:
+        captchas = await _render(min(CAPTCHA_POOL_BATCH, size - depth))
+        async with redis_client.pipeline(transaction=False) as pipe:
+            pipe.rpush(CAPTCHA_POOL_KEY, *[pack_captcha(text, png) for text, png in captchas])
+            # Other workers refill the same pool, don't let it grow past the target
+            pipe.ltrim(CAPTCHA_POOL_KEY, 0, size - 1)
+            await pipe.execute()
+        depth = await redis_client.llen(CAPTCHA_POOL_KEY)
 
-    # Store the captcha text in Redis with a TTL of 5 minutes
+
+async def _refill_loop():
+    while True:
+        try:
+            await refill_captcha_pool()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Refilling the CAPTCHA pool failed: {e}")
+
+        try:
+            await asyncio.wait_for(_refill_requested.wait(), CAPTCHA_POOL_REFILL_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+        _refill_requested.clear()
+
+
+def start_captcha_pool():
+    global _refill_task
+    if CAPTCHA_POOL_SIZE > 0 and _refill_task is None:
+        _refill_task = asyncio.create_task(_refill_loop())
+
+
+async def stop_captcha_pool():
+    global _refill_task
+    if _refill_task is not None:
+        _refill_task.cancel()
+        await asyncio.gather(_refill_task, return_exceptions=True)
+        _refill_task = None
+
+
+async def generate_captcha():
+    entry = await redis_client.lpop(CAPTCHA_POOL_KEY)
+    if entry is not None:
+        captcha_text, png = unpack_captcha(entry)
+        captcha_pool_stats["served_from_pool"] += 1
+    else:
+        ((captcha_text, png),) = await _render(1)
+        captcha_pool_stats["rendered_inline"] += 1
+    if _refill_task is not None:
+        _refill_requested.set()
+
+    # Text and image expire together and are consumed together
     key = "".join(random.choices(string.ascii_letters + string.digits, k=16))
-    buf = BytesIO()
-    captcha_image.save(buf, format="PNG")
-    buf.seek(0)
-    redis_client.setex(f"captcha_text_{key}", 300, captcha_text)
-    redis_client.setex(f"captcha_image_{key}", 300, buf.getvalue())
+    async with redis_client.pipeline(transaction=False) as pipe:
+        pipe.hset(f"captcha_{key}", mapping={"text": captcha_text, "image": png})
+        pipe.expire(f"captcha_{key}", CAPTCHA_TTL)
+        await pipe.execute()
     return key
 
 
-def validate_captcha(key: str, captcha_text: str) -> bool:
+async def validate_captcha(key: str, captcha_text: str) -> bool:
     if DISABLE_CAPTCHA:
         return True
-    stored_captcha = redis_client.get(f"captcha_text_{key}")
-    logger.info(f"Stored CAPTCHA: {stored_captcha}")
-    logger.info(f"Received CAPTCHA: {captcha_text}")
-    if stored_captcha is None:
-        return False
-    return stored_captcha.decode("utf-8").lower() == captcha_text.strip().lower()
+    # Read and delete in one transaction so every CAPTCHA can only be used once
+    async with redis_client.pipeline(transaction=True) as pipe:
+        pipe.hget(f"captcha_{key}", "text")
+        pipe.delete(f"captcha_{key}")
+        stored_captcha, deleted = await pipe.execute()
+    if stored_captcha is None or not deleted:
+        valid = False
+    else:
+        valid = stored_captcha.decode("utf-8").lower() == captcha_text.strip().lower()
+    logger.debug("CAPTCHA %s validated: %s", key, valid, extra=SAMPLED)
+    return valid
 
 
-def get_captcha_image(key: str) -> BytesIO:
-    stored_image = redis_client.get(f"captcha_image_{key}")
+async def get_captcha_image(key: str) -> BytesIO:
+    stored_image = await redis_client.hget(f"captcha_{key}", "image")
     if stored_image is None:
         return None
     buf = BytesIO(stored_image)
     buf.seek(0)
     return buf
+
+
+def captcha_pool_stats_snapshot() -> dict:
+    return {"target": CAPTCHA_POOL_SIZE, **captcha_pool_stats}
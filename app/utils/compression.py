@@ -0,0 +1,46 @@
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipMiddleware, IdentityResponder
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.config import BROTLI_QUALITY, COMPRESSION_LEVEL, COMPRESSION_MIN_SIZE
+
+try:
+    import brotli
+except ImportError:  # In requirements.txt; without it every client gets gzip
+    brotli = None
+
+
+class BrotliResponder(IdentityResponder):
+    content_encoding = "br"
+
+    def __init__(self, app: ASGIApp, minimum_size: int, quality: int = BROTLI_QUALITY):
+        super().__init__(app, minimum_size)
+        self.quality = quality
+        self._compressor = None
+
+    async def apply_compression(self, body: bytes, *, more_body: bool) -> bytes:
+        if self._compressor is None:
+            self._compressor = brotli.Compressor(quality=self.quality)
+        out = self._compressor.process(body)
+        # Streamed chunks are flushed so NDJSON lines reach the client as they are produced
+        return out + (self._compressor.flush() if more_body else self._compressor.finish())
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """Brotli when the client accepts it and the brotli package is installed, gzip otherwise, from minimum_size up."""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = COMPRESSION_MIN_SIZE,
+        compresslevel: int = COMPRESSION_LEVEL,
+        brotli_quality: int = BROTLI_QUALITY,
+    ):
+        super().__init__(app, minimum_size, compresslevel)
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] == "http" and brotli is not None and "br" in Headers(scope=scope).get("Accept-Encoding", ""):
+            await BrotliResponder(self.app, self.minimum_size, self.brotli_quality)(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
@@ -2,6 +2,7 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 
 from app.config import MANAGEMENT_DATABASE_URL_SYNC
+from app.migrations import MANAGEMENT_MIGRATIONS, stamp_head
 from app.models.management import ManagementBase, MSSPOperator
 from app.security import hash_password
 from app.utils.reset_database import reset_database
@@ -32,5 +33,7 @@ def create_admin_user():
 if __name__ == "__main__":
     reset_database()
     ManagementBase.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        stamp_head(conn, MANAGEMENT_MIGRATIONS)
     create_admin_user()
     print("MSSP operator user created successfully.")
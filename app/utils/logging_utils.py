@@ -0,0 +1,106 @@
+import json
+import logging
+import random
+import time
+import uuid
+from contextvars import ContextVar
+
+# Set per request so every record logged while handling it can carry them
+request_id_var: ContextVar[str] = ContextVar("request_id", default=None)
+tenant_org_var: ContextVar[str] = ContextVar("tenant_org", default=None)
+
+# Pass as extra= on per-request messages so they are sampled instead of written every time
+SAMPLED = {"sampled": True}
+
+
+class ContextFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        record.tenant_org = tenant_org_var.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps a fraction of the records logged with extra=SAMPLED; warnings and errors are always kept."""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if not getattr(record, "sampled", False) or record.levelno >= logging.WARNING:
+            return True
+        return random.random() < self.rate
+
+
+class RateLimitFilter(logging.Filter):
+    """Token bucket per call site for records logged with extra=SAMPLED; warnings and errors are always kept.
+
+    The next record let through reports how many were dropped.
+    """
+
+    def __init__(self, per_second: float, burst: int = None):
+        super().__init__()
+        self.per_second = per_second
+        self.burst = burst or max(int(per_second), 1)
+        # (pathname, lineno) -> [tokens, last refill, suppressed]
+        self._buckets = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if self.per_second <= 0 or not getattr(record, "sampled", False) or record.levelno >= logging.WARNING:
+            return True
+        now = time.monotonic()
+        bucket = self._buckets.setdefault((record.pathname, record.lineno), [self.burst, now, 0])
+        bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.per_second)
+        bucket[1] = now
+        if bucket[0] < 1:
+            bucket[2] += 1
+            return False
+        bucket[0] -= 1
+        if bucket[2]:
+            record.msg = f"{record.getMessage()} ({bucket[2]} similar messages suppressed)"
+            record.args = None
+            bucket[2] = 0
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+            "tenant_org": getattr(record, "tenant_org", None),
+        }
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class RequestContextMiddleware:
+    """Assigns every request an id (X-Request-ID is honoured) and echoes it in the response."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = dict(scope["headers"]).get(b"x-request-id", b"").decode("latin-1")[:64] or uuid.uuid4().hex
+        request_id_token = request_id_var.set(request_id)
+        tenant_org_token = tenant_org_var.set(None)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = [*message.get("headers", []), (b"x-request-id", request_id.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_id_var.reset(request_id_token)
+            tenant_org_var.reset(tenant_org_token)
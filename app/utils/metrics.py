@@ -0,0 +1,147 @@
+import time
+
+from prometheus_client import Counter, Gauge, Histogram
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from starlette_exporter.middleware import get_matching_route_path
+
+from app.config import METRICS_TENANT_LABEL_LIMIT
+
+OTHER = "other"
+# tenant_org values of engines that serve no single tenant; lowercase, so no tenant_org can clash with them
+MANAGEMENT = "management"
+SHARED = "shared"
+UNASSIGNED = "unassigned"  # Warm-pool spares and databases no tenant has been routed to yet
+
+
+class LabelGuard:
+    """Caps the distinct values of a label; values past the limit are reported as "other"."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._admitted = set()
+        self.folded = 0
+
+    def __call__(self, value: str, admit: bool = True) -> str:
+        if value in self._admitted:
+            return value
+        if admit and len(self._admitted) < self.limit:
+            self._admitted.add(value)
+            return value
+        self.folded += 1
+        return OTHER
+
+    def stats(self) -> dict:
+        return {"labels": len(self._admitted), "limit": self.limit, "folded": self.folded}
+
+
+tenant_org_labels = LabelGuard(METRICS_TENANT_LABEL_LIMIT)
+
+TENANT_REQUEST_DURATION = Histogram(
+    "tenant_request_duration_seconds",
+    "Latency of tenant scoped requests",
+    ["method", "route", "tenant_org"],
+)
+# role is "primary" or "replica"
+DB_QUERY_DURATION = Histogram("db_query_duration_seconds", "Latency of database statements", ["tenant_org", "role"])
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    "db_pool_checkout_wait_seconds", "Time spent waiting for a pooled database connection", ["tenant_org", "role"]
+)
+DB_POOL_IN_USE = Gauge(
+    "db_pool_connections_in_use",
+    "Database connections checked out",
+    ["tenant_org", "role"],
+    multiprocess_mode="livesum",
+)
+REDIS_COMMAND_DURATION = Histogram("redis_command_duration_seconds", "Latency of Redis calls", ["command"])
+BCRYPT_DURATION = Histogram(
+    "bcrypt_duration_seconds",
+    "Time spent hashing or verifying passwords, excluding queue wait",
+    ["operation"],
+    buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 2.0, 5.0),
+)
+RATE_LIMITED = Counter("rate_limited_requests", "Requests turned away with 429", ["endpoint", "limiter"])
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    metrics_labels = (UNASSIGNED, "primary")
+
+    def _do_get(self):
+        # _do_get is where a checkout blocks until a connection is free (or a new one is opened)
+        started_at = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_CHECKOUT_WAIT.labels(*self.metrics_labels).observe(time.perf_counter() - started_at)
+
+
+def instrument_engine(engine: AsyncEngine, tenant_org: str, role: str = "primary"):
+    # tenant_org is already a label, from tenant_org_labels or one of the fixed ones above
+    sync_engine = engine.sync_engine
+    if isinstance(sync_engine.pool, InstrumentedQueuePool):
+        sync_engine.pool.metrics_labels = (tenant_org, role)
+    query_duration = DB_QUERY_DURATION.labels(tenant_org, role)
+    in_use = DB_POOL_IN_USE.labels(tenant_org, role)
+
+    # A connection runs one statement at a time, and conn.info outlives the checkout, so a single value that is
+    # always taken back, also when the statement fails, never leaves a stale start time behind
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info["query_started_at"] = time.perf_counter()
+
+    def _observe(conn):
+        started_at = conn.info.pop("query_started_at", None) if conn is not None else None
+        if started_at is not None:
+            query_duration.observe(time.perf_counter() - started_at)
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        _observe(conn)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _handle_error(exception_context):
+        _observe(exception_context.connection)
+
+    @event.listens_for(sync_engine.pool, "checkout")
+    def _checkout(dbapi_connection, connection_record, connection_proxy):
+        in_use.inc()
+
+    @event.listens_for(sync_engine.pool, "checkin")
+    def _checkin(dbapi_connection, connection_record):
+        in_use.dec()
+
+
+class TenantMetricsMiddleware:
+    """Records request latency by route template and tenant for routes under /{tenant_org}/."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        started_at = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            tenant_org = scope.get("path_params", {}).get("tenant_org")
+            if tenant_org is not None:
+                route = get_matching_route_path(scope, scope["app"].routes)
+                # Only successful requests may claim a label, so made-up tenant names can't use up the budget
+                label = tenant_org_labels(tenant_org.upper(), admit=status_code < 400)
+                TENANT_REQUEST_DURATION.labels(scope["method"], route, label).observe(time.perf_counter() - started_at)
+
+
+def metrics_stats() -> dict:
+    return {"tenant_org_labels": tenant_org_labels.stats()}
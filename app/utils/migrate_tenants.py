@@ -0,0 +1,132 @@
+import argparse
+import asyncio
+import json
+import logging
+import time
+
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.config import MIGRATION_CONCURRENCY, setup_logging
+from app.crud.database_server import route_tenant_database
+from app.crud.spare_database import get_spare_databases
+from app.crud.tenant import get_all_tenants
+from app.database import ManagementSessionLocal, management_engine, tenant_engines
+from app.migrations import MANAGEMENT_MIGRATIONS, TENANT_MIGRATIONS, apply_migration, get_applied_versions
+
+logger = logging.getLogger(__name__)
+
+
+async def migrate_database(engine: AsyncEngine, migrations: list, dry_run: bool = False) -> dict:
+    async with engine.begin() as conn:
+        applied = await conn.run_sync(get_applied_versions)
+    pending = [migration for migration in migrations if migration.version not in applied]
+    result = {
+        "from_version": max(applied, default=0),
+        "pending": [migration.version for migration in pending],
+        "applied": [],
+    }
+    if dry_run:
+        return result
+
+    # One transaction per migration, so an interrupted run resumes at the first unapplied version
+    for migration in pending:
+        async with engine.begin() as conn:
+            await conn.run_sync(apply_migration, migration)
+        result["applied"].append(migration.version)
+    return result
+
+
+async def migrate_management(dry_run: bool = False) -> dict:
+    return await migrate_database(management_engine, MANAGEMENT_MIGRATIONS, dry_run)
+
+
+async def migrate_tenant(tenant, dry_run: bool = False) -> dict:
+    result = {"tenant_org": getattr(tenant, "tenant_org", None), "db_name": tenant.db_name}
+    # Spares have no server_id and always live on the default server
+    async with ManagementSessionLocal() as management_db:
+        await route_tenant_database(tenant.db_name, getattr(tenant, "server_id", None), management_db)
+    result.update(await migrate_database(tenant_engines.get_engine(tenant.db_name), TENANT_MIGRATIONS, dry_run))
+    return result
+
+
+async def migrate_tenants(
+    concurrency: int = MIGRATION_CONCURRENCY, dry_run: bool = False, tenant_orgs: list[str] = None
+) -> dict:
+    async with ManagementSessionLocal() as management_db:
+        tenants = await get_all_tenants(management_db)
+        # Spare databases from the warm pool must be at head by the time they are claimed
+        spares = await get_spare_databases(management_db)
+    if tenant_orgs:
+        tenants = [tenant for tenant in tenants if tenant.tenant_org in tenant_orgs]
+    else:
+        tenants = list(tenants) + list(spares)
+    # Shared tenants all point at one database, which is migrated once
+    tenants = list({tenant.db_name: tenant for tenant in tenants}.values())
+
+    semaphore = asyncio.Semaphore(concurrency)
+    report = {
+        "total": len(tenants),
+        "done": 0,
+        "up_to_date": 0,
+        "pending": 0,
+        "migrated": 0,
+        "failed": 0,
+        "tenants": [],
+    }
+    started_at = time.monotonic()
+
+    async def run(tenant):
+        async with semaphore:
+            try:
+                result = await migrate_tenant(tenant, dry_run)
+                result["status"] = "up_to_date" if not result["pending"] else "pending" if dry_run else "migrated"
+            except Exception as e:
+                logger.error(f"Migrating {tenant.db_name} failed: {e}")
+                result = {
+                    "tenant_org": getattr(tenant, "tenant_org", None),
+                    "db_name": tenant.db_name,
+                    "status": "failed",
+                    "error": str(e),
+                }
+            finally:
+                # Keep the number of open pools bounded by the concurrency, not the tenant count
+                tenant_engines.evict(tenant.db_name)
+
+        report["done"] += 1
+        report[result["status"]] += 1
+        report["tenants"].append(result)
+        logger.info(f"[{report['done']}/{report['total']}] {tenant.db_name}: {result['status']}")
+
+    await asyncio.gather(*(run(tenant) for tenant in tenants))
+    await tenant_engines.dispose_all()
+    report["head"] = TENANT_MIGRATIONS[-1].version if TENANT_MIGRATIONS else 0
+    report["elapsed_seconds"] = round(time.monotonic() - started_at, 2)
+    return report
+
+
+async def migrate_all(
+    concurrency: int = MIGRATION_CONCURRENCY, dry_run: bool = False, tenant_orgs: list[str] = None
+) -> dict:
+    # The management database first, since tenant discovery reads from it
+    management_report = await migrate_management(dry_run)
+    report = await migrate_tenants(concurrency, dry_run, tenant_orgs)
+    report["management"] = management_report
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apply schema migrations to every tenant database")
+    parser.add_argument("--concurrency", type=int, default=MIGRATION_CONCURRENCY)
+    parser.add_argument("--dry-run", action="store_true", help="Only report pending migrations")
+    parser.add_argument("--tenant", action="append", dest="tenant_orgs", help="Limit to a tenant_org (repeatable)")
+    parser.add_argument("--report", help="Write the per-tenant report as JSON to this file")
+    args = parser.parse_args()
+
+    setup_logging()
+    report = asyncio.run(migrate_all(args.concurrency, args.dry_run, args.tenant_orgs))
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(report, f, indent=2)
+    print(json.dumps({key: value for key, value in report.items() if key != "tenants"}, indent=2))
+    if report["failed"]:
+        raise SystemExit(1)
@@ -0,0 +1,207 @@
+import argparse
+import asyncio
+import datetime
+import json
+import logging
+import time
+
+from sqlalchemy import Table, delete, select
+from sqlalchemy.dialects import mysql, sqlite
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.config import TENANT_DATABASE_TEMPLATE_URL, TENANT_MOVE_BATCH, setup_logging
+from app.crud.database_server import DEFAULT_SERVER_NAME, get_database_server, get_database_server_by_name, route_tenant
+from app.crud.tenant import create_tenant_database, delete_shared_tenant_rows, drop_tenant_database, get_tenant_by_org
+from app.database import ManagementSessionLocal, tenant_engines
+from app.migrations import TENANT_MIGRATIONS, create_tenant_schema, get_applied_versions
+from app.models.tenant import SchemaMigration, TenantBase
+from app.utils.tenant_directory import publish_tenant_invalidation
+
+logger = logging.getLogger(__name__)
+
+# Stamped by create_tenant_schema on the target, not copied
+COPIED_TABLES = [table for table in TenantBase.metadata.sorted_tables if table.name != SchemaMigration.__tablename__]
+# Rows changed within this window before a pass started are copied again, to cover clock skew between workers
+CHANGE_WINDOW_SLACK = datetime.timedelta(seconds=30)
+
+
+def _upsert(conn: AsyncConnection, table: Table, rows: list[dict]):
+    columns = [column.name for column in table.columns if not column.primary_key]
+    if conn.dialect.name == "mysql":
+        statement = mysql.insert(table).values(rows)
+        return statement.on_duplicate_key_update({name: statement.inserted[name] for name in columns})
+    statement = sqlite.insert(table).values(rows)
+    return statement.on_conflict_do_update(
+        index_elements=[column.name for column in table.primary_key],
+        set_={name: statement.excluded[name] for name in columns},
+    )
+
+
+def _source_rows(table: Table, tenant_org: str = None):
+    # tenant_org picks one tenant's rows out of a shared database
+    query = select(table)
+    if tenant_org is not None:
+        query = query.where(table.c.tenant_org == tenant_org)
+    return query
+
+
+async def copy_rows(
+    source: AsyncEngine, target: AsyncEngine, table: Table, changed_since=None, tenant_org: str = None
+) -> int:
+    # Keyset over the primary key, each batch upserted, so a pass can be repeated or resumed safely
+    copied = 0
+    after = None
+    while True:
+        query = _source_rows(table, tenant_org).order_by(table.c.id).limit(TENANT_MOVE_BATCH)
+        if after is not None:
+            query = query.where(table.c.id > after)
+        if changed_since is not None:
+            query = query.where(table.c.updated_at >= changed_since)
+        async with source.connect() as conn:
+            rows = [dict(row) for row in (await conn.execute(query)).mappings()]
+        if not rows:
+            return copied
+        async with target.begin() as conn:
+            await conn.execute(_upsert(conn, table, rows))
+        copied += len(rows)
+        after = rows[-1]["id"]
+
+
+async def delete_missing_rows(source: AsyncEngine, target: AsyncEngine, table: Table, tenant_org: str = None) -> int:
+    async with source.connect() as conn:
+        source_ids = set((await conn.execute(_source_rows(table, tenant_org).with_only_columns(table.c.id))).scalars())
+    async with target.connect() as conn:
+        missing = sorted(set((await conn.execute(select(table.c.id))).scalars()) - source_ids)
+    for start in range(0, len(missing), TENANT_MOVE_BATCH):
+        async with target.begin() as conn:
+            await conn.execute(delete(table).where(table.c.id.in_(missing[start : start + TENANT_MOVE_BATCH])))
+    return len(missing)
+
+
+async def sync_pass(source: AsyncEngine, target: AsyncEngine, changed_since=None, tenant_org: str = None) -> dict:
+    result = {"deleted": 0, "copied": 0}
+    if changed_since is not None:
+        # Children first, so a user is never deleted while the target still has tasks pointing at it
+        for table in reversed(COPIED_TABLES):
+            result["deleted"] += await delete_missing_rows(source, target, table, tenant_org)
+    for table in COPIED_TABLES:
+        result["copied"] += await copy_rows(source, target, table, changed_since, tenant_org)
+    return result
+
+
+async def move_tenant(
+    tenant_org: str,
+    server_name: str,
+    settle_seconds: float = 5,
+    max_passes: int = 5,
+    pass_threshold: int = 100,
+    drop_source: bool = False,
+) -> dict:
+    """Copies a tenant to another server while it stays online, then pauses writes briefly to switch over.
+
+    Writes get 503 from the moment the tenant is marked "moving" until the switch; reads are served throughout.
+    A tenant in the shared database is promoted: it gets a dedicated database on the target server.
+    """
+    started_at = time.monotonic()
+    async with ManagementSessionLocal() as management_db:
+        tenant = await get_tenant_by_org(tenant_org, management_db)
+        if tenant is None:
+            raise Exception(f"Tenant {tenant_org} not found")
+        if tenant.status != "active":
+            raise Exception(f"Tenant {tenant_org} is {tenant.status}")
+        source_server = await get_database_server(tenant.server_id, management_db)
+        if server_name == DEFAULT_SERVER_NAME:
+            target_server = None
+        else:
+            target_server = await get_database_server_by_name(server_name, management_db)
+            if target_server is None:
+                raise Exception(f"Database server {server_name} not found")
+        target_id = target_server.id if target_server is not None else None
+        shared = tenant.mode == "shared"
+        if target_id == tenant.server_id and not shared:
+            raise Exception(f"Tenant {tenant_org} is already on {server_name}")
+        await route_tenant(tenant, management_db)
+
+    source_db_name = tenant.db_name
+    # Dedicated tenants keep their database name, which for one claimed from the warm pool is the spare's
+    db_name = f"tenant_{tenant_org}" if shared else source_db_name
+    scope = tenant_org if shared else None
+    source = tenant_engines.get_engine(source_db_name)
+    async with source.connect() as conn:
+        applied = await conn.run_sync(get_applied_versions)
+    if applied != {migration.version for migration in TENANT_MIGRATIONS}:
+        raise Exception(f"{source_db_name} is not at the latest migration, run migrate_tenants first")
+
+    # Its own engine: the registry keeps serving the tenant from the source until the switch
+    target_template = target_server.url_template if target_server is not None else TENANT_DATABASE_TEMPLATE_URL
+    target = create_async_engine(target_template.format(tenant_db_name=db_name), poolclass=NullPool)
+    report = {"tenant_org": tenant_org, "db_name": db_name, "to": server_name, "promoted": shared, "passes": []}
+    try:
+        await create_tenant_database(db_name, if_not_exists=True, server=target_server)
+        await create_tenant_schema(target)
+
+        # Bulk copy, then catch up on what changed meanwhile until the remainder is small
+        changed_since = None
+        for _ in range(max_passes):
+            pass_started = datetime.datetime.now(datetime.UTC) - CHANGE_WINDOW_SLACK
+            result = await sync_pass(source, target, changed_since, scope)
+            report["passes"].append(result)
+            logger.info(f"Moving {tenant_org}: pass {len(report['passes'])} copied {result['copied']} rows")
+            changed_since = pass_started
+            if result["copied"] <= pass_threshold and len(report["passes"]) > 1:
+                break
+
+        async with ManagementSessionLocal() as management_db:
+            tenant = await get_tenant_by_org(tenant_org, management_db)
+            tenant.status = "moving"
+            await management_db.commit()
+            await publish_tenant_invalidation(tenant_org, tenant.domain)
+            paused_at = time.monotonic()
+            try:
+                # Writes that resolved the tenant before the invalidation arrived get to finish
+                await asyncio.sleep(settle_seconds)
+                report["final_pass"] = await sync_pass(source, target, changed_since, scope)
+                tenant.server_id = target_id
+                tenant.db_name = db_name
+                tenant.mode = "dedicated"
+                # A per-tenant replica belonged to the old server
+                tenant.replica_url = None
+            finally:
+                tenant.status = "active"
+                await management_db.commit()
+                await publish_tenant_invalidation(tenant_org, tenant.domain)
+            report["writes_paused_seconds"] = round(time.monotonic() - paused_at, 2)
+    finally:
+        await target.dispose()
+        await tenant_engines.dispose_all()
+
+    if drop_source:
+        # Requests that resolved the old server just before the switch are long done by now
+        await asyncio.sleep(settle_seconds)
+        if shared:
+            await delete_shared_tenant_rows(source_db_name, tenant_org)
+            await tenant_engines.dispose_all()
+        else:
+            await drop_tenant_database(source_db_name, source_server)
+        report["source_dropped"] = True
+    report["elapsed_seconds"] = round(time.monotonic() - started_at, 2)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Move a tenant database to another database server, or promote a shared tenant to its own"
+    )
+    parser.add_argument("tenant_org")
+    parser.add_argument("server", help=f"Name of a registered database server, or {DEFAULT_SERVER_NAME!r}")
+    parser.add_argument("--settle", type=float, default=5, help="Seconds to wait for in-flight writes")
+    parser.add_argument("--max-passes", type=int, default=5, help="Catch-up passes before pausing writes")
+    parser.add_argument("--drop-source", action="store_true", help="Drop the database on the old server afterwards")
+    args = parser.parse_args()
+
+    setup_logging()
+    report = asyncio.run(
+        move_tenant(args.tenant_org.upper(), args.server, args.settle, args.max_passes, drop_source=args.drop_source)
+    )
+    print(json.dumps(report, indent=2))
@@ -0,0 +1,211 @@
+import asyncio
+import datetime
+import logging
+import os
+import socket
+import uuid
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import PROVISIONING_CONCURRENCY, PROVISIONING_STALE_SECONDS, TENANT_POOL_TARGET
+from app.crud.database_server import get_database_server, route_tenant_database
+from app.crud.provisioning_job import (
+    PROVISIONING_STEPS,
+    claim_provisioning_job,
+    get_provisioning_job,
+    set_provisioning_step,
+    touch_provisioning_job,
+    update_provisioning_job,
+)
+from app.crud.spare_database import claim_spare_database
+from app.crud.tenant import (
+    create_shared_tenant_database,
+    create_tenant_database,
+    delete_shared_tenant_rows,
+    delete_tenant,
+    drop_tenant_database,
+    get_tenant_by_org,
+    register_tenant,
+)
+from app.crud.user import create_tenant_admin_user_with_hash, get_user_by_email
+from app.database import ManagementSessionLocal, tenant_engines, tenant_session_info
+from app.migrations import create_tenant_schema, get_applied_versions
+from app.models.management import ProvisioningJob
+from app.security import get_random_password, hash_password_async
+from app.utils.tenant_pool import request_refill
+
+logger = logging.getLogger(__name__)
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+MSSP_ADMIN_NAME = "MSSP Operator"
+MSSP_ADMIN_EMAIL = "mssp@mssp.mssp"
+
+_semaphore = asyncio.Semaphore(PROVISIONING_CONCURRENCY)
+_running_jobs: dict[str, asyncio.Task] = {}
+
+
+async def _provision_database(job: ProvisioningJob, management_db: AsyncSession):
+    if job.mode == "shared":
+        job.db_name = await create_shared_tenant_database()
+        return
+    # A claimed spare is already migrated; the claim commits together with the step.
+    # Spares are kept on the default server only
+    use_spare = TENANT_POOL_TARGET > 0 and job.server_id is None
+    db_name = await claim_spare_database(management_db) if use_spare else None
+    if db_name is not None:
+        request_refill()
+        job.claimed_spare = True
+    else:
+        server = await get_database_server(job.server_id, management_db)
+        db_name = await create_tenant_database(f"tenant_{job.tenant_org}", if_not_exists=True, server=server)
+    job.db_name = db_name
+
+
+async def _provision_schema(job: ProvisioningJob, management_db: AsyncSession):
+    await route_tenant_database(job.db_name, job.server_id, management_db)
+    if job.claimed_spare:
+        return
+    engine = tenant_engines.get_engine(job.db_name)
+    if job.mode == "shared":
+        # The first shared tenant creates the schema, migrate_tenants keeps it current after that
+        async with engine.connect() as conn:
+            if await conn.run_sync(get_applied_versions):
+                return
+    await create_tenant_schema(engine)
+
+
+async def _provision_admin_users(job: ProvisioningJob, management_db: AsyncSession):
+    mssp_hashed_password = await hash_password_async(get_random_password())
+    admins = [
+        (MSSP_ADMIN_NAME, MSSP_ADMIN_EMAIL, mssp_hashed_password),
+        (job.admin_name, job.admin_email, job.admin_hashed_password),
+    ]
+    await route_tenant_database(job.db_name, job.server_id, management_db)
+    async with tenant_engines.session(job.db_name, tenant_session_info(job)) as tenant_db:
+        for name, email, hashed_password in admins:
+            # Users left behind by an interrupted attempt are kept as they are
+            if await get_user_by_email(email, tenant_db) is None:
+                await create_tenant_admin_user_with_hash(job.tenant_org, name, email, hashed_password, tenant_db)
+
+
+async def _provision_registration(job: ProvisioningJob, management_db: AsyncSession):
+    tenant = await get_tenant_by_org(job.tenant_org, management_db)
+    if tenant is not None:
+        if tenant.db_name != job.db_name:
+            raise Exception(f"Tenant {job.tenant_org} is already registered with database {tenant.db_name}")
+        return
+    _, domain = job.admin_email.split("@")
+    await register_tenant(job.tenant_org, domain, job.db_name, management_db, server_id=job.server_id, mode=job.mode)
+
+
+_STEP_HANDLERS = {
+    "database": _provision_database,
+    "schema": _provision_schema,
+    "admin_users": _provision_admin_users,
+    "registration": _provision_registration,
+}
+
+
+async def _heartbeat(job_id: str):
+    # Keeps updated_at fresh while steps run, so other workers do not mistake the job for an abandoned one
+    while True:
+        await asyncio.sleep(PROVISIONING_STALE_SECONDS / 3)
+        try:
+            async with ManagementSessionLocal() as management_db:
+                await touch_provisioning_job(job_id, WORKER_ID, management_db)
+        except Exception as e:
+            logger.warning(f"Could not update heartbeat of provisioning job {job_id}: {e}")
+
+
+async def run_provisioning_job(job_id: str):
+    async with _semaphore:
+        async with ManagementSessionLocal() as management_db:
+            # Another worker may have resumed, finished or rolled back the job while this one waited
+            if not await claim_provisioning_job(
+                job_id, "running", ("pending",), management_db, worker=WORKER_ID, error=None
+            ):
+                logger.info(f"Provisioning job {job_id} was taken over elsewhere, not running it")
+                return
+            job = await get_provisioning_job(job_id, management_db)
+            heartbeat = asyncio.create_task(_heartbeat(job_id))
+            step = None
+            try:
+                for step in PROVISIONING_STEPS:
+                    if job.steps.get(step) == "done":
+                        continue
+                    logger.info(f"Provisioning job {job_id} for tenant {job.tenant_org}: {step}")
+                    await _STEP_HANDLERS[step](job, management_db)
+                    await set_provisioning_step(job, step, "done", management_db)
+                await update_provisioning_job(job, management_db, status="succeeded")
+                logger.info(f"Provisioning job {job_id} for tenant {job.tenant_org} succeeded")
+            except asyncio.CancelledError:
+                await _record_stop(job, management_db, "interrupted", step, None)
+                raise
+            except Exception as e:
+                logger.error(f"Provisioning job {job_id} for tenant {job.tenant_org} failed at {step}: {e}")
+                await _record_stop(job, management_db, "failed", step, str(e))
+            finally:
+                heartbeat.cancel()
+
+
+async def _record_stop(job: ProvisioningJob, management_db: AsyncSession, status: str, step: str, error: str):
+    try:
+        await management_db.rollback()
+        await management_db.refresh(job)
+        steps = {**job.steps, step: status} if step else job.steps
+        error = f"{step}: {error}"[:1024] if error else job.error
+        await update_provisioning_job(job, management_db, status=status, steps=steps, error=error)
+    except Exception as e:
+        logger.error(f"Could not record {status} state of provisioning job {job.id}: {e}")
+
+
+def submit_provisioning_job(job_id: str):
+    task = asyncio.create_task(run_provisioning_job(job_id))
+    _running_jobs[job_id] = task
+    task.add_done_callback(lambda _: _running_jobs.pop(job_id, None))
+
+
+async def claim_stopped_job(job: ProvisioningJob, status: str, management_db: AsyncSession) -> bool:
+    """Takes over a failed, interrupted or abandoned job for resuming or rolling back; False if it is still alive."""
+    if job.id in _running_jobs:
+        return False
+    # Running jobs are kept fresh by their worker's heartbeat, one nobody has touched for a while lost its worker
+    stale_before = datetime.datetime.now(datetime.UTC) - datetime.timedelta(seconds=PROVISIONING_STALE_SECONDS)
+    claimed = await claim_provisioning_job(
+        job.id, status, ("failed", "interrupted"), management_db, stale_before=stale_before
+    )
+    await management_db.refresh(job)
+    return claimed
+
+
+async def rollback_provisioning_job(job: ProvisioningJob, management_db: AsyncSession):
+    tenant = await get_tenant_by_org(job.tenant_org, management_db)
+    if tenant is not None and tenant.db_name == job.db_name:
+        await delete_tenant(tenant, management_db)
+    if job.db_name is not None and job.mode == "shared":
+        await delete_shared_tenant_rows(job.db_name, job.tenant_org)
+    elif job.db_name is not None:
+        # Claimed spares are dropped too, the warm pool provisions fresh ones
+        await drop_tenant_database(job.db_name, await get_database_server(job.server_id, management_db))
+    steps = {step: "rolled_back" if state == "done" else state for step, state in job.steps.items()}
+    await update_provisioning_job(job, management_db, status="rolled_back", steps=steps)
+    logger.info(f"Rolled back provisioning job {job.id} for tenant {job.tenant_org}")
+
+
+async def record_failed_rollback(job: ProvisioningJob, management_db: AsyncSession, error: str):
+    # Failed again, so it can be retried or resumed
+    await management_db.rollback()
+    await management_db.refresh(job)
+    await update_provisioning_job(job, management_db, status="failed", error=f"rollback: {error}"[:1024])
+
+
+async def stop_provisioning_jobs():
+    # Cancelled jobs record themselves as interrupted so they can be resumed later
+    tasks = list(_running_jobs.values())
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def provisioning_stats() -> dict:
+    return {"worker": WORKER_ID, "concurrency": PROVISIONING_CONCURRENCY, "running": len(_running_jobs)}
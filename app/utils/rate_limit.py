@@ -0,0 +1,180 @@
+import logging
+import math
+import time
+from collections import OrderedDict
+
+from fastapi import HTTPException, Request, status
+from redis.exceptions import RedisError
+
+from app.config import (
+    RATE_LIMIT_CAPTCHA_IP,
+    RATE_LIMIT_ENABLED,
+    RATE_LIMIT_LOCAL,
+    RATE_LIMIT_LOCAL_MAX_CLIENTS,
+    RATE_LIMIT_LOGIN_DOMAIN,
+    RATE_LIMIT_LOGIN_EMAIL,
+    RATE_LIMIT_LOGIN_IP,
+)
+from app.utils.logging_utils import SAMPLED
+from app.utils.metrics import RATE_LIMITED
+from app.utils.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_PREFIX = "rate_limit:"
+
+# KEYS are the buckets, ARGV[1] the cost and then burst and refill seconds for each key. Either every bucket has the
+# tokens and all of them are charged, or none is and the seconds until the emptiest one has enough are returned.
+# Returned as a string, Redis would truncate a Lua number to an integer.
+TOKEN_BUCKET_SCRIPT = """
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local cost = tonumber(ARGV[1])
+local tokens = {}
+local wait = 0
+for i, key in ipairs(KEYS) do
+    local burst = tonumber(ARGV[i * 2])
+    local rate = burst / tonumber(ARGV[i * 2 + 1])
+    local bucket = redis.call('HMGET', key, 'tokens', 'at')
+    local available = tonumber(bucket[1]) or burst
+    local at = tonumber(bucket[2]) or now
+    available = math.min(burst, available + math.max(0, now - at) * rate)
+    tokens[i] = available
+    if available < cost then
+        wait = math.max(wait, (cost - available) / rate)
+    end
+end
+if wait > 0 then
+    return tostring(wait)
+end
+for i, key in ipairs(KEYS) do
+    redis.call('HSET', key, 'tokens', tokens[i] - cost, 'at', now)
+    -- Full again by then, so there is nothing left to remember
+    redis.call('EXPIRE', key, math.ceil(tonumber(ARGV[i * 2 + 1])))
+end
+return '0'
+"""
+
+
+def parse_rate_limit(value: str) -> tuple[float, float] | None:
+    # "10/60" is a burst of 10 refilled evenly over 60 seconds; empty disables the limit
+    if not value or not value.strip():
+        return None
+    burst, seconds = value.split("/")
+    burst, seconds = float(burst), float(seconds)
+    if burst < 1 or seconds <= 0:
+        raise ValueError(f"Invalid rate limit {value!r}, expected burst/seconds with a burst of at least 1")
+    return burst, seconds
+
+
+# scope -> (burst, seconds)
+rate_limits = {
+    "login_ip": parse_rate_limit(RATE_LIMIT_LOGIN_IP),
+    "login_email": parse_rate_limit(RATE_LIMIT_LOGIN_EMAIL),
+    "login_domain": parse_rate_limit(RATE_LIMIT_LOGIN_DOMAIN),
+    "captcha_ip": parse_rate_limit(RATE_LIMIT_CAPTCHA_IP),
+}
+
+rate_limit_stats = {"allowed": 0, "rejected_local": 0, "rejected": 0, "redis_errors": 0}
+
+_token_bucket = redis_client.register_script(TOKEN_BUCKET_SCRIPT)
+
+
+class LocalRateLimiter:
+    """Token buckets kept in this worker, so a flood from one client is turned away without a Redis round trip."""
+
+    def __init__(self, limit: tuple[float, float], max_clients: int = RATE_LIMIT_LOCAL_MAX_CLIENTS):
+        self.burst, seconds = limit
+        self.rate = self.burst / seconds
+        self.max_clients = max_clients
+        self._buckets: OrderedDict[str, tuple[float, float]] = OrderedDict()  # key -> (tokens, monotonic time)
+
+    def hit(self, key: str) -> float:
+        """Takes a token for key; returns 0 if there was one, otherwise the seconds until there is."""
+        now = time.monotonic()
+        tokens, at = self._buckets.pop(key, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - at) * self.rate)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / self.rate
+        self._buckets[key] = (tokens, now)
+        # Least recently seen clients go first; a forgotten client starts again with a full bucket
+        while len(self._buckets) > self.max_clients:
+            self._buckets.popitem(last=False)
+        return wait
+
+    def stats(self) -> dict:
+        return {"clients": len(self._buckets), "max_clients": self.max_clients}
+
+
+_local_limit = parse_rate_limit(RATE_LIMIT_LOCAL)
+local_rate_limiter = LocalRateLimiter(_local_limit) if _local_limit else None
+
+
+def too_many_requests(wait: float) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Too many requests",
+        headers={"Retry-After": str(max(1, math.ceil(wait)))},
+    )
+
+
+def get_client_ip(request: Request) -> str:
+    # Behind a proxy, run uvicorn with --proxy-headers so this is the client and not the proxy
+    return request.client.host if request.client else "unknown"
+
+
+async def enforce_rate_limits(endpoint: str, client_ip: str, *buckets: tuple[str, str]):
+    """Raises 429 unless client_ip and every (scope, identifier) bucket still has a token left."""
+    if not RATE_LIMIT_ENABLED:
+        return
+    if local_rate_limiter is not None:
+        wait = local_rate_limiter.hit(client_ip)
+        if wait:
+            rate_limit_stats["rejected_local"] += 1
+            RATE_LIMITED.labels(endpoint, "local").inc()
+            raise too_many_requests(wait)
+
+    keys, args = [], [1]
+    for scope, identifier in buckets:
+        limit = rate_limits.get(scope)
+        if limit is not None:
+            keys.append(f"{RATE_LIMIT_PREFIX}{scope}:{identifier}")
+            args.extend(limit)
+    if not keys:
+        return
+    try:
+        wait = float(await _token_bucket(keys=keys, args=args))
+    except RedisError as e:
+        # The local limiter still holds back floods while Redis is away
+        rate_limit_stats["redis_errors"] += 1
+        logger.warning(f"Rate limiting skipped, Redis failed: {e}")
+        return
+    if wait:
+        rate_limit_stats["rejected"] += 1
+        RATE_LIMITED.labels(endpoint, "redis").inc()
+        logger.info("Rate limited %s for %.1fs", keys, wait, extra=SAMPLED)
+        raise too_many_requests(wait)
+    rate_limit_stats["allowed"] += 1
+
+
+async def limit_login(client_ip: str, email: str):
+    email = email.strip().lower()
+    await enforce_rate_limits(
+        "login", client_ip, ("login_ip", client_ip), ("login_email", email), ("login_domain", email.rsplit("@", 1)[-1])
+    )
+
+
+async def limit_captcha(client_ip: str):
+    await enforce_rate_limits("captcha", client_ip, ("captcha_ip", client_ip))
+
+
+def rate_limit_stats_snapshot() -> dict:
+    return {
+        "enabled": RATE_LIMIT_ENABLED,
+        "limits": {scope: limit and f"{limit[0]:g}/{limit[1]:g}" for scope, limit in rate_limits.items()},
+        "local": local_rate_limiter.stats() if local_rate_limiter is not None else None,
+        **rate_limit_stats,
+    }
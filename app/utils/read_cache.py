@@ -0,0 +1,92 @@
+import asyncio
+import json
+import logging
+from typing import Awaitable, Callable
+
+from fastapi.encoders import jsonable_encoder
+from redis.exceptions import RedisError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import READ_CACHE_TTL
+from app.database import resolve_tenant_session, tenant_engines
+from app.utils.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+read_cache_stats = {"hits": 0, "misses": 0, "coalesced": 0, "invalidations": 0, "errors": 0}
+
+# cache key -> load in flight in this worker; concurrent misses wait on it instead of querying again
+_inflight: dict[str, asyncio.Task] = {}
+
+
+def _cache_key(db: AsyncSession, kind: str, row_id: int) -> str:
+    # Tenants sharing a database share ids too, each gets its own namespace
+    if db.info.get("shared"):
+        return f"cache:{db.info['tenant_db']}/{db.info['tenant_org']}:{kind}:{row_id}"
+    return f"cache:{db.info['tenant_db']}:{kind}:{row_id}"
+
+
+async def get_or_load(
+    db: AsyncSession, kind: str, row_id: int, load: Callable[[AsyncSession], Awaitable[dict | None]]
+) -> dict | None:
+    # Sessions from the tenant engine registry carry their database name; anything else is not cached
+    await resolve_tenant_session(db)
+    tenant_db = db.info.get("tenant_db")
+    if READ_CACHE_TTL <= 0 or tenant_db is None:
+        return await load(db)
+
+    key = _cache_key(db, kind, row_id)
+    try:
+        cached = await redis_client.get(key)
+        if cached is not None:
+            read_cache_stats["hits"] += 1
+            return json.loads(cached)
+    except RedisError as e:
+        read_cache_stats["errors"] += 1
+        logger.warning(f"Read cache lookup failed for {key}: {e}")
+        return await load(db)
+
+    read_cache_stats["misses"] += 1
+    task = _inflight.get(key)
+    if task is None:
+        scope = {name: db.info[name] for name in ("tenant_org", "shared") if name in db.info}
+        task = asyncio.create_task(_load_and_store(key, tenant_db, scope, load))
+        _inflight[key] = task
+        task.add_done_callback(lambda done: _inflight.pop(key, None) if _inflight.get(key) is done else None)
+    else:
+        read_cache_stats["coalesced"] += 1
+    # Shielded so one cancelled request doesn't fail everyone waiting on the same load
+    return await asyncio.shield(task)
+
+
+async def _load_and_store(
+    key: str, tenant_db: str, scope: dict, load: Callable[[AsyncSession], Awaitable[dict | None]]
+):
+    # Own session, so the load outlives whichever request started it. Always the primary: a lagging
+    # replica could put back a row that was just invalidated
+    async with tenant_engines.session(tenant_db, scope) as session:
+        row = jsonable_encoder(await load(session))
+    # Misses aren't cached: new rows would stay invisible until the entry expired
+    if row is not None and _inflight.get(key) is asyncio.current_task():
+        try:
+            await redis_client.set(key, json.dumps(row), ex=READ_CACHE_TTL)
+        except RedisError as e:
+            read_cache_stats["errors"] += 1
+            logger.warning(f"Read cache store failed for {key}: {e}")
+    return row
+
+
+async def invalidate(db: AsyncSession, kind: str, *row_ids: int):
+    tenant_db = db.info.get("tenant_db")
+    if READ_CACHE_TTL <= 0 or tenant_db is None or not row_ids:
+        return
+    keys = [_cache_key(db, kind, row_id) for row_id in row_ids]
+    for key in keys:
+        # A load already in flight may have read the old row; it must not write it back
+        _inflight.pop(key, None)
+    read_cache_stats["invalidations"] += len(keys)
+    try:
+        await redis_client.delete(*keys)
+    except RedisError as e:
+        read_cache_stats["errors"] += 1
+        logger.warning(f"Read cache invalidation failed for {keys}: {e}")
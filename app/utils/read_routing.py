@@ -0,0 +1,51 @@
+import logging
+import time
+
+from redis.exceptions import RedisError
+
+from app.config import READ_YOUR_WRITES_SECONDS
+from app.utils.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+read_routing_stats = {"replica_reads": 0, "primary_reads": 0, "pinned_reads": 0, "pins": 0, "errors": 0}
+
+# client key -> monotonic deadline, so the worker that took the write doesn't have to ask Redis
+_local_pins: dict[str, float] = {}
+
+
+def _pin_key(client: str) -> str:
+    return f"rw_pin:{client}"
+
+
+async def pin_to_primary(client: str):
+    """Sends the client's reads to the primary for READ_YOUR_WRITES_SECONDS, on every worker."""
+    if READ_YOUR_WRITES_SECONDS <= 0:
+        return
+    read_routing_stats["pins"] += 1
+    now = time.monotonic()
+    _local_pins[client] = now + READ_YOUR_WRITES_SECONDS
+    if len(_local_pins) > 10000:
+        for key, deadline in list(_local_pins.items()):
+            if deadline < now:
+                del _local_pins[key]
+    try:
+        await redis_client.set(_pin_key(client), 1, px=int(READ_YOUR_WRITES_SECONDS * 1000))
+    except RedisError as e:
+        read_routing_stats["errors"] += 1
+        logger.warning(f"Could not pin {client} to the primary: {e}")
+
+
+async def is_pinned_to_primary(client: str) -> bool:
+    if READ_YOUR_WRITES_SECONDS <= 0:
+        return False
+    deadline = _local_pins.get(client)
+    if deadline is not None and deadline >= time.monotonic():
+        return True
+    try:
+        return bool(await redis_client.exists(_pin_key(client)))
+    except RedisError as e:
+        read_routing_stats["errors"] += 1
+        logger.warning(f"Could not check the primary pin for {client}: {e}")
+        # Can't tell whether the client just wrote, the primary is always up to date
+        return True
@@ -1,12 +1,68 @@
-import os
+import logging
+import time
 
-import redis
-from dotenv import load_dotenv
+import redis.asyncio as redis
+from redis.asyncio.client import Pipeline
+from redis.exceptions import RedisError
 
-load_dotenv()
+from app.config import (
+    REDIS_DB,
+    REDIS_HEALTH_CHECK_INTERVAL,
+    REDIS_HOST,
+    REDIS_MAX_CONNECTIONS,
+    REDIS_POOL_TIMEOUT,
+    REDIS_PORT,
+    REDIS_SOCKET_CONNECT_TIMEOUT,
+    REDIS_SOCKET_TIMEOUT,
+)
+from app.utils.metrics import REDIS_COMMAND_DURATION
 
-REDIS_HOST = os.getenv("REDIS_HOST")
-REDIS_PORT = os.getenv("REDIS_PORT")
-REDIS_DB = os.getenv("REDIS_DB")
+logger = logging.getLogger(__name__)
 
-redis_client = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, db=REDIS_DB)
+# Shared by every request handled by this worker
+redis_pool = redis.BlockingConnectionPool(
+    host=REDIS_HOST,
+    port=REDIS_PORT,
+    db=REDIS_DB,
+    max_connections=REDIS_MAX_CONNECTIONS,
+    timeout=REDIS_POOL_TIMEOUT,
+    socket_timeout=REDIS_SOCKET_TIMEOUT,
+    socket_connect_timeout=REDIS_SOCKET_CONNECT_TIMEOUT,
+    health_check_interval=REDIS_HEALTH_CHECK_INTERVAL,
+)
+
+
+class InstrumentedPipeline(Pipeline):
+    async def execute(self, raise_on_error: bool = True):
+        started_at = time.perf_counter()
+        try:
+            return await super().execute(raise_on_error)
+        finally:
+            REDIS_COMMAND_DURATION.labels("PIPELINE").observe(time.perf_counter() - started_at)
+
+
+class InstrumentedRedis(redis.Redis):
+    async def execute_command(self, *args, **options):
+        started_at = time.perf_counter()
+        try:
+            return await super().execute_command(*args, **options)
+        finally:
+            REDIS_COMMAND_DURATION.labels(str(args[0]).upper()).observe(time.perf_counter() - started_at)
+
+    def pipeline(self, transaction: bool = True, shard_hint: str = None) -> InstrumentedPipeline:
+        return InstrumentedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+
+redis_client = InstrumentedRedis(connection_pool=redis_pool)
+
+
+async def redis_health_check() -> bool:
+    try:
+        return await redis_client.ping()
+    except RedisError as e:
+        logger.warning(f"Redis health check failed: {e}")
+        return False
+
+
+async def close_redis():
+    await redis_pool.disconnect()
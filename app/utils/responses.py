@@ -0,0 +1,14 @@
+import orjson
+from fastapi.responses import JSONResponse
+
+# Datetimes, UUIDs and dataclasses are handled natively, the same way jsonable_encoder writes them
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+
+class ORJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, option=ORJSON_OPTIONS)
+
+
+def ndjson_line(row: dict) -> bytes:
+    return orjson.dumps(row, option=ORJSON_OPTIONS | orjson.OPT_APPEND_NEWLINE)
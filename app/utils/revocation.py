@@ -0,0 +1,163 @@
+import asyncio
+import hashlib
+import json
+import logging
+import time
+
+from app.config import REVOCATION_BLOOM_FILTER, REVOCATION_BLOOM_SIZE, REVOCATION_MAX_LAG
+from app.security import token_cache
+from app.utils.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+REVOCATION_CHANNEL = "token_revocations"
+BLACKLIST_PREFIX = "blacklist_"
+
+
+class BloomFilter:
+    def __init__(self, size: int, hashes: int = 4):
+        self.size = size
+        self.hashes = hashes
+        self._bits = bytearray((size + 7) // 8)
+
+    def add(self, item: str):
+        for position in self._positions(item):
+            self._bits[position // 8] |= 1 << (position % 8)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self._bits[position // 8] & (1 << (position % 8)) for position in self._positions(item))
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=8 * self.hashes).digest()
+        for i in range(self.hashes):
+            yield int.from_bytes(digest[i * 8 : (i + 1) * 8], "little") % self.size
+
+
+class RevocationList:
+    """Per-worker copy of the revoked token ids, kept current through Redis pub/sub."""
+
+    def __init__(self, use_bloom: bool = REVOCATION_BLOOM_FILTER, bloom_size: int = REVOCATION_BLOOM_SIZE):
+        self.use_bloom = use_bloom
+        self.bloom_size = bloom_size
+        self._revoked: dict[str, float] = {}  # jti -> token exp (unix time)
+        self._bloom = BloomFilter(bloom_size) if use_bloom else None
+        self.synced = False
+        self.last_heartbeat = 0.0
+
+    def add(self, jti: str, expires_at: float):
+        if expires_at <= time.time():
+            return
+        self._revoked[jti] = expires_at
+        if self._bloom is not None:
+            self._bloom.add(jti)
+
+    def contains(self, jti: str) -> bool:
+        if self._bloom is not None and jti not in self._bloom:
+            return False
+        expires_at = self._revoked.get(jti)
+        if expires_at is None:
+            return False
+        if expires_at <= time.time():
+            self._revoked.pop(jti, None)
+            return False
+        return True
+
+    def purge_expired(self):
+        now = time.time()
+        self._revoked = {jti: expires_at for jti, expires_at in self._revoked.items() if expires_at > now}
+        if self._bloom is not None:
+            # Bloom filters cannot forget, so rebuild from what is left
+            self._bloom = BloomFilter(self.bloom_size)
+            for jti in self._revoked:
+                self._bloom.add(jti)
+
+    def is_live(self) -> bool:
+        return self.synced and time.monotonic() - self.last_heartbeat < REVOCATION_MAX_LAG
+
+    def stats(self) -> dict:
+        return {"revoked": len(self._revoked), "bloom_filter": self.use_bloom, "live": self.is_live()}
+
+
+revocation_list = RevocationList()
+
+
+def _revoke_locally(jti: str, expires_at: float):
+    revocation_list.add(jti, expires_at)
+    token_cache.discard_jti(jti)
+
+
+_listener: asyncio.Task = None
+
+
+async def revoke_token(jti: str, expires_at: int):
+    ttl = expires_at - int(time.time())
+    if ttl <= 0:
+        return
+    _revoke_locally(jti, expires_at)
+    async with redis_client.pipeline(transaction=False) as pipe:
+        pipe.setex(f"{BLACKLIST_PREFIX}{jti}", ttl, "true")
+        pipe.publish(REVOCATION_CHANNEL, json.dumps({"jti": jti, "exp": expires_at}))
+        await pipe.execute()
+
+
+async def is_token_revoked(jti: str) -> bool:
+    if revocation_list.is_live():
+        return revocation_list.contains(jti)
+    # Subscription is down or lagging, so the local copy may be missing revocations
+    return bool(await redis_client.get(f"{BLACKLIST_PREFIX}{jti}"))
+
+
+async def _seed_from_redis():
+    now = time.time()
+    keys = [key async for key in redis_client.scan_iter(match=f"{BLACKLIST_PREFIX}*", count=1000)]
+    if not keys:
+        return
+    async with redis_client.pipeline(transaction=False) as pipe:
+        for key in keys:
+            pipe.ttl(key)
+        ttls = await pipe.execute()
+    for key, ttl in zip(keys, ttls):
+        if ttl > 0:
+            _revoke_locally(key.decode("utf-8")[len(BLACKLIST_PREFIX) :], now + ttl)
+    logger.info(f"Seeded {len(keys)} revoked tokens from Redis")
+
+
+async def _listen_for_revocations():
+    while True:
+        try:
+            async with redis_client.pubsub(ignore_subscribe_messages=True) as pubsub:
+                # Subscribe before seeding so nothing published in between is lost
+                await pubsub.subscribe(REVOCATION_CHANNEL)
+                await _seed_from_redis()
+                revocation_list.synced = True
+                last_purge = time.monotonic()
+                while True:
+                    message = await pubsub.get_message(timeout=1.0)
+                    revocation_list.last_heartbeat = time.monotonic()
+                    if message is not None:
+                        data = json.loads(message["data"])
+                        _revoke_locally(data["jti"], data["exp"])
+                    if revocation_list.last_heartbeat - last_purge > 60:
+                        revocation_list.purge_expired()
+                        last_purge = revocation_list.last_heartbeat
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Revocation subscriber error, falling back to Redis lookups: {e}")
+            revocation_list.synced = False
+            await asyncio.sleep(1)
+
+
+def start_revocation_listener():
+    global _listener
+    if _listener is None:
+        _listener = asyncio.create_task(_listen_for_revocations())
+
+
+async def stop_revocation_listener():
+    global _listener
+    if _listener is not None:
+        _listener.cancel()
+        await asyncio.gather(_listener, return_exceptions=True)
+        _listener = None
+        revocation_list.synced = False
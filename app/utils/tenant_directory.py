@@ -0,0 +1,127 @@
+import asyncio
+import json
+import logging
+import time
+
+from app.config import TENANT_CACHE_NEGATIVE_TTL, TENANT_CACHE_TTL
+from app.utils.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+TENANT_DIRECTORY_CHANNEL = "tenant_directory_invalidate"
+
+# Returned by lookups when nothing (not even a negative entry) is cached
+MISSING = object()
+
+
+class TenantDirectory:
+    """Per-worker cache of tenant_org -> Tenant and domain -> Tenant lookups."""
+
+    def __init__(self, ttl: float = TENANT_CACHE_TTL, negative_ttl: float = TENANT_CACHE_NEGATIVE_TTL):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._tenants = {}
+        self._domains = {}
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get_tenant(self, tenant_org: str):
+        return self._lookup(self._tenants, tenant_org)
+
+    def set_tenant(self, tenant_org: str, tenant):
+        self._store(self._tenants, tenant_org, tenant)
+
+    def get_tenant_by_domain(self, domain: str):
+        return self._lookup(self._domains, domain)
+
+    def set_tenant_by_domain(self, domain: str, tenant):
+        self._store(self._domains, domain, tenant)
+
+    def invalidate(self, tenant_org: str = None, domain: str = None):
+        self.invalidations += 1
+        if tenant_org is None and domain is None:
+            self._tenants.clear()
+            self._domains.clear()
+            return
+        if tenant_org is not None:
+            self._tenants.pop(tenant_org, None)
+            # Domain entries are keyed by domain, so drop any that point at this tenant too
+            for key, (tenant, _) in list(self._domains.items()):
+                if tenant is not None and tenant.tenant_org == tenant_org:
+                    self._domains.pop(key, None)
+        if domain is not None:
+            self._domains.pop(domain, None)
+
+    def stats(self) -> dict:
+        return {
+            "tenants": len(self._tenants),
+            "domains": len(self._domains),
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+        }
+
+    def _lookup(self, entries: dict, key: str):
+        entry = entries.get(key)
+        if entry is None or entry[1] < time.monotonic():
+            self.misses += 1
+            return MISSING
+        self.hits += 1
+        return entry[0]
+
+    def _store(self, entries: dict, key: str, value):
+        ttl = self.ttl if value is not None else self.negative_ttl
+        entries[key] = (value, time.monotonic() + ttl)
+
+
+tenant_directory = TenantDirectory()
+
+_subscriber: asyncio.Task = None
+
+
+async def publish_tenant_invalidation(tenant_org: str = None, domain: str = None):
+    # Invalidate locally right away; the other workers catch up through pub/sub
+    tenant_directory.invalidate(tenant_org, domain)
+    try:
+        await redis_client.publish(TENANT_DIRECTORY_CHANNEL, json.dumps({"tenant_org": tenant_org, "domain": domain}))
+    except Exception as e:
+        logger.warning(f"Could not publish tenant directory invalidation: {e}")
+
+
+def _handle_invalidation(message):
+    try:
+        data = json.loads(message["data"])
+        tenant_directory.invalidate(data.get("tenant_org"), data.get("domain"))
+    except (TypeError, ValueError) as e:
+        logger.warning(f"Ignoring malformed tenant directory invalidation: {e}")
+
+
+async def _listen_for_invalidations():
+    while True:
+        try:
+            async with redis_client.pubsub(ignore_subscribe_messages=True) as pubsub:
+                await pubsub.subscribe(TENANT_DIRECTORY_CHANNEL)
+                async for message in pubsub.listen():
+                    _handle_invalidation(message)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Tenant directory subscriber error, clearing cache: {e}")
+            # Invalidations may have been missed while disconnected
+            tenant_directory.invalidate()
+            await asyncio.sleep(1)
+
+
+def start_tenant_directory_subscriber():
+    global _subscriber
+    if _subscriber is None:
+        _subscriber = asyncio.create_task(_listen_for_invalidations())
+
+
+async def stop_tenant_directory_subscriber():
+    global _subscriber
+    if _subscriber is not None:
+        _subscriber.cancel()
+        await asyncio.gather(_subscriber, return_exceptions=True)
+        _subscriber = None
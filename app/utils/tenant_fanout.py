@@ -0,0 +1,84 @@
+import asyncio
+import heapq
+from collections import deque
+from typing import AsyncIterator, Awaitable, Callable
+
+from app.config import FANOUT_CONCURRENCY, FANOUT_PAGE_SIZE, FANOUT_TENANT_TIMEOUT
+
+
+class _TenantCursor:
+    def __init__(self, tenant):
+        self.tenant = tenant
+        self.rows = deque()
+        self.after = None
+        self.exhausted = False
+        self.pending: asyncio.Task = None
+
+
+async def merge_tenant_streams(
+    tenants: list,
+    fetch_page: Callable[..., Awaitable[list]],
+    sort_key: Callable,
+    failures: list,
+    concurrency: int = FANOUT_CONCURRENCY,
+    timeout: float = FANOUT_TENANT_TIMEOUT,
+    page_size: int = FANOUT_PAGE_SIZE,
+) -> AsyncIterator[tuple]:
+    """K-way merge of per-tenant keyset pages, yielding (tenant, row) in sort_key order.
+
+    fetch_page(tenant, after, limit) must return rows ordered by sort_key that come after
+    the key ``after`` (None for the first page). At most ``concurrency`` pages are fetched
+    at once and memory stays at about one page per tenant. Tenants whose fetch fails or
+    times out are appended to ``failures`` and dropped from the merge.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def load(cursor: _TenantCursor):
+        async with semaphore:
+            return await asyncio.wait_for(fetch_page(cursor.tenant, cursor.after, page_size), timeout)
+
+    def prefetch(cursor: _TenantCursor):
+        if cursor.pending is None and not cursor.exhausted:
+            cursor.pending = asyncio.create_task(load(cursor))
+
+    async def refill(cursor: _TenantCursor) -> bool:
+        prefetch(cursor)
+        if cursor.pending is None:
+            return False
+        try:
+            rows = await cursor.pending
+        except Exception as e:
+            failures.append({"tenant": cursor.tenant, "error": str(e).split("\n")[0] or type(e).__name__})
+            cursor.exhausted = True
+            return False
+        finally:
+            cursor.pending = None
+        if len(rows) < page_size:
+            cursor.exhausted = True
+        if rows:
+            cursor.after = sort_key(rows[-1])
+            cursor.rows.extend(rows)
+        return bool(rows)
+
+    cursors = [_TenantCursor(tenant) for tenant in tenants]
+    heap = []
+    try:
+        for cursor in cursors:
+            prefetch(cursor)
+        for i, cursor in enumerate(cursors):
+            if await refill(cursor):
+                heapq.heappush(heap, (sort_key(cursor.rows[0]), i))
+
+        while heap:
+            _, i = heapq.heappop(heap)
+            cursor = cursors[i]
+            yield cursor.tenant, cursor.rows.popleft()
+            if len(cursor.rows) <= page_size // 2:
+                prefetch(cursor)
+            if cursor.rows or await refill(cursor):
+                # Ties on the key fall back to the tenant's position, which keeps the order stable
+                heapq.heappush(heap, (sort_key(cursor.rows[0]), i))
+    finally:
+        for cursor in cursors:
+            if cursor.pending is not None:
+                cursor.pending.cancel()
@@ -0,0 +1,82 @@
+import asyncio
+import logging
+
+from redis.exceptions import LockError
+
+from app.config import TENANT_POOL_REFILL_INTERVAL, TENANT_POOL_TARGET
+from app.crud.spare_database import count_spare_databases, provision_spare_database, warm_pool_stats
+from app.database import ManagementSessionLocal
+from app.utils.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+REFILL_LOCK = "tenant_warm_pool_refill"
+
+_refill_task: asyncio.Task = None
+_refill_requested = asyncio.Event()
+
+
+async def refill_warm_pool(target: int = TENANT_POOL_TARGET):
+    async with ManagementSessionLocal() as management_db:
+        depth = await count_spare_databases(management_db)
+        warm_pool_stats["depth"] = depth
+        while depth < target:
+            await provision_spare_database(management_db)
+            depth += 1
+            warm_pool_stats["depth"] = depth
+
+
+async def _refill_loop():
+    while True:
+        try:
+            # Only one worker refills at a time, otherwise every worker tops up to the target
+            lock = redis_client.lock(REFILL_LOCK, timeout=300)
+            if await lock.acquire(blocking=False):
+                try:
+                    await refill_warm_pool()
+                finally:
+                    try:
+                        await lock.release()
+                    except LockError:
+                        pass
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Refilling the tenant warm pool failed: {e}")
+
+        try:
+            await asyncio.wait_for(_refill_requested.wait(), TENANT_POOL_REFILL_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+        _refill_requested.clear()
+
+
+def request_refill():
+    _refill_requested.set()
+
+
+def start_warm_pool():
+    global _refill_task
+    if TENANT_POOL_TARGET > 0 and _refill_task is None:
+        _refill_task = asyncio.create_task(_refill_loop())
+
+
+async def stop_warm_pool():
+    global _refill_task
+    if _refill_task is not None:
+        _refill_task.cancel()
+        await asyncio.gather(_refill_task, return_exceptions=True)
+        _refill_task = None
+
+
+def warm_pool_stats_snapshot() -> dict:
+    claims = warm_pool_stats["claims"]
+    return {
+        "target": TENANT_POOL_TARGET,
+        "depth": warm_pool_stats["depth"],
+        "provisioned": warm_pool_stats["provisioned"],
+        "claims": claims,
+        "misses": warm_pool_stats["misses"],
+        "avg_claim_ms": round(warm_pool_stats["claim_seconds_total"] / claims * 1000, 2) if claims else 0.0,
+        "max_claim_ms": round(warm_pool_stats["claim_seconds_max"] * 1000, 2),
+    }
@@ -0,0 +1,108 @@
+import asyncio
+import logging
+import time
+from collections import Counter
+
+from redis.exceptions import RedisError
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.config import TENANT_ACTIVITY_FLUSH_INTERVAL, WARMUP_CONNECTIONS, WARMUP_TENANTS
+from app.crud.tenant import get_cached_tenant
+from app.database import ManagementSessionLocal, management_engine, tenant_engines
+from app.utils.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+# Sorted set of tenant_org -> requests, summed over all workers; new workers warm the top of it
+TENANT_ACTIVITY_KEY = "tenant_activity"
+
+# Readiness follows "ready"; liveness only needs the process to answer
+warmup_state = {"ready": False, "shutting_down": False, "tenants": 0, "failed": 0, "elapsed_seconds": None}
+
+# Requests per tenant since the last flush to Redis
+_activity: Counter[str] = Counter()
+_flush_task: asyncio.Task = None
+
+
+def record_tenant_activity(tenant_org: str):
+    _activity[tenant_org] += 1
+
+
+async def flush_tenant_activity():
+    if not _activity:
+        return
+    counts = dict(_activity)
+    _activity.clear()
+    try:
+        async with redis_client.pipeline(transaction=False) as pipe:
+            for tenant_org, count in counts.items():
+                pipe.zincrby(TENANT_ACTIVITY_KEY, count, tenant_org)
+            await pipe.execute()
+    except RedisError as e:
+        logger.warning(f"Could not record tenant activity: {e}")
+
+
+async def _flush_loop():
+    while True:
+        await asyncio.sleep(TENANT_ACTIVITY_FLUSH_INTERVAL)
+        await flush_tenant_activity()
+
+
+def start_activity_flush():
+    global _flush_task
+    if _flush_task is None:
+        _flush_task = asyncio.create_task(_flush_loop())
+
+
+async def stop_activity_flush():
+    global _flush_task
+    if _flush_task is not None:
+        _flush_task.cancel()
+        await asyncio.gather(_flush_task, return_exceptions=True)
+        _flush_task = None
+    # A recycled worker hands what it saw to the next one
+    await flush_tenant_activity()
+
+
+async def _open_connections(engine: AsyncEngine, count: int = WARMUP_CONNECTIONS):
+    # Held at the same time, so the pool really ends up with count connections
+    async def open_one():
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    await asyncio.gather(*(open_one() for _ in range(count)))
+
+
+async def _most_active_tenants(limit: int = WARMUP_TENANTS) -> list[str]:
+    if limit <= 0:
+        return []
+    try:
+        return [tenant_org.decode() for tenant_org in await redis_client.zrevrange(TENANT_ACTIVITY_KEY, 0, limit - 1)]
+    except RedisError as e:
+        logger.warning(f"Could not read tenant activity: {e}")
+        return []
+
+
+async def warm_up():
+    """Opens the management pool and the pools of the most active tenants before the worker takes traffic."""
+    started_at = time.monotonic()
+    await _open_connections(management_engine)
+    try:
+        await redis_client.ping()
+    except RedisError as e:
+        logger.warning(f"Redis is not reachable at startup: {e}")
+
+    # More than the registry keeps would only evict each other
+    for tenant_org in await _most_active_tenants(min(WARMUP_TENANTS, tenant_engines.max_engines)):
+        try:
+            async with ManagementSessionLocal() as management_db:
+                # Also fills the tenant directory and routes the tenant to its server
+                tenant = await get_cached_tenant(tenant_org, management_db)
+            await _open_connections(tenant_engines.get_engine(tenant.db_name))
+            warmup_state["tenants"] += 1
+        except Exception as e:
+            warmup_state["failed"] += 1
+            logger.warning(f"Could not warm up tenant {tenant_org}: {e}")
+    warmup_state["elapsed_seconds"] = round(time.monotonic() - started_at, 2)
+    logger.info(f"Warmed up {warmup_state['tenants']} tenant pools in {warmup_state['elapsed_seconds']}s")
@@ -0,0 +1,450 @@
+"""In-process load benchmarks for app.main.myapp.
+
+Requests go through an ASGI client, so nothing listens on a port. Databases default to SQLite files in a temporary
+directory, and Redis is replaced by fakeredis. To run against a local MySQL instead, export
+MANAGEMENT_DATABASE_URL and TENANT_DATABASE_TEMPLATE_URL pointing at a disposable server before starting.
+
+    python -m benchmarks.run
+    python -m benchmarks.run --scenario login --scenario tasks_crud --output before.json
+    python -m benchmarks.run --baseline before.json --max-regression 0.2
+"""
+
+import argparse
+import asyncio
+import datetime
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+SCENARIOS = ["login", "login_flood", "tasks_crud", "list_tasks", "provisioning", "fanout"]
+
+MSSP_EMAIL = "mssp@ridgesecurity.com"
+MSSP_PASSWORD = "XYZ"
+ADMIN_PASSWORD = "benchmark"
+FLOOD_EMAIL_LIMIT = "10/60"  # The default RATE_LIMIT_LOGIN_EMAIL, put back for the login_flood scenario
+
+
+def configure_environment(workdir: str) -> bool:
+    # Has to happen before anything under app/ is imported, app.config reads the environment at import time
+    sqlite = "MANAGEMENT_DATABASE_URL" not in os.environ
+    if sqlite:
+        os.environ["MANAGEMENT_DATABASE_URL"] = f"sqlite+aiosqlite:///{workdir}/management.db"
+        os.environ["TENANT_DATABASE_TEMPLATE_URL"] = f"sqlite+aiosqlite:///{workdir}/{{tenant_db_name}}.db"
+    os.environ.setdefault("SECRET_KEY", "benchmark")
+    os.environ.setdefault("ADMIN_DOMAIN", MSSP_EMAIL.split("@")[1])
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ.setdefault("LOG_FILE", "")
+    os.environ.setdefault("CAPTCHA_POOL_SIZE", "0")
+    # Every request comes from one client and a few emails; the limiter still runs, it just never says no
+    for limit in ("LOGIN_IP", "LOGIN_EMAIL", "LOGIN_DOMAIN", "CAPTCHA_IP", "LOCAL"):
+        os.environ.setdefault(f"RATE_LIMIT_{limit}", "1000000/1")
+    return sqlite
+
+
+def use_local_stand_ins(workdir: str, sqlite: bool):
+    import fakeredis
+
+    import app.utils.provisioning as provisioning
+    from app.database import tenant_engines
+    from app.utils.redis_client import redis_client
+
+    # Every module shares this client, so swapping its pool is enough
+    redis_client.connection_pool = fakeredis.FakeAsyncRedis().connection_pool
+
+    if sqlite:
+        # SQLite creates the database file on first connect and has no DROP DATABASE
+        async def create_tenant_database(tenant_db_name: str, if_not_exists: bool = False, server=None):
+            return tenant_db_name
+
+        async def drop_tenant_database(tenant_db_name: str, server=None):
+            tenant_engines.evict(tenant_db_name)
+            path = os.path.join(workdir, f"{tenant_db_name}.db")
+            if os.path.exists(path):
+                os.remove(path)
+
+        provisioning.create_tenant_database = create_tenant_database
+        provisioning.drop_tenant_database = drop_tenant_database
+
+
+async def create_management_schema():
+    from sqlalchemy.ext.asyncio import AsyncSession
+
+    from app.database import management_engine
+    from app.migrations import MANAGEMENT_MIGRATIONS, stamp_head
+    from app.models.management import ManagementBase, MSSPOperator
+    from app.security import hash_password
+
+    async with management_engine.begin() as conn:
+        await conn.run_sync(ManagementBase.metadata.create_all)
+        await conn.run_sync(stamp_head, MANAGEMENT_MIGRATIONS)
+    async with AsyncSession(management_engine) as session:
+        session.add(MSSPOperator(username="mssp", email=MSSP_EMAIL, hashed_password=hash_password(MSSP_PASSWORD)))
+        await session.commit()
+
+
+def summarize(latencies: list[float], errors: int, elapsed: float) -> dict:
+    latencies = sorted(latencies)
+
+    def percentile(p: float) -> float:
+        if not latencies:
+            return 0.0
+        # Nearest rank
+        return round(latencies[min(len(latencies) - 1, max(0, int(round(p * len(latencies))) - 1))] * 1000, 3)
+
+    return {
+        "count": len(latencies),
+        "errors": errors,
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3) if latencies else 0.0,
+        "p50_ms": percentile(0.50),
+        "p95_ms": percentile(0.95),
+        "p99_ms": percentile(0.99),
+        "max_ms": round(latencies[-1] * 1000, 3) if latencies else 0.0,
+    }
+
+
+async def measure(operation, iterations: int, concurrency: int) -> dict:
+    latencies = []
+    errors = 0
+    counter = itertools.count()
+
+    async def worker():
+        nonlocal errors
+        while (index := next(counter)) < iterations:
+            started_at = time.perf_counter()
+            try:
+                await operation(index)
+            except Exception as e:
+                errors += 1
+                if errors <= 3:
+                    print(f"  error: {e}", file=sys.stderr)
+            else:
+                latencies.append(time.perf_counter() - started_at)
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return summarize(latencies, errors, time.perf_counter() - started_at)
+
+
+def expect(response, status_code: int = 200):
+    if response.status_code != status_code:
+        raise Exception(
+            f"{response.request.method} {response.request.url.path}: {response.status_code} {response.text}"
+        )
+    return response
+
+
+class Bench:
+    def __init__(self, client, args):
+        self.client = client
+        self.args = args
+        self.mssp_headers = None
+        self.tenant_seq = itertools.count()
+
+    async def login(self, email: str, password: str) -> dict:
+        response = expect(
+            await self.client.post(
+                "/auth/login",
+                json={"email": email, "password": password, "captcha_key": "bench", "captcha_text": "bench"},
+            )
+        )
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    async def provision_tenant(self, prefix: str) -> tuple[str, str]:
+        tenant_org = f"{prefix}{next(self.tenant_seq)}"
+        admin_email = f"admin@{tenant_org.lower()}.bench"
+        response = expect(
+            await self.client.post(
+                "/mssp_operator/tenants/",
+                json={
+                    "tenant_org": tenant_org,
+                    "admin_user": {"name": "Admin", "email": admin_email, "password": ADMIN_PASSWORD},
+                },
+                headers=self.mssp_headers,
+            ),
+            202,
+        )
+        job_id = response.json()["job_id"]
+        while True:
+            job = expect(await self.client.get(f"/mssp_operator/jobs/{job_id}", headers=self.mssp_headers)).json()
+            if job["status"] == "succeeded":
+                return tenant_org.upper(), admin_email
+            if job["status"] not in ("pending", "running"):
+                raise Exception(f"Provisioning {tenant_org} ended {job['status']}: {job['error']}")
+            await asyncio.sleep(0.01)
+
+    async def seed_tasks(self, tenant_org: str, user_email: str, count: int):
+        from sqlalchemy import insert
+
+        from app.crud.tenant import get_tenant_by_org
+        from app.crud.user import get_user_by_email
+        from app.database import ManagementSessionLocal, tenant_engines
+        from app.models.tenant import Task
+
+        async with ManagementSessionLocal() as management_db:
+            tenant = await get_tenant_by_org(tenant_org, management_db)
+        async with tenant_engines.session(tenant.db_name) as db:
+            user = await get_user_by_email(user_email, db)
+            for start in range(0, count, 1000):
+                rows = [
+                    {"title": f"task {i}", "description": "seeded by benchmarks", "user_id": user.id}
+                    for i in range(start, min(count, start + 1000))
+                ]
+                await db.execute(insert(Task), rows)
+            await db.commit()
+
+    async def deactivate_user(self, tenant_org: str, user_email: str):
+        from sqlalchemy import update
+
+        from app.crud.tenant import get_tenant_by_org
+        from app.database import ManagementSessionLocal, tenant_engines
+        from app.models.tenant import User
+
+        async with ManagementSessionLocal() as management_db:
+            tenant = await get_tenant_by_org(tenant_org, management_db)
+        async with tenant_engines.session(tenant.db_name) as db:
+            await db.execute(update(User).where(User.email == user_email).values(is_active=False))
+            await db.commit()
+
+    async def scenario_login(self) -> dict:
+        tenant_org, admin_email = await self.provision_tenant("LOGIN")
+        inactive_email = f"inactive@{tenant_org.lower()}.bench"
+        headers = await self.login(admin_email, ADMIN_PASSWORD)
+        expect(
+            await self.client.post(
+                f"/tenants/{tenant_org}/users/",
+                json={"name": "Inactive", "email": inactive_email, "password": ADMIN_PASSWORD},
+                headers=headers,
+            )
+        )
+        await self.deactivate_user(tenant_org, inactive_email)
+
+        async def rejected(email: str):
+            response = await self.client.post(
+                "/auth/login",
+                json={"email": email, "password": ADMIN_PASSWORD, "captcha_key": "bench", "captcha_text": "bench"},
+            )
+            expect(response, 401)
+
+        iterations = self.args.login_iterations
+        return {
+            "login": await measure(lambda _: self.login(MSSP_EMAIL, MSSP_PASSWORD), iterations, self.args.concurrency),
+            "login_tenant": await measure(
+                lambda _: self.login(admin_email, ADMIN_PASSWORD), iterations, self.args.concurrency
+            ),
+            # Turned away before hashing, so these run at the speed of the lookups
+            "login_unknown_user": await measure(
+                lambda _: rejected(f"nobody@{tenant_org.lower()}.bench"), iterations * 10, self.args.concurrency
+            ),
+            "login_inactive_user": await measure(
+                lambda _: rejected(inactive_email), iterations * 10, self.args.concurrency
+            ),
+        }
+
+    async def scenario_login_flood(self) -> dict:
+        from app.utils import rate_limit
+
+        tenant_org, admin_email = await self.provision_tenant("FLOOD")
+        limited = 0
+
+        async def wrong_password(index: int):
+            nonlocal limited
+            response = await self.client.post(
+                "/auth/login",
+                json={"email": admin_email, "password": "wrong", "captcha_key": "bench", "captcha_text": "bench"},
+            )
+            if response.status_code == 429:
+                limited += 1
+            else:
+                expect(response, 401)
+
+        # Guessing one account's password: once its bucket is empty, attempts stop costing a bcrypt check
+        limits = dict(rate_limit.rate_limits)
+        rate_limit.rate_limits["login_email"] = rate_limit.parse_rate_limit(FLOOD_EMAIL_LIMIT)
+        try:
+            result = await measure(wrong_password, self.args.login_iterations * 10, self.args.concurrency)
+        finally:
+            rate_limit.rate_limits.update(limits)
+        return {"login_flood": {**result, "rate_limited": limited}}
+
+    async def scenario_tasks_crud(self) -> dict:
+        tenant_org, admin_email = await self.provision_tenant("CRUD")
+        headers = await self.login(admin_email, ADMIN_PASSWORD)
+        base = f"/tenants/{tenant_org}/tasks/"
+
+        async def crud(index: int):
+            task = expect(
+                await self.client.post(base, json={"title": f"task {index}", "description": "crud"}, headers=headers)
+            ).json()
+            expect(await self.client.get(f"{base}{task['id']}", headers=headers))
+            expect(
+                await self.client.put(
+                    f"{base}{task['id']}", params={"title": "updated", "description": "crud"}, headers=headers
+                )
+            )
+            expect(await self.client.delete(f"{base}{task['id']}", headers=headers))
+
+        async def read(index: int):
+            expect(await self.client.get(f"{base}{read_id}", headers=headers))
+
+        iterations = self.args.iterations
+        results = {"tasks_crud_cycle": await measure(crud, iterations, self.args.concurrency)}
+        response = await self.client.post(base, json={"title": "hot", "description": "read"}, headers=headers)
+        read_id = expect(response).json()["id"]
+        results["tasks_read_hot"] = await measure(read, iterations, self.args.concurrency)
+        return results
+
+    async def scenario_list_tasks(self) -> dict:
+        results = {}
+        for size in self.args.list_sizes:
+            tenant_org, admin_email = await self.provision_tenant("LIST")
+            await self.seed_tasks(tenant_org, admin_email, size)
+            headers = await self.login(admin_email, ADMIN_PASSWORD)
+            base = f"/tenants/{tenant_org}/tasks/"
+
+            async def first_page(index: int):
+                expect(await self.client.get(base, params={"limit": 100}, headers=headers))
+
+            async def stream_all(index: int):
+                response = expect(await self.client.get(base, params={"stream": "true"}, headers=headers))
+                if response.text.count("\n") != size:
+                    raise Exception(f"Expected {size} streamed tasks")
+
+            results[f"list_tasks_page_{size}"] = await measure(first_page, self.args.iterations, self.args.concurrency)
+            results[f"list_tasks_stream_{size}"] = await measure(
+                stream_all, max(self.args.iterations // 10, 5), self.args.concurrency
+            )
+        return results
+
+    async def scenario_provisioning(self) -> dict:
+        return {
+            "provisioning": await measure(
+                lambda _: self.provision_tenant("PROV"), self.args.provisioning_iterations, self.args.concurrency
+            )
+        }
+
+    async def scenario_fanout(self) -> dict:
+        for _ in range(self.args.fanout_tenants):
+            tenant_org, admin_email = await self.provision_tenant("FAN")
+            await self.seed_tasks(tenant_org, admin_email, self.args.fanout_tasks)
+
+        async def fanout(index: int):
+            response = expect(
+                await self.client.get("/mssp_operator/tasks/", params={"limit": 1000}, headers=self.mssp_headers)
+            )
+            summary = json.loads(response.text.rstrip("\n").rsplit("\n", 1)[-1])["summary"]
+            if summary["partial"]:
+                raise Exception(f"Fan-out was partial: {summary['failed_tenants']}")
+
+        return {
+            f"fanout_{self.args.fanout_tenants}_tenants": await measure(
+                fanout, max(self.args.iterations // 10, 5), self.args.concurrency
+            )
+        }
+
+
+async def run(args, sqlite: bool, workdir: str) -> dict:
+    from httpx import ASGITransport, AsyncClient
+
+    from app.main import myapp
+
+    use_local_stand_ins(workdir, sqlite)
+    await create_management_schema()
+
+    results = {}
+    transport = ASGITransport(app=myapp)
+    async with AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        async with myapp.router.lifespan_context(myapp):
+            bench = Bench(client, args)
+            bench.mssp_headers = await bench.login(MSSP_EMAIL, MSSP_PASSWORD)
+            for scenario in args.scenario or SCENARIOS:
+                print(f"Running {scenario}...", file=sys.stderr)
+                results.update(await getattr(bench, f"scenario_{scenario}")())
+    return results
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(results: dict, baseline: dict = None):
+    print(f"{'scenario':36} {'count':>6} {'err':>4} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}  vs baseline")
+    for name, result in results.items():
+        line = (
+            f"{name:36} {result['count']:>6} {result['errors']:>4} {result['throughput_rps']:>9.2f} "
+            f"{result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f} {result['p99_ms']:>9.2f}"
+        )
+        previous = (baseline or {}).get(name)
+        if previous and previous["p95_ms"]:
+            line += f"  p95 {(result['p95_ms'] / previous['p95_ms'] - 1) * 100:+.1f}%"
+        print(line)
+
+
+def find_regressions(results: dict, baseline: dict, max_regression: float) -> list[str]:
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if previous and previous["p95_ms"] and result["p95_ms"] > previous["p95_ms"] * (1 + max_regression):
+            regressions.append(f"{name}: p95 {previous['p95_ms']}ms -> {result['p95_ms']}ms")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the in-process load benchmarks")
+    parser.add_argument("--scenario", action="append", choices=SCENARIOS, help="Scenario to run (repeatable)")
+    parser.add_argument("--iterations", type=int, default=200, help="Requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=8, help="Requests in flight")
+    parser.add_argument("--login-iterations", type=int, default=40)
+    parser.add_argument("--provisioning-iterations", type=int, default=10)
+    parser.add_argument("--list-sizes", type=int, nargs="+", default=[100, 1000, 10000])
+    parser.add_argument("--fanout-tenants", type=int, default=20)
+    parser.add_argument("--fanout-tasks", type=int, default=100, help="Tasks seeded per fan-out tenant")
+    parser.add_argument("--output", default="benchmark_results.json", help="Where to write the JSON results")
+    parser.add_argument("--baseline", help="Earlier results to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Allowed p95 increase over the baseline")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="mssp-bench-") as workdir:
+        sqlite = configure_environment(workdir)
+        results = asyncio.run(run(args, sqlite, workdir))
+
+    report = {
+        "meta": {
+            "timestamp": datetime.datetime.now(datetime.UTC).isoformat(),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "database": "sqlite" if sqlite else "external",
+            "args": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+    print_report(results, baseline)
+    print(f"Results written to {args.output}")
+
+    if baseline is not None:
+        regressions = find_regressions(results, baseline, args.max_regression)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()